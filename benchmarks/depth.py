@@ -0,0 +1,47 @@
+"""Compares the evaluation time of raw and compiled permission trees of increasing depth.
+
+Usage: python benchmarks/depth.py [depth ...]
+
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from logical_permissions.LogicalPermissions import LogicalPermissions
+
+def createPermissions(depth):
+  """Creates a machine-generated permission tree where every level adds a logic gate and a flag."""
+  permissions = {'flag': 'granted'}
+  for level in range(depth):
+    if level % 2:
+      permissions = {'AND': [{'flag': 'granted'}, {'OR': [permissions, {'flag': 'denied{0}'.format(level)}]}]}
+    else:
+      permissions = {'NOT': {'NOR': [{'flag': 'denied{0}'.format(level)}, permissions]}}
+  return permissions
+
+def measure(check, number):
+  try:
+    return '{0:.1f}'.format(min(timeit.repeat(check, number = number, repeat = 3)) / number * 1000000)
+  except RuntimeError: # RecursionError is a RuntimeError
+    return 'recursion limit'
+
+def createLogicalPermissions():
+  lp = LogicalPermissions()
+  lp.addType('flag', lambda flag, context: flag == 'granted')
+  return lp
+
+def main(depths):
+  lp = createLogicalPermissions()
+  print('{0:>8} {1:>18} {2:>18} {3:>18}'.format('depth', 'raw (us)', 'compile (us)', 'compiled (us)'))
+  for depth in depths:
+    permissions = createPermissions(depth = depth)
+    number = max(1, 10000 // depth)
+    compiled = lp.compile(permissions)
+    raw_time = measure(lambda: lp.checkAccess(permissions, {}), number)
+    compile_time = measure(lambda: createLogicalPermissions().compile(permissions), number)
+    compiled_time = measure(lambda: lp.checkAccess(compiled, {}), number)
+    print('{0:>8} {1:>18} {2:>18} {3:>18}'.format(depth, raw_time, compile_time, compiled_time))
+
+if __name__ == '__main__':
+  main([int(depth) for depth in sys.argv[1:]] or [10, 100, 1000])
@@ -0,0 +1,61 @@
+"""Compares the memory used by raw permission trees and compiled permission trees.
+
+Usage: python benchmarks/memory.py [count ...]
+
+"""
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from logical_permissions.LogicalPermissions import LogicalPermissions
+
+def createPermissions(count, seed = 1):
+  """Creates per-document permission trees that grant access to staff roles, the owner and a few shared users."""
+  generator = random.Random(seed)
+  roles = ['admin', 'editor', 'writer', 'reviewer']
+  permissions_list = []
+  for index in range(count):
+    permissions_list.append({
+      'OR': {
+        'role': generator.sample(roles, 2),
+        'user': ['user{0}'.format(generator.randrange(count // 10 + 1)) for _ in range(generator.randrange(1, 4))],
+        'flag': 'is_public',
+      },
+      'NO_BYPASS': {'flag': 'is_locked'},
+    })
+  return permissions_list
+
+def measure(create):
+  gc.collect()
+  tracemalloc.start()
+  result = create()
+  gc.collect()
+  size = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  return result, size
+
+def main(counts):
+  print('{0:>10} {1:>14} {2:>14} {3:>8} {4:>10}'.format('trees', 'raw bytes', 'compiled bytes', 'ratio', 'nodes'))
+  for count in counts:
+    lp = LogicalPermissions()
+    for name in ['role', 'user', 'flag']:
+      lp.addType(name, lambda permission, context: False)
+
+    permissions_list, raw_size = measure(lambda: createPermissions(count = count))
+    compiled_list, compiled_size = measure(lambda: [lp.compile(permissions) for permissions in permissions_list])
+    nodes = set()
+    for compiled in compiled_list:
+      stack = [compiled.root, compiled.no_bypass]
+      while stack:
+        node = stack.pop()
+        if id(node) not in nodes:
+          nodes.add(id(node))
+          stack.extend(node.children)
+    print('{0:>10} {1:>14} {2:>14} {3:>8.2f} {4:>10}'.format(count, raw_size, compiled_size, float(raw_size) / compiled_size, len(nodes)))
+    del permissions_list, compiled_list, lp
+
+if __name__ == '__main__':
+  main([int(count) for count in sys.argv[1:]] or [10000, 100000, 1000000])
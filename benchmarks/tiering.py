@@ -0,0 +1,45 @@
+"""Compares the evaluation time of a permission tree that checkAccess() is passed in each tier of the tiered execution, and of the same permission tree when it is compiled once and passed to checkAccess() directly.
+
+Usage: python benchmarks/tiering.py [width ...]
+
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from logical_permissions.LogicalPermissions import LogicalPermissions
+
+def createPermissions(width):
+  """Creates a permission tree with width subtrees that each combine a role and a flag with a different logic gate."""
+  gates = ['AND', 'NOR', 'XOR', 'NAND']
+  return {'OR': [{gates[index % len(gates)]: [{'role': 'role{0}'.format(index)}, {'flag': 'flag{0}'.format(index)}]} for index in range(width)]}
+
+def createLogicalPermissions(compile_threshold = None, generate_threshold = None):
+  lp = LogicalPermissions()
+  lp.addType('role', lambda role, context: role in context['roles'])
+  lp.addType('flag', lambda flag, context: flag in context['flags'])
+  lp.setTieringThresholds(compile_threshold = compile_threshold, generate_threshold = generate_threshold)
+  return lp
+
+def measure(check, number):
+  return '{0:.1f}'.format(min(timeit.repeat(check, number = number, repeat = 3)) / number * 1000000)
+
+def main(widths):
+  context = {'roles': ['role1'], 'flags': []}
+  print('{0:>8} {1:>18} {2:>18} {3:>18} {4:>18}'.format('width', 'interpreted (us)', 'compiled (us)', 'generated (us)', 'precompiled (us)'))
+  for width in widths:
+    permissions = createPermissions(width = width)
+    number = max(1, 20000 // width)
+    times = []
+    for thresholds in [{}, {'compile_threshold': 0}, {'compile_threshold': 0, 'generate_threshold': 0}]:
+      lp = createLogicalPermissions(**thresholds)
+      times.append(measure(lambda: lp.checkAccess(permissions, context), number))
+    # the permission tree that is compiled once skips the lookup of the tier of the original permission tree
+    lp = createLogicalPermissions()
+    compiled = lp.compile(permissions)
+    times.append(measure(lambda: lp.checkAccess(compiled, context), number))
+    print('{0:>8} {1:>18} {2:>18} {3:>18} {4:>18}'.format(width, *times))
+
+if __name__ == '__main__':
+  main([int(width) for width in sys.argv[1:]] or [2, 10, 50, 200])
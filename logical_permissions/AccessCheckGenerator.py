@@ -0,0 +1,48 @@
+class AccessCheckGenerator(object):
+  """A generator that evaluates a permission tree without calling the callbacks of the permission types, created by LogicalPermissions::checkAccessGenerator().
+
+  Each value that the generator yields is a frozenset of (type, value) tuples with the permissions whose results are needed next. The results are passed back with send() as a dictionary with the structure {(type, value): access, ...}, and the generator stops with the access result as the value of its StopIteration exception. The access result is also available as the result attribute after the generator has stopped. In Python 3 the generator can be delegated to with yield from.
+
+  """
+
+  def __init__(self, steps):
+    """
+    Args:
+      steps: The internal generator that yields the requested permissions and finally yields the boolean access result
+
+    """
+    self.__steps = steps
+    self.result = None
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    return self.send(None)
+
+  next = __next__
+
+  def send(self, results):
+    """Passes the results of the requested permissions to the evaluation and resumes it.
+
+    Args:
+      results: A dictionary with the structure {(type, value): access, ...} with a boolean or UNKNOWN result for every permission that was requested, or None to start the evaluation.
+
+    Returns:
+      A frozenset of (type, value) tuples with the permissions whose results are needed next.
+
+    """
+    return self.__getRequest(self.__steps.send(results))
+
+  def throw(self, type, value = None, traceback = None):
+    return self.__getRequest(self.__steps.throw(type, value, traceback))
+
+  def close(self):
+    self.__steps.close()
+
+  def __getRequest(self, request):
+    if isinstance(request, bool):
+      self.result = request
+      self.__steps.close()
+      raise StopIteration(request)
+    return request
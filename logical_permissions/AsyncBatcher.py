@@ -0,0 +1,157 @@
+from logical_permissions.exceptions import *
+from logical_permissions.LogicalPermissions import LogicalPermissions, UNKNOWN
+import asyncio
+import functools
+import inspect
+
+class AsyncBatcher(object):
+  """Checks access in asyncio code and coalesces the permission lookups of all concurrent access checks into batches.
+
+  Every access check is evaluated with LogicalPermissions::checkAccessGenerator(). The permissions that the in-flight access checks request during the same iteration of the event loop are collected, and the batch callback of each permission type is then called once with all of them. Permission types without a batch callback are looked up one at a time with LogicalPermissions::partialEvaluate(), so their timeouts, circuit breakers and the cached results of pure permission types apply, with the evaluation timeout and the evaluation budget applying to each lookup separately. If a permission type has a timeout or a circuit breaker, or an evaluation timeout is set, these lookups run in the default executor of the event loop so that a slow callback doesn't block it. A fallback of 'unknown' makes the result of the lookup unknown, which is evaluated in three-valued logic just like in LogicalPermissions::checkAccess(). This module requires Python 3.5 or later.
+
+  """
+
+  def __init__(self, permissions):
+    """
+    Args:
+      permissions: The LogicalPermissions instance with the registered permission types, policies and bypass callback
+
+    """
+    if not isinstance(permissions, LogicalPermissions):
+      raise InvalidArgumentTypeException('The permissions parameter must be a LogicalPermissions instance.')
+
+    self.__permissions = permissions
+    self.__batch_callbacks = {}
+    self.__pending = {}
+    self.__flush_scheduled = False
+    self.__statistics = {'batches': 0, 'lookups': 0}
+
+  def getBatchCallback(self, type):
+    """Gets the batch callback for a permission type.
+
+    Args:
+      type: A string with the name of the permission type
+
+    Returns:
+      The batch callback for the permission type, or None if no batch callback has been set.
+
+    """
+    return self.__batch_callbacks.get(type)
+
+  def setBatchCallback(self, type, callback):
+    """Sets the batch callback for a permission type.
+
+    Args:
+      type: A string with the name of the permission type
+      callback: A callable or coroutine function that is passed a list of (permission, context) tuples and returns a list of booleans with the access result for each of them, in the same order. Lookups of the same permission with the same context object are only passed once. Pass None to remove the batch callback.
+
+    """
+    if not self.__permissions.typeExists(name = type):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(type))
+    if callback is not None and not hasattr(callback, '__call__'):
+      raise InvalidArgumentTypeException('The callback parameter must be a callable data type.')
+
+    if callback is None:
+      self.__batch_callbacks.pop(type, None)
+    else:
+      self.__batch_callbacks[type] = callback
+
+  def getStatistics(self):
+    """Gets statistics for the batcher.
+
+    Returns:
+      A dictionary with the number of calls to batch callbacks and the number of lookups that were passed to them.
+
+    """
+    return dict(self.__statistics)
+
+  async def checkAccessAsync(self, permissions, context = {}, allow_bypass = True):
+    """Checks access for a permission tree.
+
+    Args:
+      permissions: A dictionary, list, string or boolean of the permission tree to be evaluated, or a compiled permission tree from LogicalPermissions::compile()
+      context (optional): A context dictionary that could for example contain the evaluated user and document. Default value is an empty dictionary.
+      allow_bypass (optional): Determines whether bypassing access should be allowed. Default value is True.
+
+    Returns:
+      True if access is granted or False if access is denied.
+
+    """
+    generator = self.__permissions.checkAccessGenerator(permissions = permissions, context = context, allow_bypass = allow_bypass)
+    try:
+      request = next(generator)
+      while True:
+        request = generator.send(await self.__lookup(request = request, context = context))
+    except StopIteration:
+      return generator.result
+
+  async def __lookup(self, request, context):
+    results = {}
+    futures = {}
+    try:
+      for type, value in request:
+        if type in self.__batch_callbacks:
+          futures[(type, value)] = self.__enqueue(type = type, value = value, context = context)
+        else:
+          results[(type, value)] = await self.__checkLeafAccess(type = type, value = value, context = context)
+      for leaf, future in futures.items():
+        results[leaf] = await future
+    finally:
+      # If a lookup raises, the enqueued futures are still awaited so that their exceptions are retrieved. They aren't cancelled,
+      # since other access checks may share them.
+      pending = [future for future in futures.values() if not future.done()]
+      if pending:
+        await asyncio.wait(pending)
+      for future in futures.values():
+        if not future.cancelled():
+          future.exception()
+    return results
+
+  async def __checkLeafAccess(self, type, value, context):
+    # The permission is partially evaluated as the only known type, which leaves it in the residual permission tree if its result is unknown
+    compiled = self.__permissions.compile(permissions = {type: value})
+    if self.__permissions.getTypeTimeout(name = type) is None and self.__permissions.getTypeCircuitBreaker(name = type) is None and self.__permissions.getEvaluationTimeout() is None:
+      residual = self.__permissions.partialEvaluate(permissions = compiled, context = context, known_types = [type])
+    else:
+      evaluate = functools.partial(self.__permissions.partialEvaluate, permissions = compiled, context = context, known_types = [type])
+      residual = await asyncio.get_event_loop().run_in_executor(None, evaluate)
+    if residual.root.gate in ['TRUE', 'FALSE']:
+      return residual.root.gate == 'TRUE'
+    return UNKNOWN
+
+  def __enqueue(self, type, value, context):
+    loop = asyncio.get_event_loop()
+    lookups = self.__pending.setdefault(type, {})
+    key = (value, id(context))
+    if key not in lookups:
+      lookups[key] = (value, context, loop.create_future())
+    if not self.__flush_scheduled:
+      # the batches are dispatched after every access check that is ready in this iteration of the event loop has run
+      self.__flush_scheduled = True
+      loop.call_soon(self.__flush)
+    return lookups[key][2]
+
+  def __flush(self):
+    pending = self.__pending
+    self.__pending = {}
+    self.__flush_scheduled = False
+    for type, lookups in pending.items():
+      asyncio.ensure_future(self.__dispatch(type = type, lookups = list(lookups.values())))
+
+  async def __dispatch(self, type, lookups):
+    self.__statistics['batches'] += 1
+    self.__statistics['lookups'] += len(lookups)
+    try:
+      results = self.__batch_callbacks[type]([(value, context) for value, context, future in lookups])
+      if inspect.isawaitable(results):
+        results = await results
+      if not isinstance(results, (list, tuple)) or len(results) != len(lookups) or not all(isinstance(access, bool) for access in results):
+        raise InvalidCallbackReturnTypeException('The batch callback for the permission type "{0}" must return a list with a boolean for each lookup.'.format(type))
+    except Exception as e:
+      for value, context, future in lookups:
+        if not future.done():
+          future.set_exception(e)
+      return
+    for (value, context, future), access in zip(lookups, results):
+      if not future.done():
+        future.set_result(access)
@@ -0,0 +1,111 @@
+from logical_permissions.exceptions import *
+import collections
+import threading
+
+class CallbackPool(object):
+  """A bounded pool of reusable worker threads that call permission callbacks with a timeout, which LogicalPermissions keeps for each permission type whose callbacks are called with a timeout.
+
+  The worker threads are started when they are needed and are kept for the following calls. A call that times out before a worker has started it is cancelled. A call that times out while it is running can't be interrupted, so it keeps its worker busy until the callback returns. While every worker is busy with such a call, the pool rejects new calls right away instead of queueing them, so a hanging dependency never blocks more than max_workers threads.
+
+  """
+
+  def __init__(self, max_workers = 4):
+    """
+    Args:
+      max_workers (optional): The maximum number of worker threads. Default value is 4.
+
+    """
+    if isinstance(max_workers, bool) or not isinstance(max_workers, int):
+      raise InvalidArgumentTypeException('The max_workers parameter must be an integer.')
+    if max_workers < 1:
+      raise InvalidArgumentValueException('The max_workers parameter must be greater than zero.')
+
+    self.__max_workers = max_workers
+    self.__condition = threading.Condition()
+    self.__queue = collections.deque()
+    self.__workers = 0
+    self.__idle = 0
+    self.__abandoned = 0
+    self.__shutdown = False
+
+  def call(self, callback, args, timeout):
+    """Calls a callback in a worker thread and waits for it to return.
+
+    Args:
+      callback: The callable to call
+      args: A tuple with the arguments for the callback
+      timeout: The number of seconds to wait for the callback to return
+
+    Returns:
+      A tuple with whether the callback returned within the timeout and its return value, or (False, None) if the call timed out or was rejected. An exception that the callback raises is raised again.
+
+    """
+    # Each call holds its state, which is 'queued', 'running' or 'done', whether it was abandoned, its outcome and an event that is set when it is done
+    call = {'callback': callback, 'args': args, 'state': 'queued', 'abandoned': False, 'outcome': None, 'event': threading.Event()}
+    with self.__condition:
+      if self.__abandoned >= self.__max_workers:
+        return (False, None)
+      self.__queue.append(call)
+      if self.__idle == 0 and self.__workers < self.__max_workers:
+        self.__workers += 1
+        thread = threading.Thread(target = self.__work)
+        thread.daemon = True
+        thread.start()
+      else:
+        self.__condition.notify()
+
+    if not call['event'].wait(timeout):
+      with self.__condition:
+        if call['state'] == 'queued':
+          self.__queue.remove(call)
+          return (False, None)
+        if call['state'] == 'running':
+          call['abandoned'] = True
+          self.__abandoned += 1
+          return (False, None)
+
+    success, value = call['outcome']
+    if not success:
+      raise value
+    return (True, value)
+
+  def shutdown(self):
+    """Lets the worker threads exit once they have finished the queued calls."""
+    with self.__condition:
+      self.__shutdown = True
+      self.__condition.notify_all()
+
+  def getStatistics(self):
+    """Gets statistics for the pool.
+
+    Returns:
+      A dictionary with the number of worker threads, the number of them that are idle and the number of them that are busy with a call that timed out.
+
+    """
+    with self.__condition:
+      return {'workers': self.__workers, 'idle': self.__idle, 'abandoned': self.__abandoned}
+
+  def __work(self):
+    while True:
+      with self.__condition:
+        while not self.__queue and not self.__shutdown:
+          self.__idle += 1
+          self.__condition.wait()
+          self.__idle -= 1
+        if not self.__queue:
+          self.__workers -= 1
+          return
+        call = self.__queue.popleft()
+        call['state'] = 'running'
+
+      try:
+        outcome = (True, call['callback'](*call['args']))
+      except Exception as e:
+        outcome = (False, e)
+
+      with self.__condition:
+        call['outcome'] = outcome
+        call['state'] = 'done'
+        if call['abandoned']:
+          self.__abandoned -= 1
+      call['event'].set()
@@ -0,0 +1,167 @@
+from logical_permissions.exceptions import *
+import threading
+import time
+
+# The fallbacks for permissions whose circuit breaker is open
+CIRCUIT_BREAKER_FALLBACKS = ['deny', 'allow', 'raise', 'unknown']
+
+class CircuitBreaker(object):
+  """A circuit breaker for the callback of a permission type, which is set with LogicalPermissions::setTypeCircuitBreaker().
+
+  The circuit breaker starts closed, and every call to the callback is recorded. A call fails if the callback raises an exception, times out or takes longer than the latency threshold. After failure_threshold consecutive failed calls the circuit breaker opens, and the callback isn't called while it is open: the fallback is used as the result of each permission instead. When reset_timeout seconds have passed the circuit breaker becomes half-open and lets a single call through as a probe. If the probe succeeds the circuit breaker closes, otherwise it opens again.
+
+  """
+
+  def __init__(self, failure_threshold = 5, reset_timeout = 30, latency_threshold = None, fallback = 'deny', clock = time.time):
+    """
+    Args:
+      failure_threshold (optional): The number of consecutive failed calls that opens the circuit breaker. Default value is 5.
+      reset_timeout (optional): The number of seconds the circuit breaker stays open before a probe call is let through. Default value is 30.
+      latency_threshold (optional): The number of seconds after which a call counts as failed even though it returned a result, or None if slow calls don't fail. Default value is None.
+      fallback (optional): The result of the permissions while the circuit breaker is open: 'deny', 'allow', 'raise' to raise a CircuitBreakerOpenException, or 'unknown'. See LogicalPermissions::setTypeTimeout() for the 'unknown' fallback. Default value is 'deny'.
+      clock (optional): A callable that returns the current time in seconds. Default value is time.time.
+
+    """
+    if isinstance(failure_threshold, bool) or not isinstance(failure_threshold, int):
+      raise InvalidArgumentTypeException('The failure_threshold parameter must be an integer.')
+    if failure_threshold < 1:
+      raise InvalidArgumentValueException('The failure_threshold parameter must be greater than zero.')
+    if isinstance(reset_timeout, bool) or not isinstance(reset_timeout, (int, float)):
+      raise InvalidArgumentTypeException('The reset_timeout parameter must be a number.')
+    if reset_timeout < 0:
+      raise InvalidArgumentValueException('The reset_timeout parameter cannot be negative.')
+    if latency_threshold is not None and (isinstance(latency_threshold, bool) or not isinstance(latency_threshold, (int, float))):
+      raise InvalidArgumentTypeException('The latency_threshold parameter must be a number or None.')
+    if latency_threshold is not None and latency_threshold <= 0:
+      raise InvalidArgumentValueException('The latency_threshold parameter must be greater than zero.')
+    if fallback not in CIRCUIT_BREAKER_FALLBACKS:
+      raise InvalidArgumentValueException('The fallback parameter must be one of the following values: {0}'.format(','.join(CIRCUIT_BREAKER_FALLBACKS)))
+    if not hasattr(clock, '__call__'):
+      raise InvalidArgumentTypeException('The clock parameter must be a callable data type.')
+
+    self.__failure_threshold = failure_threshold
+    self.__reset_timeout = reset_timeout
+    self.__latency_threshold = latency_threshold
+    self.__fallback = fallback
+    self.__clock = clock
+    self.__lock = threading.Lock()
+    self.__state = 'closed'
+    self.__failures = 0
+    self.__opened_at = None
+    self.__probing = False
+    self.__probe_ticket = None
+    self.__last_ticket = 0
+    self.__statistics = {'calls': 0, 'failures': 0, 'rejections': 0, 'trips': 0}
+
+  def getFallback(self):
+    """Gets the fallback that is used while the circuit breaker is open.
+
+    Returns:
+      One of 'deny', 'allow', 'raise' or 'unknown'.
+
+    """
+    return self.__fallback
+
+  def getClock(self):
+    """Gets the clock of the circuit breaker.
+
+    Returns:
+      The callable that returns the current time in seconds.
+
+    """
+    return self.__clock
+
+  def getState(self):
+    """Gets the state of the circuit breaker.
+
+    Returns:
+      One of 'closed', 'open' or 'half_open'.
+
+    """
+    with self.__lock:
+      self.__updateState()
+      return self.__state
+
+  def allowCall(self):
+    """Checks whether the callback may be called. Every allowed call must be followed by a call to recordSuccess() or recordFailure().
+
+    Returns:
+      A ticket for the call, which is a positive integer, if the callback may be called, or False if the fallback should be used.
+
+    """
+    with self.__lock:
+      self.__updateState()
+      if self.__state == 'closed' or (self.__state == 'half_open' and not self.__probing):
+        self.__last_ticket += 1
+        self.__probing = self.__state == 'half_open'
+        self.__probe_ticket = self.__last_ticket if self.__probing else None
+        self.__statistics['calls'] += 1
+        return self.__last_ticket
+      self.__statistics['rejections'] += 1
+      return False
+
+  def recordSuccess(self, duration, ticket = None):
+    """Records a call to the callback that returned a result.
+
+    A half-open circuit breaker is only closed by the success of the probe call, and successes are ignored while the circuit breaker is open, since they belong to calls that started before it opened.
+
+    Args:
+      duration: The number of seconds the call took. The call counts as failed if it took longer than the latency threshold.
+      ticket (optional): The ticket that allowCall() returned for the call, or None to count the success as the probe call while the circuit breaker is half-open. Default value is None.
+
+    """
+    if self.__latency_threshold is not None and duration > self.__latency_threshold:
+      self.recordFailure()
+      return
+    with self.__lock:
+      self.__updateState()
+      if self.__state == 'open':
+        return
+      if self.__state == 'half_open':
+        if not self.__probing or (ticket is not None and ticket != self.__probe_ticket):
+          return
+        self.__state = 'closed'
+        self.__probing = False
+        self.__probe_ticket = None
+      self.__failures = 0
+
+  def recordFailure(self):
+    """Records a call to the callback that failed."""
+    with self.__lock:
+      self.__statistics['failures'] += 1
+      self.__failures += 1
+      if self.__state == 'half_open' or self.__failures >= self.__failure_threshold:
+        if self.__state != 'open':
+          self.__statistics['trips'] += 1
+        self.__state = 'open'
+        self.__opened_at = self.__clock()
+      self.__probing = False
+      self.__probe_ticket = None
+
+  def reset(self):
+    """Closes the circuit breaker and forgets the failed calls."""
+    with self.__lock:
+      self.__state = 'closed'
+      self.__failures = 0
+      self.__probing = False
+      self.__probe_ticket = None
+
+  def getStatistics(self):
+    """Gets statistics for the circuit breaker.
+
+    Returns:
+      A dictionary with the state of the circuit breaker, the number of consecutive failed calls and the total number of allowed calls, failed calls, rejected calls and trips.
+
+    """
+    with self.__lock:
+      self.__updateState()
+      statistics = dict(self.__statistics)
+      statistics['state'] = self.__state
+      statistics['consecutive_failures'] = self.__failures
+    return statistics
+
+  def __updateState(self):
+    if self.__state == 'open' and self.__clock() - self.__opened_at >= self.__reset_timeout:
+      self.__state = 'half_open'
+      self.__probing = False
+      self.__probe_ticket = None
@@ -0,0 +1,60 @@
+import sys
+
+class CompiledPermissions(object):
+  """A permission tree that has been validated and compiled by LogicalPermissions::compile().
+
+  A compiled permission tree can be passed to LogicalPermissions::checkAccess() and LogicalPermissions::checkAccessMany() instead of the original permission tree. Compiled permission trees with the same nodes compare equal.
+
+  Attributes:
+    root: The PermissionNode that is evaluated to decide access.
+    no_bypass: The PermissionNode for the NO_BYPASS condition, or None if the permission tree has no NO_BYPASS key.
+
+  """
+
+  __slots__ = ('root', 'no_bypass', '__hash', '__weakref__')
+
+  def __init__(self, root, no_bypass = None):
+    self.root = root
+    self.no_bypass = no_bypass
+    self.__hash = hash((root, no_bypass))
+
+  def __eq__(self, other):
+    if self is other:
+      return True
+    if not isinstance(other, CompiledPermissions) or self.__hash != other.__hash:
+      return False
+    return self.root is other.root and self.no_bypass is other.no_bypass
+
+  def __ne__(self, other):
+    return not self.__eq__(other)
+
+  def __hash__(self):
+    return self.__hash
+
+  def getMemoryFootprint(self):
+    """Gets the memory used by the compiled permission tree.
+
+    Nodes that are shared with other compiled permission trees are included, but referenced policies and the interned type and permission strings are not.
+
+    Returns:
+      A dictionary with the structure {'nodes': 3, 'bytes': 344} with the number of distinct nodes and their size in bytes including the compiled permission tree object.
+
+    """
+    visited = set()
+    size = sys.getsizeof(self)
+    stack = [node for node in [self.root, self.no_bypass] if node is not None]
+    while stack:
+      node = stack.pop()
+      if id(node) in visited:
+        continue
+      visited.add(id(node))
+      size += sys.getsizeof(node)
+      if node.children:
+        size += sys.getsizeof(node.children)
+        stack.extend(node.children)
+    return {'nodes': len(visited), 'bytes': size}
+
+  def __repr__(self):
+    if self.no_bypass is None:
+      return 'CompiledPermissions({0!r})'.format(self.root)
+    return 'CompiledPermissions({0!r}, no_bypass = {1!r})'.format(self.root, self.no_bypass)
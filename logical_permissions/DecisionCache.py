@@ -0,0 +1,173 @@
+from logical_permissions.exceptions import *
+from collections import OrderedDict
+import threading
+import time
+
+class DecisionCache(object):
+  """A cache for access decisions that can be shared between calls to LogicalPermissions::checkAccess().
+
+  Decisions are cached for compiled permission trees and are keyed by the compiled permission tree, the allow_bypass parameter and a fingerprint of the context. The fingerprint callback decides which parts of the context a decision depends on, so it must include every context value that the permission type callbacks and the bypass callback read. Decisions are only reused while the registered types and bypass callback of the LogicalPermissions instance are unchanged, and the decisions that evaluated a policy are discarded when the policy is changed.
+
+  """
+
+  def __init__(self, fingerprint, ttl = None, max_size = 10000, clock = time.time):
+    """
+    Args:
+      fingerprint: A callable that is passed the context dictionary and returns a hashable fingerprint of the parts of the context that access decisions depend on. If it returns None the decision is not cached.
+      ttl (optional): The number of seconds a decision is cached, or None if decisions never expire. Default value is None.
+      max_size (optional): The maximum number of cached decisions. The least recently used decision is evicted when the cache is full. Default value is 10000.
+      clock (optional): A callable that returns the current time in seconds. Default value is time.time.
+
+    """
+    if not hasattr(fingerprint, '__call__'):
+      raise InvalidArgumentTypeException('The fingerprint parameter must be a callable data type.')
+    if ttl is not None and (isinstance(ttl, bool) or not isinstance(ttl, (int, float))):
+      raise InvalidArgumentTypeException('The ttl parameter must be a number or None.')
+    if ttl is not None and ttl <= 0:
+      raise InvalidArgumentValueException('The ttl parameter must be greater than zero.')
+    if isinstance(max_size, bool) or not isinstance(max_size, int):
+      raise InvalidArgumentTypeException('The max_size parameter must be an integer.')
+    if max_size < 1:
+      raise InvalidArgumentValueException('The max_size parameter must be greater than zero.')
+    if not hasattr(clock, '__call__'):
+      raise InvalidArgumentTypeException('The clock parameter must be a callable data type.')
+
+    self.__fingerprint = fingerprint
+    self.__ttl = ttl
+    self.__max_size = max_size
+    self.__clock = clock
+    self.__entries = OrderedDict()
+    self.__tags = {}
+    self.__lock = threading.Lock()
+    self.__statistics = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+  def getFingerprint(self, context):
+    """Gets the fingerprint of a context.
+
+    Args:
+      context: A context dictionary
+
+    Returns:
+      The hashable fingerprint, or None if decisions for the context should not be cached.
+
+    """
+    return self.__fingerprint(context)
+
+  def get(self, key, version):
+    """Gets a cached decision.
+
+    Args:
+      key: The hashable key of the decision
+      version: The registry version of the LogicalPermissions instance. Decisions that were cached with another version are discarded.
+
+    Returns:
+      The cached decision, or None if no valid decision is cached.
+
+    """
+    with self.__lock:
+      entry = self.__entries.pop(key, None)
+      if entry is not None:
+        access, expires, entry_version, tags = entry
+        if entry_version != version:
+          self.__removeTags(key = key, tags = tags)
+          entry = None
+        elif expires is not None and expires <= self.__clock():
+          self.__removeTags(key = key, tags = tags)
+          self.__statistics['expirations'] += 1
+          entry = None
+      if entry is None:
+        self.__statistics['misses'] += 1
+        return None
+
+      # reinserting the entry marks it as the most recently used
+      self.__entries[key] = entry
+      self.__statistics['hits'] += 1
+      return access
+
+  def set(self, key, access, version, tags = ()):
+    """Caches a decision.
+
+    Args:
+      key: The hashable key of the decision
+      access: The boolean decision
+      version: The registry version of the LogicalPermissions instance
+      tags (optional): An iterable of (type, value) tuples with the permissions that the decision depended on. Default value is an empty tuple.
+
+    """
+    expires = None
+    if self.__ttl is not None:
+      expires = self.__clock() + self.__ttl
+    tags = frozenset(tags)
+    with self.__lock:
+      self.__removeEntry(key = key)
+      self.__entries[key] = (access, expires, version, tags)
+      for type, value in tags:
+        self.__tags.setdefault(type, {}).setdefault(value, set()).add(key)
+      while len(self.__entries) > self.__max_size:
+        self.__removeEntry(key = next(iter(self.__entries)))
+        self.__statistics['evictions'] += 1
+
+  def invalidate(self, type = None, value = None):
+    """Removes the cached decisions that depended on a permission type or a single permission.
+
+    Only the affected decisions are removed, and the time it takes is proportional to the number of removed decisions.
+
+    Args:
+      type (optional): A string with the name of the permission type, or None to remove all cached decisions. Default value is None.
+      value (optional): A permission string of the permission type, such as a role, or None to remove the decisions that depended on any permission of the type. Default value is None.
+
+    """
+    if type is None and value is not None:
+      raise InvalidArgumentValueException('The value parameter cannot be used without the type parameter.')
+
+    with self.__lock:
+      if type is None:
+        self.__statistics['invalidations'] += len(self.__entries)
+        self.__entries.clear()
+        self.__tags.clear()
+        return
+
+      values = self.__tags.get(type, {})
+      keys = set()
+      if value is None:
+        for value_keys in values.values():
+          keys |= value_keys
+      else:
+        keys = set(values.get(value, ()))
+      for key in keys:
+        self.__removeEntry(key = key)
+      self.__statistics['invalidations'] += len(keys)
+
+  def clear(self):
+    """Removes all cached decisions."""
+    with self.__lock:
+      self.__entries.clear()
+      self.__tags.clear()
+
+  def getStatistics(self):
+    """Gets statistics for the cache.
+
+    Returns:
+      A dictionary with the number of cache hits, misses, evictions, expirations and invalidations and the current size of the cache.
+
+    """
+    with self.__lock:
+      statistics = dict(self.__statistics)
+      statistics['size'] = len(self.__entries)
+    return statistics
+
+  def __removeEntry(self, key):
+    entry = self.__entries.pop(key, None)
+    if entry is not None:
+      self.__removeTags(key = key, tags = entry[3])
+
+  def __removeTags(self, key, tags):
+    for type, value in tags:
+      values = self.__tags.get(type)
+      if values is None or value not in values:
+        continue
+      values[value].discard(key)
+      if not values[value]:
+        del values[value]
+        if not values:
+          del self.__tags[type]
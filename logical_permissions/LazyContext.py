@@ -0,0 +1,137 @@
+from logical_permissions.exceptions import *
+import threading
+
+class LazyContext(dict):
+  """A context dictionary with values that are loaded on first use.
+
+  A LazyContext can be passed as the context parameter anywhere a context dictionary is accepted. Each lazy value is loaded by its loader the first time a permission type callback or the bypass callback reads it, and is loaded at most once, also when it is read from a copy of the context. Reading all values, for example with items() or values(), loads every lazy value. Iterating over the keys or checking whether a key exists doesn't load any values.
+
+  """
+
+  def __init__(self, values = None, loaders = None):
+    """
+    Args:
+      values (optional): A dictionary with the values that are known in advance. Default value is None.
+      loaders (optional): A dictionary with the structure {key: loader, ...} where each loader is a callable that is passed the LazyContext and returns the value for the key. Default value is None.
+
+    """
+    if values is None:
+      values = {}
+    if loaders is None:
+      loaders = {}
+    if not isinstance(values, dict):
+      raise InvalidArgumentTypeException('The values parameter must be a dictionary.')
+    if not isinstance(loaders, dict):
+      raise InvalidArgumentTypeException('The loaders parameter must be a dictionary.')
+    for key, loader in loaders.items():
+      if not hasattr(loader, '__call__'):
+        raise InvalidArgumentTypeException('The loader for the context key "{0}" must be a callable data type.'.format(key))
+
+    dict.__init__(self, values)
+    self.__loaders = dict((key, loader) for key, loader in loaders.items() if key not in values)
+    self.__loaded = {}
+    self.__lock = threading.RLock()
+    self.__pending = set(self.__loaders)
+
+  def isLoaded(self, key):
+    """Checks whether the value for a key is available without calling a loader.
+
+    Args:
+      key: A context key
+
+    Returns:
+      False if the key has a lazy value that hasn't been loaded yet, otherwise True.
+
+    """
+    return key not in self.__getPendingKeys() or key in self.__loaded
+
+  def get(self, key, default = None):
+    if key in self:
+      return self[key]
+    return default
+
+  def setdefault(self, key, default = None):
+    if key not in self:
+      self[key] = default
+    return self[key]
+
+  def pop(self, key, *args):
+    if key in self.__getPendingKeys():
+      self.__missing__(key)
+      return dict.pop(self, key)
+    return dict.pop(self, key, *args)
+
+  def keys(self):
+    return list(self)
+
+  def values(self):
+    return [self[key] for key in self]
+
+  def items(self):
+    return [(key, self[key]) for key in self]
+
+  def copy(self):
+    """Copies the context without loading any values. The copy shares the loaded values with the original context."""
+    context = LazyContext(values = dict((key, dict.__getitem__(self, key)) for key in dict.__iter__(self)))
+    context.__loaders = self.__loaders
+    context.__loaded = self.__loaded
+    context.__lock = self.__lock
+    context.__pending = set(self.__getPendingKeys())
+    return context
+
+  def clear(self):
+    dict.clear(self)
+    self.__pending.clear()
+
+  def __missing__(self, key):
+    if key not in self.__pending:
+      raise KeyError(key)
+    with self.__lock:
+      if key not in self.__loaded:
+        self.__loaded[key] = self.__loaders[key](self)
+    value = self.__loaded[key]
+    dict.__setitem__(self, key, value)
+    self.__pending.discard(key)
+    return value
+
+  def __setitem__(self, key, value):
+    self.__pending.discard(key)
+    dict.__setitem__(self, key, value)
+
+  def __delitem__(self, key):
+    if key in self.__getPendingKeys():
+      self.__pending.discard(key)
+      return
+    self.__pending.discard(key)
+    dict.__delitem__(self, key)
+
+  def __contains__(self, key):
+    return dict.__contains__(self, key) or key in self.__pending
+
+  def __iter__(self):
+    for key in dict.__iter__(self):
+      yield key
+    for key in self.__getPendingKeys():
+      yield key
+
+  def __len__(self):
+    return dict.__len__(self) + len(self.__getPendingKeys())
+
+  def __eq__(self, other):
+    if not isinstance(other, dict):
+      return NotImplemented
+    return dict(self.items()) == dict(other.items())
+
+  def __ne__(self, other):
+    result = self.__eq__(other)
+    if result is NotImplemented:
+      return result
+    return not result
+
+  __hash__ = None
+
+  def __repr__(self):
+    return 'LazyContext({0}, pending={1})'.format(dict.__repr__(self), sorted(self.__getPendingKeys(), key = repr))
+
+  def __getPendingKeys(self):
+    return [key for key in self.__pending if not dict.__contains__(self, key)]
@@ -1,18 +1,81 @@
 from logical_permissions.exceptions import *
+from logical_permissions.PermissionCompiler import PermissionCompiler
+from logical_permissions.CompiledPermissions import CompiledPermissions
+from logical_permissions.DecisionCache import DecisionCache
+from logical_permissions.CircuitBreaker import CircuitBreaker
+from logical_permissions.CallbackPool import CallbackPool
+from logical_permissions.PopulationIndex import PopulationIndex
+from logical_permissions.AccessCheckGenerator import AccessCheckGenerator
+from collections import OrderedDict
 import copy
+import marshal
+import time
+import weakref
+
+# The logic gates that are equivalent to the modes of MASK nodes
+MASK_FALLBACK_GATES = {'ANY': 'OR', 'ALL': 'AND', 'NOT_ANY': 'NOR', 'NOT_ALL': 'NAND', 'XOR': 'XOR'}
+
+# The fallbacks for permission callbacks that time out
+TIMEOUT_FALLBACKS = ['deny', 'allow', 'raise', 'unknown']
+
+# The maximum number of worker threads that call the callbacks of a permission type with a timeout
+CALLBACK_POOL_SIZE = 4
+
+# The result of a permission whose callback timed out with the 'unknown' fallback
+UNKNOWN = object()
+
+# The projection of a context key that is missing, for the cached results of pure permission types
+MISSING_CONTEXT_VALUE = object()
 
 class LogicalPermissions(object):
 
   def __init__(self):
     self.__types = {}
     self.__bypass_callback = None
-
-  def addType(self, name, callback):
+    self.__policies = {}
+    self.__policy_references = {}
+    self.__policy_referrers = {}
+    self.__policy_leaves = {}
+    self.__leaf_policies = {}
+    self.__policy_stamps = {}
+    self.__policy_stamp = 0
+    self.__type_universes = {}
+    self.__universe_values = {}
+    self.__compiler = PermissionCompiler(type_exists = self.typeExists, type_universe = self.__getTypeUniverse)
+    self.__compiled_policies = {}
+    self.__sql_builders = {}
+    self.__prefetch_callbacks = {}
+    self.__type_timeouts = {}
+    self.__evaluation_timeout = None
+    self.__timeout_counts = {}
+    self.__callback_pools = {}
+    self.__unknown_fallback = False
+    self.__circuit_breakers = {}
+    self.__evaluation_budget = None
+    self.__limited = False
+    self.__decision_cache = None
+    self.__version = 0
+    self.__type_dependencies = {}
+    self.__leaf_cache = {}
+    self.__leaf_cache_size = 0
+    self.__leaf_cache_max_size = 100000
+    self.__required_leaves = weakref.WeakKeyDictionary()
+    self.__tiering_thresholds = None
+    self.__tree_tiers = OrderedDict()
+    self.__tree_tiers_max_size = 10000
+    self.__compiled_counts = weakref.WeakKeyDictionary()
+    self.__generated_code = weakref.WeakKeyDictionary()
+    self.__filter_residuals_max_size = 1000
+
+  def addType(self, name, callback, context_keys = None, pure = False, prefetch = None):
     """Adds a permission type.
 
     Args:
       name: A string with the name of the permission type
       callback: The callback that evaluates the permission type. Upon calling checkAccess() the registered callback will be passed two parameters: a permission string (such as a role) and the context dictionary passed to checkAccess(). The permission will always be a single string even if for example multiple roles are accepted. In that case the callback will be called once for each role that is to be evaluated. The callback should return a boolean which determines whether access should be granted.
+      context_keys (optional): A list of the context keys that the callback reads, or None if the callback may read anything from the context. Nested values can be declared as key paths, either as a string with the keys separated by dots such as 'user.roles' or as a tuple of keys. Default value is None.
+      pure (optional): Determines whether the callback is pure, which means that its result only depends on the permission string and the declared context keys and that it has no side effects. The results of pure callbacks with declared context keys are cached across calls to checkAccess() and across permission trees. Default value is False.
+      prefetch (optional): A prefetch callback for the permission type. See LogicalPermissions::setTypePrefetch(). Default value is None.
 
     """
     if not isinstance(name, str):
@@ -25,10 +88,16 @@ class LogicalPermissions(object):
       raise PermissionTypeAlreadyExistsException('The type "{0}" already exists! If you want to change the callback for an existing type, please use LogicalPermissions:setTypeCallback().'.format(name))
     if not hasattr(callback, '__call__'):
       raise InvalidArgumentTypeException('The callback parameter must be a callable data type.')
+    if prefetch is not None and not hasattr(prefetch, '__call__'):
+      raise InvalidArgumentTypeException('The prefetch parameter must be a callable data type.')
+    dependencies = self.__normalizeTypeDependencies(context_keys = context_keys, pure = pure)
 
     types = self.getTypes()
     types[name] = callback
     self.setTypes(types = types)
+    self.__setTypeDependencies(name = name, dependencies = dependencies)
+    if prefetch is not None:
+      self.__prefetch_callbacks[name] = prefetch
 
   def removeType(self, name):
     """Removes a permission type.
@@ -86,12 +155,14 @@ class LogicalPermissions(object):
     types = self.getTypes()
     return types[name]
 
-  def setTypeCallback(self, name, callback):
+  def setTypeCallback(self, name, callback, context_keys = None, pure = False):
     """Changes the callback for an existing permission type.
 
     Args:
       name: A string with the name of the permission type
       callback: The callback that evaluates the permission type. Upon calling checkAccess() the registered callback will be passed two parameters: a permission string (such as a role) and the context dictionary passed to checkAccess(). The permission will always be a single string even if for example multiple roles are accepted. In that case the callback will be called once for each role that is to be evaluated. The callback should return a boolean which determines whether access should be granted.
+      context_keys (optional): A list of the context keys that the callback reads, or None if the callback may read anything from the context. Nested values can be declared as key paths, either as a string with the keys separated by dots such as 'user.roles' or as a tuple of keys. Default value is None.
+      pure (optional): Determines whether the callback is pure, which means that its result only depends on the permission string and the declared context keys and that it has no side effects. Cached results for the type are discarded when the callback or the declarations change. The results of pure callbacks with declared context keys are cached across calls to checkAccess() and across permission trees. Default value is False.
 
     """
     if not isinstance(name, str):
@@ -102,10 +173,34 @@ class LogicalPermissions(object):
       raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
     if not hasattr(callback, '__call__'):
       raise InvalidArgumentTypeException('The callback parameter must be a callable data type.')
+    dependencies = self.__normalizeTypeDependencies(context_keys = context_keys, pure = pure)
 
     types = self.getTypes()
     types[name] = callback
     self.setTypes(types = types)
+    self.__setTypeDependencies(name = name, dependencies = dependencies)
+
+  def getTypeDependencies(self, name):
+    """Gets the declared context dependencies of a permission type.
+
+    Args:
+      name: A string with the name of the permission type
+
+    Returns:
+      A dictionary with the structure {'context_keys': [('user', 'roles'), ...], 'pure': True} where each context key is a tuple of keys, or None if the callback may read anything from the context.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.typeExists(name = name):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+
+    dependencies = self.__type_dependencies.get(name)
+    if dependencies is None:
+      return None
+    return {'context_keys': list(dependencies[0]), 'pure': dependencies[1]}
 
   def getTypes(self):
     """Gets all defined permission types.
@@ -135,7 +230,405 @@ class LogicalPermissions(object):
       if not hasattr(types[name], '__call__'):
         raise InvalidArgumentValueException('The types callbacks must be callables.')
 
+    for name in list(self.__type_dependencies):
+      if types.get(name) is not self.__types.get(name):
+        self.__setTypeDependencies(name = name, dependencies = None)
+    for name in list(self.__leaf_cache):
+      if types.get(name) is not self.__types.get(name):
+        self.__clearLeafCache(type = name)
+    if any(name not in types for name in self.__types):
+      # interned permission trees may reference the removed types
+      self.__compiler.clearTrees()
     self.__types = copy.copy(types)
+    self.__version += 1
+    self.__sql_builders = dict((name, builder) for name, builder in self.__sql_builders.items() if name in types)
+    self.__prefetch_callbacks = dict((name, prefetch) for name, prefetch in self.__prefetch_callbacks.items() if name in types)
+    self.__type_universes = dict((name, universe) for name, universe in self.__type_universes.items() if name in types)
+    self.__type_timeouts = dict((name, timeout) for name, timeout in self.__type_timeouts.items() if name in types)
+    self.__circuit_breakers = dict((name, breaker) for name, breaker in self.__circuit_breakers.items() if name in types)
+    for name in [name for name in self.__callback_pools if name not in types]:
+      self.__callback_pools.pop(name).shutdown()
+    self.__updateUnknownFallback()
+
+  def getTypeSqlBuilder(self, name):
+    """Gets the SQL builder for a permission type.
+
+    Args:
+      name: A string with the name of the permission type
+
+    Returns:
+      The SQL builder for the permission type, or None if no SQL builder has been set.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.typeExists(name = name):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+
+    return self.__sql_builders.get(name)
+
+  def setTypeSqlBuilder(self, name, builder):
+    """Sets the SQL builder for a permission type, which is used by LogicalPermissions::toSqlWhere().
+
+    Args:
+      name: A string with the name of the permission type
+      builder: The callable that translates a permission of the type into an SQL condition. It will be passed two parameters: a permission string (such as a role) and the context dictionary passed to toSqlWhere(). It should return a tuple with an SQL condition string that uses positional placeholders and a list of the parameters for the placeholders, for example ('author_id = ?', [user_id]). The condition must never evaluate to NULL. Pass None to remove the SQL builder.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.typeExists(name = name):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+    if builder is not None and not hasattr(builder, '__call__'):
+      raise InvalidArgumentTypeException('The builder parameter must be a callable data type.')
+
+    if builder is None:
+      self.__sql_builders.pop(name, None)
+    else:
+      self.__sql_builders[name] = builder
+
+  def getTypePrefetch(self, name):
+    """Gets the prefetch callback for a permission type.
+
+    Args:
+      name: A string with the name of the permission type
+
+    Returns:
+      The prefetch callback for the permission type, or None if no prefetch callback has been set.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.typeExists(name = name):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+
+    return self.__prefetch_callbacks.get(name)
+
+  def setTypePrefetch(self, name, prefetch):
+    """Sets the prefetch callback for a permission type.
+
+    When a permission tree is evaluated with checkAccess(), checkAccessMany() or filter(), the prefetch callback is called once per evaluation before the first permission of the type is evaluated. It will be passed two parameters: a frozenset with every permission of the type that the evaluated permission trees can consult, and the context dictionary. It should return a dictionary with the structure {permission: boolean, ...} with the results that it could load in bulk. The results are used instead of calling the regular callback, which is still called for the permissions that are missing from the dictionary.
+
+    Args:
+      name: A string with the name of the permission type
+      prefetch: The prefetch callback, or None to remove the prefetch callback.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.typeExists(name = name):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+    if prefetch is not None and not hasattr(prefetch, '__call__'):
+      raise InvalidArgumentTypeException('The prefetch parameter must be a callable data type.')
+
+    if prefetch is None:
+      self.__prefetch_callbacks.pop(name, None)
+    else:
+      self.__prefetch_callbacks[name] = prefetch
+
+  def getTypeUniverse(self, name):
+    """Gets the universe of a permission type.
+
+    Args:
+      name: A string with the name of the permission type
+
+    Returns:
+      A dictionary with the structure {'values': ['admin', 'editor', ...], 'values_callback': values_callback}, or None if no universe has been set.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.typeExists(name = name):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+
+    universe = self.__type_universes.get(name)
+    if universe is None:
+      return None
+    return {'values': list(universe[0]), 'values_callback': universe[2]}
+
+  def setTypeUniverse(self, name, values, values_callback = None):
+    """Sets the universe of a permission type, which is the finite list of all permissions of the type, such as all roles.
+
+    Permission trees that are compiled after the universe has been set evaluate the permissions in the universe with bitmasks instead of calling the callback of the type. For example {'role': {'AND': ['admin', 'editor']}} is evaluated by checking that both bits are set in the bitmask of the roles in the context. The values callback is called at most once per evaluation to get the permissions in the context, which are then encoded as a bitmask. The permissions in the context must be exactly those that the callback of the type grants access to. Compiled permission trees that were compiled for another universe fall back to calling the callback.
+
+    Args:
+      name: A string with the name of the permission type
+      values: A list with all permissions of the type, or None to remove the universe.
+      values_callback (optional): A callable that is passed the context dictionary and returns a list, tuple, set or frozenset with the permissions of the type that are granted in the context. It is required if values is not None. Default value is None.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.typeExists(name = name):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+    if values is not None:
+      if not isinstance(values, (list, tuple)):
+        raise InvalidArgumentTypeException('The values parameter must be a list or None.')
+      if not all(isinstance(value, str) for value in values):
+        raise InvalidArgumentValueException('The values of a universe must be strings.')
+      if not hasattr(values_callback, '__call__'):
+        raise InvalidArgumentTypeException('The values_callback parameter must be a callable data type.')
+
+    if values is None:
+      self.__type_universes.pop(name, None)
+    else:
+      values = tuple(sorted(set(values)))
+      # equal universes share the same tuple, so that compiled MASK nodes stay valid when a universe is set again
+      values = self.__universe_values.setdefault(values, values)
+      bits = dict((value, 1 << index) for index, value in enumerate(values))
+      self.__type_universes[name] = (values, bits, values_callback)
+    self.__compiler.clearTrees()
+    self.__version += 1
+
+  def getTruthTableBitLimit(self):
+    """Gets the maximum number of universe permissions that a subtree can depend on to be compiled into a truth table.
+
+    Returns:
+      An integer with the maximum number of permissions.
+
+    """
+    return self.__compiler.getTruthTableBitLimit()
+
+  def setTruthTableBitLimit(self, limit):
+    """Sets the maximum number of universe permissions that a subtree can depend on to be compiled into a truth table.
+
+    When a subtree of a permission tree only consists of logic gates over permissions in universes, see LogicalPermissions::setTypeUniverse(), its result only depends on which of those permissions are granted. If the subtree depends on at most this many permissions, the results for all combinations are precomputed when the permission tree is compiled, and evaluating the subtree becomes a single lookup in the truth table. Larger subtrees are evaluated normally. The truth table of a subtree that depends on n permissions has 2 ** n entries. The default limit is 8.
+
+    Args:
+      limit: An integer between 0 and 20 with the maximum number of permissions. Zero disables truth tables.
+
+    """
+    self.__compiler.setTruthTableBitLimit(limit)
+
+  def getTreeLimits(self):
+    """Gets the size limits for compiled permission trees.
+
+    Returns:
+      A dictionary with the structure {'max_nodes': max_nodes, 'max_depth': max_depth, 'max_leaves_per_type': max_leaves_per_type}, where a limit is None if it isn't set.
+
+    """
+    return self.__compiler.getTreeLimits()
+
+  def setTreeLimits(self, max_nodes = None, max_depth = None, max_leaves_per_type = None):
+    """Sets the size limits for compiled permission trees, for example for permission trees and policies that are written by untrusted users.
+
+    The limits are checked while a permission tree or policy is compiled, and a permission tree that exceeds a limit raises a PermissionLimitExceededException as soon as that is certain, without compiling the rest of it. The rejection is remembered, so passing the same permission tree again raises the exception right away. The limits apply to the compiled nodes, so identical subtrees are only counted once and a policy reference counts as a single node, while each policy is checked separately. When a limit is set, checkAccess() compiles the permission trees that it is passed. Permission trees that were compiled before the limits were set are not checked again.
+
+    Args:
+      max_nodes (optional): The maximum number of distinct nodes in a compiled permission tree, or None for no limit. Default value is None.
+      max_depth (optional): The maximum number of nodes on a path from the root of a compiled permission tree, or None for no limit. Default value is None.
+      max_leaves_per_type (optional): The maximum number of distinct permissions of a single permission type in a compiled permission tree, or None for no limit. Default value is None.
+
+    """
+    self.__compiler.setTreeLimits(max_nodes = max_nodes, max_depth = max_depth, max_leaves_per_type = max_leaves_per_type)
+    self.__compiled_policies = {}
+    self.__updateLimited()
+
+  def getTieringThresholds(self):
+    """Gets the thresholds for the tiered execution of permission trees.
+
+    Returns:
+      A dictionary with the structure {'compile_threshold': compile_threshold, 'generate_threshold': generate_threshold}, or None if tiered execution is disabled.
+
+    """
+    if self.__tiering_thresholds is None:
+      return None
+    return {'compile_threshold': self.__tiering_thresholds[0], 'generate_threshold': self.__tiering_thresholds[1]}
+
+  def setTieringThresholds(self, compile_threshold = None, generate_threshold = None):
+    """Sets the thresholds for the tiered execution of permission trees, which only spends time on compiling the permission trees that are evaluated often.
+
+    checkAccess() counts how many times each distinct permission tree that isn't compiled is evaluated. Such a permission tree is interpreted until it has been evaluated compile_threshold times, and is then compiled like with compile(), but keeping the order of the children of its logic gates, and evaluated by walking its compiled nodes. After a compiled permission tree has been evaluated generate_threshold times, a Python function is generated for it with PermissionCompiler::generateCode() and used for the following evaluations, which also applies to compiled permission trees that are passed to checkAccess(), checkAccessMany() and checkAccessTrusted() directly. The generated function isn't used while an evaluation budget is set or while a fallback is 'unknown', and no function is generated for very large permission trees. A permission tree that can only be interpreted, because compiling it raises an exception, stays interpreted. The number of permission trees in each tier is reported by LogicalPermissions::getStatistics(). Changing the thresholds resets the counts.
+
+    Args:
+      compile_threshold (optional): The number of times a permission tree is interpreted before it is compiled, or None to never compile permission trees that are passed to checkAccess(). Default value is None.
+      generate_threshold (optional): The number of times a compiled permission tree is evaluated before a function is generated for it, or None to never generate functions. Default value is None.
+
+    """
+    for name, threshold in [('compile_threshold', compile_threshold), ('generate_threshold', generate_threshold)]:
+      if threshold is not None and (isinstance(threshold, bool) or not isinstance(threshold, int)):
+        raise InvalidArgumentTypeException('The {0} parameter must be an integer or None.'.format(name))
+      if threshold is not None and threshold < 0:
+        raise InvalidArgumentValueException('The {0} parameter cannot be negative.'.format(name))
+
+    if compile_threshold is None and generate_threshold is None:
+      self.__tiering_thresholds = None
+    else:
+      self.__tiering_thresholds = (compile_threshold, generate_threshold)
+    self.__tree_tiers = OrderedDict()
+    self.__compiled_counts = weakref.WeakKeyDictionary()
+    self.__generated_code = weakref.WeakKeyDictionary()
+
+  def getTypeTimeout(self, name):
+    """Gets the timeout for the callback of a permission type.
+
+    Args:
+      name: A string with the name of the permission type
+
+    Returns:
+      A dictionary with the structure {'timeout': timeout, 'fallback': fallback}, or None if no timeout has been set.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.typeExists(name = name):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+
+    timeout = self.__type_timeouts.get(name)
+    if timeout is None:
+      return None
+    return {'timeout': timeout[0], 'fallback': timeout[1]}
+
+  def setTypeTimeout(self, name, timeout, fallback = 'deny'):
+    """Sets the timeout for the callback of a permission type.
+
+    The callback is called in a worker thread, and if it doesn't return within the timeout the fallback is used as the result of the permission instead. The callback can't be interrupted, so it keeps running in the background. Each permission type has a pool of at most CALLBACK_POOL_SIZE worker threads that are reused between calls, and while all of them are busy with calls that timed out, the fallback is used right away without calling the callback. The fallback 'deny' denies the permission, 'allow' grants it and 'raise' raises a PermissionTimeoutException. The fallback 'unknown' treats the result of the permission as unknown, and the logic gates are still decided by their other children when possible, so for example an OR gate with another child that grants access still grants access. If the access result depends on an unknown permission, access is denied, and if a NO_BYPASS condition depends on one, bypassing access is not allowed. Decisions that used a fallback are not cached.
+
+    Args:
+      name: A string with the name of the permission type
+      timeout: The number of seconds to wait for the callback, or None to remove the timeout.
+      fallback (optional): One of 'deny', 'allow', 'raise' or 'unknown'. Default value is 'deny'.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.typeExists(name = name):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+    self.__validateTimeout(timeout = timeout, fallback = fallback)
+
+    if timeout is None:
+      self.__type_timeouts.pop(name, None)
+    else:
+      self.__type_timeouts[name] = (timeout, fallback)
+    self.__updateUnknownFallback()
+
+  def getEvaluationTimeout(self):
+    """Gets the timeout for the evaluation of a permission tree.
+
+    Returns:
+      A dictionary with the structure {'timeout': timeout, 'fallback': fallback}, or None if no timeout has been set.
+
+    """
+    if self.__evaluation_timeout is None:
+      return None
+    return {'timeout': self.__evaluation_timeout[0], 'fallback': self.__evaluation_timeout[1]}
+
+  def setEvaluationTimeout(self, timeout, fallback = 'deny'):
+    """Sets the timeout for the evaluation of a permission tree, which is an overall deadline for all permission callbacks that are called by a single access check.
+
+    Once the deadline has passed, the fallback is used for every remaining permission without calling its callback, and a callback that is still running at the deadline is treated as timed out. See LogicalPermissions::setTypeTimeout() for the fallbacks. When a timeout is set, all permission callbacks are called in the worker threads of their permission type.
+
+    Args:
+      timeout: The number of seconds an access check may spend in permission callbacks, or None to remove the timeout.
+      fallback (optional): One of 'deny', 'allow', 'raise' or 'unknown'. Default value is 'deny'.
+
+    """
+    self.__validateTimeout(timeout = timeout, fallback = fallback)
+
+    if timeout is None:
+      self.__evaluation_timeout = None
+    else:
+      self.__evaluation_timeout = (timeout, fallback)
+    self.__updateUnknownFallback()
+
+  def getEvaluationBudget(self):
+    """Gets the budget for the evaluation of a permission tree.
+
+    Returns:
+      A dictionary with the structure {'max_callbacks': max_callbacks, 'max_time': max_time, 'clock': clock}, or None if no budget has been set.
+
+    """
+    if self.__evaluation_budget is None:
+      return None
+    return {'max_callbacks': self.__evaluation_budget[0], 'max_time': self.__evaluation_budget[1], 'clock': self.__evaluation_budget[2]}
+
+  def setEvaluationBudget(self, max_callbacks = None, max_time = None, clock = time.time):
+    """Sets the budget for the evaluation of a permission tree, which limits the work that a single access check may do.
+
+    An access check that calls more permission callbacks than max_callbacks, or that is still evaluating the permission tree after max_time seconds, is aborted with a PermissionLimitExceededException. Permission results that are cached or prefetched don't count as callback calls, and neither do the fallbacks of permissions whose callback isn't called because its circuit breaker is open or its timeout has already expired. The bypass callback isn't counted. Unlike LogicalPermissions::setEvaluationTimeout(), the time budget also covers the evaluation of the logic gates, but a running callback isn't interrupted. The budget applies to checkAccess(), checkAccessMany() and checkAccessTrusted(), where checkAccessMany() shares a single budget between all of its permission trees. When a budget is set, checkAccess() compiles the permission trees that it is passed.
+
+    Args:
+      max_callbacks (optional): The maximum number of permission callback calls, or None for no limit. Default value is None.
+      max_time (optional): The maximum number of seconds, or None for no limit. Default value is None.
+      clock (optional): A callable that returns the current time in seconds, which is used for the time budget. Default value is time.time.
+
+    """
+    if max_callbacks is not None and (isinstance(max_callbacks, bool) or not isinstance(max_callbacks, int)):
+      raise InvalidArgumentTypeException('The max_callbacks parameter must be an integer or None.')
+    if max_callbacks is not None and max_callbacks < 0:
+      raise InvalidArgumentValueException('The max_callbacks parameter cannot be negative.')
+    if max_time is not None and (isinstance(max_time, bool) or not isinstance(max_time, (int, float))):
+      raise InvalidArgumentTypeException('The max_time parameter must be a number or None.')
+    if max_time is not None and max_time <= 0:
+      raise InvalidArgumentValueException('The max_time parameter must be greater than zero.')
+    if not hasattr(clock, '__call__'):
+      raise InvalidArgumentTypeException('The clock parameter must be a callable data type.')
+
+    if max_callbacks is None and max_time is None:
+      self.__evaluation_budget = None
+    else:
+      self.__evaluation_budget = (max_callbacks, max_time, clock)
+    self.__updateLimited()
+
+  def getTypeCircuitBreaker(self, name):
+    """Gets the circuit breaker for the callback of a permission type.
+
+    Args:
+      name: A string with the name of the permission type
+
+    Returns:
+      The CircuitBreaker for the permission type, or None if no circuit breaker has been set.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.typeExists(name = name):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+
+    return self.__circuit_breakers.get(name)
+
+  def setTypeCircuitBreaker(self, name, breaker):
+    """Sets the circuit breaker for the callback of a permission type.
+
+    Every call to the callback is recorded by the circuit breaker, and while the circuit breaker is open the callback isn't called and the fallback of the circuit breaker is used as the result of the permission instead. Calls that raise an exception or time out, see LogicalPermissions::setTypeTimeout(), count as failed. Decisions that used a fallback are not cached.
+
+    Args:
+      name: A string with the name of the permission type
+      breaker: A CircuitBreaker, or None to remove the circuit breaker.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.typeExists(name = name):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+    if breaker is not None and not isinstance(breaker, CircuitBreaker):
+      raise InvalidArgumentTypeException('The breaker parameter must be a CircuitBreaker or None.')
+
+    if breaker is None:
+      self.__circuit_breakers.pop(name, None)
+    else:
+      self.__circuit_breakers[name] = breaker
+    self.__updateUnknownFallback()
 
   def getBypassCallback(self):
     """Gets the current bypass access callback.
@@ -157,6 +650,236 @@ class LogicalPermissions(object):
       raise InvalidArgumentTypeException('The callback parameter must be a callable data type.')
 
     self.__bypass_callback = callback
+    self.__version += 1
+
+  def addPolicy(self, name, permissions):
+    """Adds a named policy that can be referenced from permission trees.
+
+    Args:
+      name: A string with the name of the policy
+      permissions: A dictionary, list, string or boolean of the permission tree for the policy. A policy may reference other policies with the POLICY key, but it may not reference itself directly or indirectly and it cannot contain the NO_BYPASS key. The permission tree is deep copied.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if self.policyExists(name = name):
+      raise PolicyAlreadyExistsException('The policy "{0}" already exists! If you want to change an existing policy, please remove it first or use LogicalPermissions::setPolicies().'.format(name))
+    self.__validatePolicy(name = name, permissions = permissions)
+    leaves = self.__getPolicyLeaves(permissions = permissions)
+    references = dict(self.__policy_references)
+    references[name] = frozenset(value for type, value in leaves if type == 'POLICY')
+    # the registered policies don't form a cycle, so a new cycle has to pass through the added policy, which is only possible if it
+    # references itself or is already referenced by a registered policy
+    if name in references[name] or name in self.__policy_referrers:
+      self.__detectPolicyReferenceCycle(name = name, references = references)
+
+    self.__policies[name] = copy.deepcopy(permissions)
+    self.__indexPolicy(name = name, leaves = leaves)
+    self.__changePolicies(names = [name])
+
+  def removePolicy(self, name):
+    """Removes a policy.
+
+    Args:
+      name: A string with the name of the policy
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.policyExists(name = name):
+      raise PolicyNotRegisteredException('The policy "{0}" has not been registered. Please use LogicalPermissions::addPolicy() or LogicalPermissions::setPolicies() to register policies.'.format(name))
+
+    del self.__policies[name]
+    self.__unindexPolicy(name = name)
+    self.__changePolicies(names = [name])
+
+  def policyExists(self, name):
+    """Checks whether a policy is registered.
+
+    Args:
+      name: A string with the name of the policy
+
+    Returns:
+      True if the policy is found or False if the policy isn't found.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+
+    return name in self.__policies
+
+  def getPolicy(self, name):
+    """Gets the permission tree for a policy.
+
+    Args:
+      name: A string with the name of the policy
+
+    Returns:
+      The permission tree of the policy. The permission tree is deep copied.
+
+    """
+    if not isinstance(name, str):
+      raise InvalidArgumentTypeException('The name parameter must be a string.')
+    if not name:
+      raise InvalidArgumentValueException('The name parameter cannot be empty.')
+    if not self.policyExists(name = name):
+      raise PolicyNotRegisteredException('The policy "{0}" has not been registered. Please use LogicalPermissions::addPolicy() or LogicalPermissions::setPolicies() to register policies.'.format(name))
+
+    return copy.deepcopy(self.__policies[name])
+
+  def getPolicies(self):
+    """Gets all registered policies.
+
+    Returns:
+      A dictionary of policies with the structure {name: permissions, name2: permissions2, ...}. This dictionary is deep copied.
+
+    """
+    return copy.deepcopy(self.__policies)
+
+  def setPolicies(self, policies):
+    """Overwrites all registered policies.
+
+    Args:
+      policies: A dictionary of policies with the structure {name: permissions, name2: permissions2, ...}. References between the policies may not form a cycle. This dictionary is deep copied.
+
+    """
+    if not isinstance(policies, dict):
+      raise InvalidArgumentTypeException('The policies parameter must be a dictionary.')
+    for name in policies:
+      if not isinstance(name, str):
+        raise InvalidArgumentValueException('The policies keys must be strings.')
+      if not name:
+        raise InvalidArgumentValueException('The name for a policy cannot be empty.')
+      self.__validatePolicy(name = name, permissions = policies[name])
+
+    leaves = {}
+    references = {}
+    for name in policies:
+      leaves[name] = self.__getPolicyLeaves(permissions = policies[name])
+      references[name] = frozenset(value for type, value in leaves[name] if type == 'POLICY')
+    checked = set()
+    for name in sorted(references):
+      self.__detectPolicyReferenceCycle(name = name, references = references, checked = checked)
+
+    changed = [name for name in self.__policies if name not in policies]
+    changed += [name for name in policies if name not in self.__policies or self.__policies[name] != policies[name]]
+    for name in changed:
+      if name in self.__policies:
+        self.__unindexPolicy(name = name)
+      if name in policies:
+        self.__indexPolicy(name = name, leaves = leaves[name])
+    self.__policies = copy.deepcopy(policies)
+    self.__changePolicies(names = changed)
+
+  def getPoliciesReferencing(self, type, value = None):
+    """Gets the policies that reference a permission, either directly or through references to other policies.
+
+    The registered policies are indexed by the permissions that they reference, so the time it takes is proportional to the number of affected policies rather than the number of registered policies. This can for example be used to find the policies that are affected when the definition of a role changes.
+
+    Args:
+      type: A string with the name of the permission type, or 'POLICY' to get the policies that reference a policy
+      value (optional): A permission string of the permission type, such as a role, or None to get the policies that reference any permission of the type. Default value is None.
+
+    Returns:
+      A frozenset with the names of the policies.
+
+    """
+    if not isinstance(type, str):
+      raise InvalidArgumentTypeException('The type parameter must be a string.')
+    if not type:
+      raise InvalidArgumentValueException('The type parameter cannot be empty.')
+    if value is not None and not isinstance(value, str):
+      raise InvalidArgumentTypeException('The value parameter must be a string or None.')
+
+    if type.upper() == 'POLICY':
+      type = 'POLICY'
+    values = self.__leaf_policies.get(type, {})
+    stack = []
+    if value is None:
+      for names in values.values():
+        stack.extend(names)
+    else:
+      stack.extend(values.get(value, ()))
+    policies = set()
+    while stack:
+      name = stack.pop()
+      if name not in policies:
+        policies.add(name)
+        stack.extend(self.__policy_referrers.get(name, ()))
+    return frozenset(policies)
+
+  def getDecisionCache(self):
+    """Gets the decision cache.
+
+    Returns:
+      The DecisionCache that is used for compiled permission trees, or None if no decision cache has been set.
+
+    """
+    return self.__decision_cache
+
+  def setDecisionCache(self, cache):
+    """Sets the decision cache that is used for compiled permission trees.
+
+    Args:
+      cache: A DecisionCache, or None to disable decision caching. Cached decisions are automatically ignored after the types or the bypass callback have been changed, and the cached decisions that evaluated a policy are discarded when the policy is changed.
+
+    """
+    if cache is not None and not isinstance(cache, DecisionCache):
+      raise InvalidArgumentTypeException('The cache parameter must be a DecisionCache or None.')
+
+    if cache is not self.__decision_cache:
+      # policy changes are not tracked in a detached cache
+      self.__version += 1
+    self.__decision_cache = cache
+
+  def invalidate(self, type = None, value = None):
+    """Discards cached results that depend on a permission type or a single permission.
+
+    Both the cached results of pure permission types and the decisions in the decision cache that depended on the permission are discarded. Other cached results are kept.
+
+    Args:
+      type (optional): A string with the name of the permission type, or None to discard all cached results. Default value is None.
+      value (optional): A permission string of the permission type, such as a role, or None to discard the cached results for every permission of the type. Default value is None.
+
+    """
+    if type is not None and not isinstance(type, str):
+      raise InvalidArgumentTypeException('The type parameter must be a string or None.')
+    if type is None and value is not None:
+      raise InvalidArgumentValueException('The value parameter cannot be used without the type parameter.')
+
+    if type is None:
+      self.__clearLeafCache()
+    elif value is None:
+      self.__clearLeafCache(type = type)
+    else:
+      bucket = self.__leaf_cache.get(type, {}).pop(value, {})
+      self.__leaf_cache_size -= len(bucket)
+    if self.__decision_cache is not None:
+      self.__decision_cache.invalidate(type = type, value = value)
+
+  def getStatistics(self):
+    """Gets statistics about the evaluation of permission trees.
+
+    Returns:
+      A dictionary with statistics. The 'compiler' key contains the number of compiled permission trees that are cached by the compiler and the number of distinct nodes that are in use. If tiered execution is enabled, the 'tiers' key contains the number of permission trees that are 'interpreted', 'compiled' and 'generated', see LogicalPermissions::setTieringThresholds(). The 'timeouts' key contains the number of permission callbacks that timed out for each permission type, and the 'callback_pools' key contains the number of 'workers' of each permission type whose callbacks are called with a timeout, how many of them are 'idle' and how many are busy with calls that timed out ('abandoned'). The 'circuit_breakers' key contains the statistics from CircuitBreaker::getStatistics() for each permission type with a circuit breaker. If a decision cache has been set, the 'decision_cache' key contains the statistics from DecisionCache::getStatistics().
+
+    """
+    statistics = {'compiler': self.__compiler.getStatistics(), 'timeouts': dict(self.__timeout_counts)}
+    statistics['callback_pools'] = dict((name, pool.getStatistics()) for name, pool in self.__callback_pools.items())
+    statistics['circuit_breakers'] = dict((name, breaker.getStatistics()) for name, breaker in self.__circuit_breakers.items())
+    if self.__tiering_thresholds is not None:
+      interpreted = sum(1 for entry in self.__tree_tiers.values() if not entry[1])
+      generated = sum(1 for code in self.__generated_code.values() if code is not None)
+      statistics['tiers'] = {'interpreted': interpreted, 'compiled': len(self.__compiled_counts) - generated, 'generated': generated}
+    if self.__decision_cache is not None:
+      statistics['decision_cache'] = self.__decision_cache.getStatistics()
+    return statistics
 
   def getValidPermissionKeys(self):
     """Gets all keys that can be part of a permission tree.
@@ -171,7 +894,7 @@ class LogicalPermissions(object):
     """Checks access for a permission tree.
 
     Args:
-      permissions: A dictionary, list, string or boolean of the permission tree to be evaluated
+      permissions: A dictionary, list, string or boolean of the permission tree to be evaluated, or a compiled permission tree from LogicalPermissions::compile()
       context (optional): A context dictionary that could for example contain the evaluated user and document. Default value is an empty dictionary.
       allow_bypass (optional): Determines whether bypassing access should be allowed. Default value is True.
 
@@ -179,13 +902,30 @@ class LogicalPermissions(object):
       True if access is granted or False if access is denied.
 
     """
-    if not isinstance(permissions, (dict, list, str, bool)):
+    if not isinstance(permissions, (dict, list, str, bool, CompiledPermissions)):
       raise InvalidArgumentTypeException('The permissions parameter must be a dictionary or a list, or in certain cases a string or boolean.')
     if not isinstance(context, dict):
       raise InvalidArgumentTypeException('The context parameter must be an dictionary.')
     if not isinstance(allow_bypass, bool):
       raise InvalidArgumentTypeException('The allow_bypass parameter must be a boolean.')
 
+    if (self.__unknown_fallback or self.__limited) and not isinstance(permissions, CompiledPermissions):
+      # unknown permission results, tree limits and evaluation budgets are only supported by the evaluation of compiled permission trees
+      permissions = self.compile(permissions = permissions)
+    elif self.__tiering_thresholds is not None and not isinstance(permissions, CompiledPermissions):
+      permissions = self.__getTieredPermissions(permissions = permissions)
+    evaluation = self.__createEvaluation()
+    if isinstance(permissions, CompiledPermissions):
+      self.__preparePrefetch(compiled_list = [permissions], evaluation = evaluation)
+      return self.__checkCachedAccess(compiled = permissions, context = context, allow_bypass = allow_bypass, evaluation = evaluation)
+    if self.__prefetch_callbacks:
+      # the permissions to prefetch are collected from the compiled permission tree, which the compiler caches by the tree key
+      try:
+        self.__preparePrefetch(compiled_list = [self.compile(permissions = permissions)], evaluation = evaluation)
+      except (InvalidArgumentTypeException, InvalidArgumentValueException, PolicyNotRegisteredException):
+        # the interpreter doesn't evaluate the children that a logic gate doesn't need, so it may accept some permission trees that can't be compiled
+        pass
+
     permissions_copy = copy.deepcopy(permissions)
 
     # uppercasing of no_bypass key for backward compatibility
@@ -208,35 +948,1422 @@ class LogicalPermissions(object):
           elif no_bypass_upper == 'FALSE':
             allow_bypass = True
         elif isinstance(permissions_copy['NO_BYPASS'], dict):
-          allow_bypass = not self.__processOR(permissions = permissions_copy['NO_BYPASS'], context = context)
+          allow_bypass = not self.__processOR(permissions = permissions_copy['NO_BYPASS'], context = context, evaluation = evaluation)
         else:
           raise InvalidArgumentValueException('The NO_BYPASS value must be a boolean, a boolean string or a dictionary. Current value: {0}'.format(permissions_copy['NO_BYPASS']))
       permissions_copy.pop('NO_BYPASS', None)
 
-    if allow_bypass and self.__checkBypassAccess(context = context):
+    if allow_bypass and self.__checkBypassAccess(context = context, evaluation = evaluation):
       return True
 
     if isinstance(permissions_copy, (str, bool)):
       return self.__dispatch(permissions_copy)
     if isinstance(permissions_copy, (dict, list)) and permissions_copy:
-      return self.__processOR(permissions = permissions_copy, context = context)
+      return self.__processOR(permissions = permissions_copy, context = context, evaluation = evaluation)
 
     return True
 
-  def __getCorePermissionKeys(self):
-    return ['NO_BYPASS', 'AND', 'NAND', 'OR', 'NOR', 'XOR', 'NOT', 'TRUE', 'FALSE']
+  def checkAccessMany(self, permissions_list, context = {}, allow_bypass = True):
+    """Checks access for several permission trees against the same context.
+
+    All permission trees are compiled into the same shared graph, and every subtree, permission and policy that appears in more than one of them is only evaluated once for the context. The bypass callback is also called at most once.
+
+    Args:
+      permissions_list: A list of permission trees to be evaluated. Each permission tree can be a dictionary, list, string or boolean, or a compiled permission tree from LogicalPermissions::compile().
+      context (optional): A context dictionary that could for example contain the evaluated user and document. Default value is an empty dictionary.
+      allow_bypass (optional): Determines whether bypassing access should be allowed. Default value is True.
+
+    Returns:
+      A list of booleans with the access result for each permission tree, in the same order as permissions_list.
+
+    """
+    if not isinstance(permissions_list, list):
+      raise InvalidArgumentTypeException('The permissions_list parameter must be a list.')
+    if not isinstance(context, dict):
+      raise InvalidArgumentTypeException('The context parameter must be an dictionary.')
+    if not isinstance(allow_bypass, bool):
+      raise InvalidArgumentTypeException('The allow_bypass parameter must be a boolean.')
+
+    compiled_list = [permissions if isinstance(permissions, CompiledPermissions) else self.compile(permissions = permissions) for permissions in permissions_list]
+    evaluation = self.__createEvaluation()
+    self.__preparePrefetch(compiled_list = compiled_list, evaluation = evaluation)
+    return [self.__checkCachedAccess(compiled = compiled, context = context, allow_bypass = allow_bypass, evaluation = evaluation) for compiled in compiled_list]
+
+  def checkAccessTrusted(self, permissions, context = {}, allow_bypass = True):
+    """Checks access for a compiled permission tree without validating the arguments or the return values of the callbacks.
+
+    This is a faster alternative to checkAccess() for compiled permission trees that have been checked with LogicalPermissions::validate() and for callbacks that are known to return booleans. Passing anything else results in undefined behavior. A permission type that has been removed after the permission tree was compiled denies access instead of raising an exception.
+
+    Args:
+      permissions: A compiled permission tree from LogicalPermissions::compile() or LogicalPermissions::validate()
+      context (optional): A context dictionary that could for example contain the evaluated user and document. Default value is an empty dictionary.
+      allow_bypass (optional): Determines whether bypassing access should be allowed. Default value is True.
 
-  def __checkBypassAccess(self, context):
+    Returns:
+      True if access is granted or False if access is denied.
+
+    """
+    evaluation = self.__createEvaluation()
+    evaluation['trusted'] = True
+    if self.__prefetch_callbacks:
+      self.__preparePrefetch(compiled_list = [permissions], evaluation = evaluation)
+    return self.__checkCachedAccess(compiled = permissions, context = context, allow_bypass = allow_bypass, evaluation = evaluation)
+
+  def checkAccessGenerator(self, permissions, context = {}, allow_bypass = True):
+    """Checks access for a permission tree with a generator that yields the permissions it needs instead of calling the callbacks of the permission types.
+
+    This lets the caller look up the permissions itself, for example in batches that are shared between many concurrent evaluations. The generator yields a frozenset of (type, value) tuples with the permissions that are needed next and expects their results to be sent back as a dictionary with the structure {(type, value): access, ...}. A result can also be UNKNOWN from this module, which is evaluated like a fallback of 'unknown', see LogicalPermissions::setTypeTimeout(). Logic gates are short-circuited just like in checkAccess(), so a permission is only requested when its result can still change the access result. The permissions of a type with a universe, see LogicalPermissions::setTypeUniverse(), that a logic gate compares with a bitmask are requested together. The bypass callback is called directly, and the decision cache, the cached results of pure permission types and the prefetch callbacks are not used.
+
+    Args:
+      permissions: A dictionary, list, string or boolean of the permission tree to be evaluated, or a compiled permission tree from LogicalPermissions::compile()
+      context (optional): A context dictionary that is passed to the bypass callback. Default value is an empty dictionary.
+      allow_bypass (optional): Determines whether bypassing access should be allowed. Default value is True.
+
+    Returns:
+      An AccessCheckGenerator that stops with True if access is granted or False if access is denied.
+
+    """
+    if not isinstance(permissions, CompiledPermissions):
+      permissions = self.compile(permissions = permissions)
+    if not isinstance(context, dict):
+      raise InvalidArgumentTypeException('The context parameter must be an dictionary.')
+    if not isinstance(allow_bypass, bool):
+      raise InvalidArgumentTypeException('The allow_bypass parameter must be a boolean.')
+
+    return AccessCheckGenerator(self.__checkAccessSteps(compiled = permissions, context = context, allow_bypass = allow_bypass))
+
+  def validate(self, permissions):
+    """Validates a permission tree and reports all errors at once.
+
+    Unlike compile(), which raises an exception for the first error, every subtree is checked and all errors are collected. Policy references are also checked against the registered policies.
+
+    Args:
+      permissions: A dictionary, list, string or boolean of the permission tree to be validated
+
+    Returns:
+      The compiled permission tree if the permission tree is valid.
+
+    Raises:
+      InvalidPermissionTreeException: If the permission tree contains errors. The errors attribute of the exception is a list with an exception for each error.
+
+    """
+    errors = []
+    compiled = self.__compiler.compile(permissions = permissions, errors = errors)
+    checked = set()
+    stack = [node for node in [compiled.root, compiled.no_bypass] if node is not None]
+    while stack:
+      node = stack.pop()
+      if node in checked:
+        continue
+      checked.add(node)
+      if node.gate == 'POLICY' and not self.policyExists(name = node.value):
+        errors.append(PolicyNotRegisteredException('The policy "{0}" has not been registered. Please use LogicalPermissions::addPolicy() or LogicalPermissions::setPolicies() to register policies.'.format(node.value)))
+      stack.extend(node.children)
+
+    if errors:
+      raise InvalidPermissionTreeException('The permission tree contains {0} error(s): {1}'.format(len(errors), ' '.join(str(error) for error in errors)), errors = errors)
+    return compiled
+
+  def compile(self, permissions):
+    """Validates and compiles a permission tree.
+
+    Compiled permission trees are evaluated faster than the original permission trees and identical subtrees are shared between all permission trees compiled by the same LogicalPermissions instance. Permission trees that compile to the same nodes, for example because they only differ in the order of the children of a logic gate, get CompiledPermissions objects that compare equal. Policy references are resolved when the compiled permission tree is evaluated, so a compiled permission tree does not need to be recompiled if a policy changes.
+
+    Args:
+      permissions: A dictionary, list, string or boolean of the permission tree to be compiled
+
+    Returns:
+      A CompiledPermissions object that can be passed to LogicalPermissions::checkAccess() and LogicalPermissions::checkAccessMany().
+
+    """
+    return self.__compiler.compile(permissions = permissions)
+
+  def partialEvaluate(self, permissions, context = {}, known_types = []):
+    """Evaluates the parts of a permission tree that can be decided from a partially known context.
+
+    Every permission whose type is listed in known_types is evaluated with the passed context, referenced policies are expanded and the results are folded through the logic gates. The remaining permissions are kept in a residual permission tree that can be checked cheaply for each fully known context, for example once per document after the user-level permissions have been evaluated a single time. The NO_BYPASS condition is partially evaluated in the same way, and the bypass callback is only called when the residual permission tree is checked.
+
+    Args:
+      permissions: A dictionary, list, string or boolean of the permission tree to be evaluated, or a compiled permission tree from LogicalPermissions::compile()
+      context (optional): A context dictionary with the known parts of the context. Default value is an empty dictionary.
+      known_types (optional): A list with the names of the permission types that can be evaluated with the passed context. Default value is an empty list.
+
+    Returns:
+      A CompiledPermissions object with the residual permission tree. If every permission could be evaluated, the root of the residual permission tree is a TRUE or FALSE node. A permission of a known type whose result is unknown, because of a fallback of 'unknown', is kept in the residual permission tree.
+
+    """
+    if not isinstance(permissions, CompiledPermissions):
+      permissions = self.compile(permissions = permissions)
+    if not isinstance(context, dict):
+      raise InvalidArgumentTypeException('The context parameter must be an dictionary.')
+    if not isinstance(known_types, (list, tuple, set, frozenset)):
+      raise InvalidArgumentTypeException('The known_types parameter must be a list.')
+    for name in known_types:
+      if not self.typeExists(name = name):
+        raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(name))
+
+    known_types = frozenset(known_types)
+    evaluation = self.__createEvaluation()
+    # permissions whose result is unknown are kept in the residual permission tree, so that they can't be negated into a grant
+    evaluation['unknown'] = self.__unknown_fallback
+    residuals = {}
+    root = self.__partialEvaluateNode(node = permissions.root, context = context, known_types = known_types, evaluation = evaluation, residuals = residuals)
+    no_bypass = None
+    if permissions.no_bypass is not None:
+      no_bypass = self.__partialEvaluateNode(node = permissions.no_bypass, context = context, known_types = known_types, evaluation = evaluation, residuals = residuals)
+    return self.__compiler.getCompiledPermissions(root = root, no_bypass = no_bypass)
+
+  def toSqlWhere(self, permissions, context = {}, known_types = [], allow_bypass = True):
+    """Translates a permission tree into a parameterized SQL condition that can be used for filtering rows in a WHERE clause.
+
+    The permission tree is first partially evaluated with LogicalPermissions::partialEvaluate(), and every remaining permission is translated by the SQL builder of its permission type. A permission of a known type whose result is unknown, because of a fallback of 'unknown', is translated to NULL, so that the three-valued logic of SQL denies access when the condition depends on it. The NAND, NOR and XOR gates are expanded into AND, OR and NOT. The bypass callback is called with the passed context, so it must not depend on the rows that are filtered.
+
+    Args:
+      permissions: A dictionary, list, string or boolean of the permission tree to be translated, or a compiled permission tree from LogicalPermissions::compile()
+      context (optional): A context dictionary with the known parts of the context. Default value is an empty dictionary.
+      known_types (optional): A list with the names of the permission types that can be evaluated with the passed context. All other permission types in the permission tree must have an SQL builder. Default value is an empty list.
+      allow_bypass (optional): Determines whether bypassing access should be allowed. Default value is True.
+
+    Returns:
+      A tuple with the SQL condition string and a list of parameters for its placeholders.
+
+    """
+    if not isinstance(allow_bypass, bool):
+      raise InvalidArgumentTypeException('The allow_bypass parameter must be a boolean.')
+
+    residual = self.partialEvaluate(permissions = permissions, context = context, known_types = known_types)
+    known_types = frozenset(known_types)
+    params = []
+    sql = self.__translateNodeToSql(node = residual.root, context = context, known_types = known_types, params = params)
+    if allow_bypass and self.__checkBypassAccess(context = context):
+      if residual.no_bypass is None:
+        return ('1 = 1', [])
+      no_bypass_params = []
+      no_bypass_sql = self.__translateNodeToSql(node = residual.no_bypass, context = context, known_types = known_types, params = no_bypass_params)
+      return ('NOT ({0}) OR ({1})'.format(no_bypass_sql, sql), no_bypass_params + params)
+    return (sql, params)
+
+  def getRequiredLeaves(self, permissions):
+    """Gets every permission that can possibly be consulted when a permission tree is evaluated.
+
+    The permissions are collected statically, including the permissions in referenced policies, so that for example the data for all of them can be prefetched in a single query before the permission tree is evaluated. The result is cached for compiled permission trees until types or policies are changed.
+
+    Args:
+      permissions: A dictionary, list, string or boolean of the permission tree, or a compiled permission tree from LogicalPermissions::compile()
+
+    Returns:
+      A dictionary with the structure {'leaves': {type: frozenset([value, ...]), ...}, 'no_bypass_only': frozenset([type, ...])}. The 'leaves' key contains the permissions for each permission type and the 'no_bypass_only' key contains the permission types that only appear in the NO_BYPASS condition.
+
+    """
+    if not isinstance(permissions, CompiledPermissions):
+      permissions = self.compile(permissions = permissions)
+
+    cached = self.__required_leaves.get(permissions)
+    if cached is None or cached[0] != self.__version or any(self.__policy_stamps.get(name) != stamp for name, stamp in cached[3]):
+      leaves = {}
+      policies = set()
+      self.__collectLeaves(node = permissions.root, leaves = leaves, visited = set(), policies = policies)
+      no_bypass_leaves = {}
+      if permissions.no_bypass is not None:
+        self.__collectLeaves(node = permissions.no_bypass, leaves = no_bypass_leaves, visited = set(), policies = policies)
+      no_bypass_only = frozenset(type for type in no_bypass_leaves if type not in leaves)
+      for type in no_bypass_leaves:
+        leaves[type] = leaves.get(type, set()) | no_bypass_leaves[type]
+      leaves = dict((type, frozenset(values)) for type, values in leaves.items())
+      # the result only has to be collected again when one of the policies that it was collected from changes
+      stamps = tuple((name, self.__policy_stamps.get(name)) for name in policies)
+      cached = (self.__version, leaves, no_bypass_only, stamps)
+      self.__required_leaves[permissions] = cached
+
+    return {'leaves': dict(cached[1]), 'no_bypass_only': cached[2]}
+
+  def filter(self, permissions_for, items, base_context = {}, known_types = [], item_key = 'item', allow_bypass = True):
+    """Lazily filters items by access.
+
+    Each distinct permission tree returned by permissions_for is compiled and partially evaluated with the base context only once, and the bypass callback is only called once with the base context. After that only the permission types that are not listed in known_types are evaluated for each item. The items are consumed one at a time, so arbitrarily long iterables can be filtered.
+
+    Args:
+      permissions_for: A callable that is passed an item and returns the permission tree for the item, either as a dictionary, list, string or boolean or as a compiled permission tree from LogicalPermissions::compile()
+      items: An iterable of the items to be filtered
+      base_context (optional): A context dictionary with the parts of the context that are the same for all items, for example the user. Default value is an empty dictionary.
+      known_types (optional): A list with the names of the permission types that can be evaluated with the base context. Default value is an empty list.
+      item_key (optional): The key under which each item is added to a copy of the base context before the item is evaluated. Default value is 'item'.
+      allow_bypass (optional): Determines whether bypassing access should be allowed. Default value is True.
+
+    Returns:
+      A generator that yields the items that access is granted to.
+
+    """
+    if not hasattr(permissions_for, '__call__'):
+      raise InvalidArgumentTypeException('The permissions_for parameter must be a callable data type.')
+    if not isinstance(base_context, dict):
+      raise InvalidArgumentTypeException('The base_context parameter must be an dictionary.')
+    if not isinstance(allow_bypass, bool):
+      raise InvalidArgumentTypeException('The allow_bypass parameter must be a boolean.')
+
+    return self.__filterItems(permissions_for = permissions_for, items = iter(items), base_context = base_context, known_types = known_types, item_key = item_key, allow_bypass = allow_bypass)
+
+  def getSubjectsWithAccess(self, permissions, index, context_for = None, allow_bypass = True):
+    """Gets every subject in a population index that a permission tree grants access to.
+
+    The permission tree is evaluated once for the whole population instead of once per subject. Each permission of an indexed type is looked up in the index, and the logic gates are evaluated on sets of subjects: OR is a union, AND is an intersection, NOT, NAND and NOR are complements against all subjects in the index, and XOR contains the subjects that are in at least one but not all of the child sets. Permissions of types that are not indexed are evaluated for each subject with the context returned by context_for.
+
+    Args:
+      permissions: A dictionary, list, string or boolean of the permission tree, or a compiled permission tree from LogicalPermissions::compile()
+      index: A PopulationIndex with the subjects and their permissions
+      context_for (optional): A callable that is passed a subject and returns the context dictionary for it, or None if every permission type in the permission tree is indexed. Default value is None.
+      allow_bypass (optional): Determines whether bypassing access should be allowed. The bypass callback is called with the context of each subject that isn't already granted access, so bypass access is only checked if context_for is passed. Default value is True.
+
+    Returns:
+      A frozenset with the subjects that access is granted to.
+
+    """
+    if not isinstance(permissions, CompiledPermissions):
+      permissions = self.compile(permissions = permissions)
+    if not isinstance(index, PopulationIndex):
+      raise InvalidArgumentTypeException('The index parameter must be a PopulationIndex.')
+    if context_for is not None and not hasattr(context_for, '__call__'):
+      raise InvalidArgumentTypeException('The context_for parameter must be a callable data type.')
+    if not isinstance(allow_bypass, bool):
+      raise InvalidArgumentTypeException('The allow_bypass parameter must be a boolean.')
+
+    population = {'index': index, 'subjects': index.getSubjects(), 'context_for': context_for, 'nodes': {}, 'unknowns': {}, 'evaluations': {}}
+    subjects = self.__getNodeSubjects(node = permissions.root, population = population)
+    if allow_bypass and context_for is not None and hasattr(self.getBypassCallback(), '__call__'):
+      candidates = population['subjects'] - subjects
+      if permissions.no_bypass is not None and candidates:
+        candidates -= self.__getNodeSubjects(node = permissions.no_bypass, population = population)
+        # bypassing access is not allowed if the NO_BYPASS condition is unknown
+        candidates -= population['unknowns'].get(permissions.no_bypass, frozenset())
+      bypass_subjects = []
+      for subject in candidates:
+        context, evaluation = self.__getSubjectEvaluation(subject = subject, population = population)
+        if self.__checkBypassAccess(context = context, evaluation = evaluation):
+          bypass_subjects.append(subject)
+      subjects |= frozenset(bypass_subjects)
+    return subjects
+
+  def __getCorePermissionKeys(self):
+    return ['NO_BYPASS', 'AND', 'NAND', 'OR', 'NOR', 'XOR', 'NOT', 'TRUE', 'FALSE', 'POLICY']
+
+  def __normalizeTypeDependencies(self, context_keys, pure):
+    if not isinstance(pure, bool):
+      raise InvalidArgumentTypeException('The pure parameter must be a boolean.')
+    if context_keys is None:
+      return None
+    if not isinstance(context_keys, (list, tuple)):
+      raise InvalidArgumentTypeException('The context_keys parameter must be a list or None.')
+
+    paths = []
+    for context_key in context_keys:
+      if isinstance(context_key, str):
+        path = tuple(context_key.split('.'))
+      elif isinstance(context_key, tuple):
+        path = context_key
+      else:
+        raise InvalidArgumentValueException('The context keys must be strings or tuples of keys.')
+      if not path or not all(path):
+        raise InvalidArgumentValueException('The context keys cannot be empty.')
+      paths.append(path)
+    return (tuple(paths), pure)
+
+  def __setTypeDependencies(self, name, dependencies):
+    if dependencies is None:
+      self.__type_dependencies.pop(name, None)
+    else:
+      self.__type_dependencies[name] = dependencies
+    self.__clearLeafCache(type = name)
+
+  def __clearLeafCache(self, type = None):
+    if type is None:
+      self.__leaf_cache = {}
+      self.__leaf_cache_size = 0
+      return
+    buckets = self.__leaf_cache.pop(type, {})
+    for bucket in buckets.values():
+      self.__leaf_cache_size -= len(bucket)
+
+  def __getContextProjection(self, paths, context):
+    projection = []
+    for path in paths:
+      value = context
+      for key in path:
+        if not isinstance(value, dict) or key not in value:
+          value = MISSING_CONTEXT_VALUE
+          break
+        value = value[key]
+      projection.append(value)
+    try:
+      projection = self.__freezeContextValue(value = projection)
+      hash(projection)
+    except TypeError:
+      return None
+    return projection
+
+  def __freezeContextValue(self, value):
+    # Every container kind is tagged and scalars are paired with their type, so that different context values such as 1, 1.0 and True
+    # never freeze to the same cache key
+    if value is MISSING_CONTEXT_VALUE:
+      return value
+    if isinstance(value, list):
+      return ('list',) + tuple(self.__freezeContextValue(value = item) for item in value)
+    if isinstance(value, tuple):
+      return ('tuple',) + tuple(self.__freezeContextValue(value = item) for item in value)
+    if isinstance(value, dict):
+      return ('dict', frozenset((self.__freezeContextValue(value = key), self.__freezeContextValue(value = value[key])) for key in value))
+    if isinstance(value, set):
+      return ('set', frozenset(self.__freezeContextValue(value = item) for item in value))
+    if isinstance(value, frozenset):
+      return ('frozenset', frozenset(self.__freezeContextValue(value = item) for item in value))
+    return (type(value), value)
+
+  def __validatePolicy(self, name, permissions):
+    if name.upper() in self.__getCorePermissionKeys():
+      raise InvalidArgumentValueException('The name for a policy has the illegal value "{0}". It cannot be one of the following values: {1}'.format(name, ','.join(self.__getCorePermissionKeys())))
+    if not isinstance(permissions, (dict, list, str, bool)):
+      raise InvalidArgumentTypeException('The permissions for the policy "{0}" must be a dictionary or a list, or in certain cases a string or boolean.'.format(name))
+    if isinstance(permissions, dict):
+      for key in permissions:
+        if isinstance(key, str) and key.upper() == 'NO_BYPASS':
+          raise InvalidArgumentValueException('The policy "{0}" cannot contain the NO_BYPASS key. Please put NO_BYPASS in the permission tree that references the policy instead.'.format(name))
+
+  def __getPolicyLeaves(self, permissions):
+    # Collects the (type, value) pairs that a raw permission tree references, with ('POLICY', name) for policy references
+    # Core keys only have a meaning as dictionary keys, so only the boolean strings are skipped among the leaf values
+    leaves = set()
+    core_keys = self.__getCorePermissionKeys()
+    stack = [(permissions, None)]
+    while stack:
+      permissions, type = stack.pop()
+      if isinstance(permissions, str):
+        if type is not None and permissions.upper() not in ('TRUE', 'FALSE'):
+          leaves.add((type, permissions))
+      elif isinstance(permissions, list):
+        stack.extend((permission, type) for permission in permissions)
+      elif isinstance(permissions, dict):
+        for key in permissions:
+          key_type = type
+          if isinstance(key, str):
+            key_upper = key.upper()
+            if key_upper == 'POLICY':
+              key_type = 'POLICY'
+            elif key_upper not in core_keys and type is None:
+              key_type = key
+          stack.append((permissions[key], key_type))
+    return frozenset(leaves)
+
+  def __indexPolicy(self, name, leaves):
+    self.__policy_leaves[name] = leaves
+    references = frozenset(value for type, value in leaves if type == 'POLICY')
+    self.__policy_references[name] = references
+    for reference in references:
+      self.__policy_referrers.setdefault(reference, set()).add(name)
+    for type, value in leaves:
+      self.__leaf_policies.setdefault(type, {}).setdefault(value, set()).add(name)
+
+  def __unindexPolicy(self, name):
+    for reference in self.__policy_references.pop(name):
+      referrers = self.__policy_referrers[reference]
+      referrers.discard(name)
+      if not referrers:
+        del self.__policy_referrers[reference]
+    for type, value in self.__policy_leaves.pop(name):
+      values = self.__leaf_policies[type]
+      values[value].discard(name)
+      if not values[value]:
+        del values[value]
+        if not values:
+          del self.__leaf_policies[type]
+
+  def __changePolicies(self, names):
+    # Compiled permission trees reference policies by name, so only the changed policies have to be recompiled,
+    # and only the cached decisions that evaluated one of them are discarded.
+    for name in names:
+      self.__compiled_policies.pop(name, None)
+      self.__policy_stamp += 1
+      if name in self.__policies:
+        self.__policy_stamps[name] = self.__policy_stamp
+      else:
+        self.__policy_stamps.pop(name, None)
+      if self.__decision_cache is not None:
+        self.__decision_cache.invalidate(type = 'POLICY', value = name)
+
+  def __detectPolicyReferenceCycle(self, name, references, checked = None):
+    # Depth-first search with an explicit stack, so that long chains of policy references don't exhaust the recursion limit
+    if checked is None:
+      checked = set()
+    if name in checked:
+      return
+    path = [name]
+    on_path = set(path)
+    stack = [iter(sorted(references.get(name, [])))]
+    while stack:
+      reference = next(stack[-1], None)
+      if reference is None:
+        stack.pop()
+        checked.add(path[-1])
+        on_path.discard(path.pop())
+        continue
+      if reference in on_path:
+        cycle = path[path.index(reference):] + [reference]
+        raise PolicyReferenceCycleException('The policies contain a reference cycle: {0}'.format(' -> '.join(cycle)))
+      if reference in checked:
+        continue
+      path.append(reference)
+      on_path.add(reference)
+      stack.append(iter(sorted(references.get(reference, []))))
+
+  def __createEvaluation(self):
+    deadline = None
+    if self.__evaluation_timeout is not None:
+      deadline = time.time() + self.__evaluation_timeout[0]
+    # The budget is a list with the remaining callback calls and the time limit, so that it is shared by copies of the evaluation
+    budget = None
+    if self.__evaluation_budget is not None:
+      max_callbacks, max_time, clock = self.__evaluation_budget
+      budget = [max_callbacks, clock() + max_time if max_time is not None else None]
+    return {'policies': {}, 'nodes': {}, 'leaf_results': {}, 'leaves': set(), 'prefetch_values': {}, 'prefetched': {}, 'trusted': False, 'masks': {}, 'deadline': deadline, 'unknown': False, 'fallback_used': False, 'budget': budget}
+
+  def __updateLimited(self):
+    self.__limited = self.__evaluation_budget is not None or any(limit is not None for limit in self.__compiler.getTreeLimits().values())
+
+  def __spendBudget(self, budget, callbacks):
+    if budget[0] is not None:
+      budget[0] -= callbacks
+      if budget[0] < 0:
+        raise PermissionLimitExceededException('The evaluation exceeded the maximum of {0} permission callback calls.'.format(self.__evaluation_budget[0]))
+    if budget[1] is not None and self.__evaluation_budget[2]() > budget[1]:
+      raise PermissionLimitExceededException('The evaluation exceeded the maximum time of {0} seconds.'.format(self.__evaluation_budget[1]))
+
+  def __validateTimeout(self, timeout, fallback):
+    if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float))):
+      raise InvalidArgumentTypeException('The timeout parameter must be a number or None.')
+    if timeout is not None and timeout <= 0:
+      raise InvalidArgumentValueException('The timeout parameter must be greater than zero.')
+    if fallback not in TIMEOUT_FALLBACKS:
+      raise InvalidArgumentValueException('The fallback parameter must be one of the following values: {0}'.format(','.join(TIMEOUT_FALLBACKS)))
+
+  def __updateUnknownFallback(self):
+    fallbacks = [fallback for timeout, fallback in self.__type_timeouts.values()]
+    fallbacks += [breaker.getFallback() for breaker in self.__circuit_breakers.values()]
+    if self.__evaluation_timeout is not None:
+      fallbacks.append(self.__evaluation_timeout[1])
+    self.__unknown_fallback = 'unknown' in fallbacks
+
+  def __callWithTimeout(self, callback, permission, context, type, evaluation):
+    """Calls a permission callback with the timeout of its type and the deadline of the evaluation. Returns a tuple with the result of the callback, or the fallback result if it timed out, and whether it timed out."""
+    timeout = None
+    fallback = None
+    if type in self.__type_timeouts:
+      timeout, fallback = self.__type_timeouts[type]
+    deadline = evaluation['deadline'] if evaluation is not None else None
+    if deadline is not None:
+      remaining = deadline - time.time()
+      if timeout is None or remaining < timeout:
+        timeout, fallback = remaining, self.__evaluation_timeout[1]
+    # only the callbacks that are actually called count against the evaluation budget
+    budget = evaluation['budget'] if evaluation is not None else None
+    if timeout is None:
+      if budget is not None:
+        self.__spendBudget(budget = budget, callbacks = 1)
+      return (callback(permission, context), False)
+
+    if timeout > 0:
+      if budget is not None:
+        self.__spendBudget(budget = budget, callbacks = 1)
+      pool = self.__callback_pools.get(type)
+      if pool is None:
+        pool = self.__callback_pools.setdefault(type, CallbackPool(max_workers = CALLBACK_POOL_SIZE))
+      finished, access = pool.call(callback = callback, args = (permission, context), timeout = timeout)
+      if finished:
+        return (access, False)
+
+    self.__timeout_counts[type] = self.__timeout_counts.get(type, 0) + 1
+    exception = PermissionTimeoutException('The callback for the permission type "{0}" timed out for the permission "{1}".'.format(type, permission))
+    return (self.__getFallbackAccess(fallback = fallback, evaluation = evaluation, exception = exception), True)
+
+  def __callGuarded(self, callback, permission, context, type, evaluation):
+    """Calls a permission callback through the circuit breaker of its type, if any, and with its timeouts. Returns a tuple with the result and whether a fallback was used."""
+    breaker = self.__circuit_breakers.get(type)
+    if breaker is None:
+      return self.__callWithTimeout(callback = callback, permission = permission, context = context, type = type, evaluation = evaluation)
+    ticket = breaker.allowCall()
+    if not ticket:
+      exception = CircuitBreakerOpenException('The circuit breaker for the permission type "{0}" is open.'.format(type))
+      return (self.__getFallbackAccess(fallback = breaker.getFallback(), evaluation = evaluation, exception = exception), True)
+
+    clock = breaker.getClock()
+    start = clock()
+    try:
+      access, timed_out = self.__callWithTimeout(callback = callback, permission = permission, context = context, type = type, evaluation = evaluation)
+    except Exception:
+      breaker.recordFailure()
+      raise
+    if timed_out:
+      breaker.recordFailure()
+    else:
+      breaker.recordSuccess(duration = clock() - start, ticket = ticket)
+    return (access, timed_out)
+
+  def __getFallbackAccess(self, fallback, evaluation, exception):
+    if fallback == 'raise':
+      raise exception
+    if evaluation is not None:
+      evaluation['fallback_used'] = True
+    if fallback == 'unknown' and evaluation is not None and evaluation['unknown']:
+      return UNKNOWN
+    return fallback == 'allow'
+
+  def __getTypeUniverse(self, name):
+    universe = self.__type_universes.get(name)
+    if universe is None:
+      return None
+    return universe[:2]
+
+  def __getContextMask(self, type, context, evaluation):
+    masks = evaluation['masks']
+    if type not in masks:
+      values, bits, values_callback = self.__type_universes[type]
+      context_values = values_callback(context)
+      if not evaluation['trusted'] and not isinstance(context_values, (list, tuple, set, frozenset)):
+        raise InvalidCallbackReturnTypeException('The values callback for the permission type "{0}" must return a list, tuple, set or frozenset.'.format(type))
+      mask = 0
+      for value in context_values:
+        mask |= bits.get(value, 0)
+      masks[type] = mask
+    return masks[type]
+
+  def __preparePrefetch(self, compiled_list, evaluation):
+    if not self.__prefetch_callbacks:
+      return
+    prefetch_values = evaluation['prefetch_values']
+    for compiled in compiled_list:
+      leaves = self.getRequiredLeaves(permissions = compiled)['leaves']
+      for type in leaves:
+        if type in self.__prefetch_callbacks:
+          prefetch_values[type] = prefetch_values.get(type, frozenset()) | leaves[type]
+
+  def __getPrefetchedAccess(self, permission, context, type, evaluation):
+    prefetched = evaluation['prefetched']
+    if type not in prefetched:
+      if type not in evaluation['prefetch_values']:
+        return None
+      results = self.__prefetch_callbacks[type](evaluation['prefetch_values'][type], context)
+      if results is None:
+        results = {}
+      if not isinstance(results, dict) or not all(isinstance(access, bool) for access in results.values()):
+        raise InvalidCallbackReturnTypeException('The prefetch callback for the permission type "{0}" must return a dictionary with boolean values.'.format(type))
+      prefetched[type] = results
+    return prefetched[type].get(permission)
+
+  def __checkBypassAccess(self, context, evaluation = None):
+    if evaluation is not None and 'bypass' in evaluation:
+      return evaluation['bypass']
     bypass_callback = self.getBypassCallback()
     if not hasattr(bypass_callback, '__call__'):
       return False
 
     bypass_access = bypass_callback(context)
-    if not isinstance(bypass_access, bool):
+    if (evaluation is None or not evaluation['trusted']) and not isinstance(bypass_access, bool):
       raise InvalidCallbackReturnTypeException('The bypass access callback must return a boolean.')
+    if evaluation is not None:
+      evaluation['bypass'] = bypass_access
     return bypass_access
 
-  def __dispatch(self, permissions, context = {}, type = None):
+  def __checkCachedAccess(self, compiled, context, allow_bypass, evaluation):
+    cache = self.__decision_cache
+    if cache is None:
+      return self.__checkCompiledAccess(compiled = compiled, context = context, allow_bypass = allow_bypass, evaluation = evaluation)
+    fingerprint = cache.getFingerprint(context)
+    if fingerprint is None:
+      return self.__checkCompiledAccess(compiled = compiled, context = context, allow_bypass = allow_bypass, evaluation = evaluation)
+
+    key = (compiled.root, compiled.no_bypass, allow_bypass, fingerprint)
+    version = self.__version
+    access = cache.get(key, version = version)
+    if access is None:
+      # The permissions that the decision depends on are recorded separately for each decision, while the permission results are still shared
+      decision_evaluation = dict(evaluation)
+      decision_evaluation.update({'policies': {}, 'nodes': {}, 'leaves': set()})
+      access = self.__checkCompiledAccess(compiled = compiled, context = context, allow_bypass = allow_bypass, evaluation = decision_evaluation)
+      if decision_evaluation['fallback_used']:
+        # decisions that depend on a timed out permission are not cached
+        evaluation['fallback_used'] = True
+      else:
+        cache.set(key, access, version = version, tags = decision_evaluation['leaves'])
+      if 'bypass' in decision_evaluation:
+        evaluation['bypass'] = decision_evaluation['bypass']
+      evaluation['leaves'] |= decision_evaluation['leaves']
+    return access
+
+  def __getTieredPermissions(self, permissions):
+    """Counts an evaluation of a permission tree that isn't compiled, and returns the compiled permission tree once the permission tree is hot or else the permission tree itself."""
+    compile_threshold = self.__tiering_thresholds[0]
+    if compile_threshold is None:
+      return permissions
+
+    try:
+      # The serialization is computed in C and is several times faster than the tree key, and it tells apart exactly the permission trees that
+      # are evaluated differently, since it keeps the types of the values and the order of the children. Version 0 doesn't mark interned
+      # strings or share repeated objects, so equal permission trees always get the same key.
+      key = marshal.dumps(permissions, 0)
+    except ValueError:
+      # values that can't be serialized, such as string subclasses, and permission trees that are nested too deeply fall back to the tree key
+      key = None
+    try:
+      if key is None:
+        key = self.__compiler.getTreeKey(permissions = permissions)
+      # Each entry holds the number of evaluations and the compiled permission tree, or False if it can't be compiled.
+      # Reinserting the entry marks it as the most recently used, and the least recently used entry is evicted when the table is full.
+      entry = self.__tree_tiers.pop(key, None)
+    except TypeError: # unhashable values are reported when the permission tree is evaluated
+      return permissions
+    if entry is None:
+      entry = [0, None]
+    self.__tree_tiers[key] = entry
+    while len(self.__tree_tiers) > self.__tree_tiers_max_size:
+      self.__tree_tiers.popitem(last = False)
+
+    entry[0] += 1
+    if entry[1] is None and entry[0] > compile_threshold:
+      try:
+        # The compiled permission tree keeps the order of the children, so that it evaluates the same permissions as the interpreter
+        # even if an equivalent permission tree with a different order has been compiled before.
+        entry[1] = self.__compiler.compile(permissions = permissions, ordered = True)
+      except (InvalidArgumentTypeException, InvalidArgumentValueException):
+        # the interpreter doesn't evaluate the children that a logic gate doesn't need, so it may accept some invalid permission trees
+        entry[1] = False
+    if entry[1]:
+      return entry[1]
+    return permissions
+
+  def __getGeneratedCode(self, compiled):
+    """Counts an evaluation of a compiled permission tree, and returns a tuple with the generated functions for its root and NO_BYPASS nodes once it is hot, or else None."""
+    code = self.__generated_code.get(compiled)
+    if code is not None or compiled in self.__generated_code:
+      return code
+    count = self.__compiled_counts.get(compiled, 0) + 1
+    self.__compiled_counts[compiled] = count
+    generate_threshold = self.__tiering_thresholds[1]
+    if generate_threshold is None or count <= generate_threshold:
+      return None
+
+    root_code = self.__compiler.generateCode(root = compiled.root)
+    no_bypass_code = None
+    if compiled.no_bypass is not None:
+      no_bypass_code = self.__compiler.generateCode(root = compiled.no_bypass)
+    if root_code is None or (compiled.no_bypass is not None and no_bypass_code is None):
+      # permission trees that are too large for generated code keep being evaluated by walking their nodes
+      code = None
+    else:
+      code = (root_code, no_bypass_code)
+    self.__generated_code[compiled] = code
+    return code
+
+  def __checkCompiledAccess(self, compiled, context, allow_bypass, evaluation):
+    if self.__unknown_fallback:
+      evaluation['unknown'] = True
+      if allow_bypass and compiled.no_bypass is not None:
+        # bypassing access is not allowed if the NO_BYPASS condition is unknown
+        allow_bypass = self.__evaluateNodeUnknown(node = compiled.no_bypass, context = context, evaluation = evaluation) is False
+      if allow_bypass and self.__checkBypassAccess(context = context, evaluation = evaluation):
+        return True
+      return self.__evaluateNodeUnknown(node = compiled.root, context = context, evaluation = evaluation) is True
+    if self.__tiering_thresholds is not None and evaluation['budget'] is None:
+      code = self.__getGeneratedCode(compiled = compiled)
+      if code is not None:
+        root_code, no_bypass_code = code
+        if allow_bypass and no_bypass_code is not None:
+          allow_bypass = not no_bypass_code(self.__evaluateNode, context, evaluation)
+        if allow_bypass and self.__checkBypassAccess(context = context, evaluation = evaluation):
+          return True
+        return root_code(self.__evaluateNode, context, evaluation)
+    if allow_bypass and compiled.no_bypass is not None:
+      allow_bypass = not self.__evaluateNode(node = compiled.no_bypass, context = context, evaluation = evaluation)
+    if allow_bypass and self.__checkBypassAccess(context = context, evaluation = evaluation):
+      return True
+    return self.__evaluateNode(node = compiled.root, context = context, evaluation = evaluation)
+
+  def __evaluateNode(self, node, context, evaluation):
+    access = self.__getEvaluatedNode(node = node, context = context, evaluation = evaluation)
+    if access is not None:
+      return access
+
+    # The nodes are evaluated with an explicit stack so that deep permission trees don't hit the recursion limit.
+    # Each frame holds the node, the number of children that have been evaluated and the number of them that were true.
+    nodes = evaluation['nodes']
+    budget = evaluation['budget']
+    stack = [[node, 0, 0]]
+    child_access = None
+    while stack:
+      frame = stack[-1]
+      current = frame[0]
+      gate = current.gate
+      if gate == 'POLICY':
+        children = (self.__getCompiledPolicy(name = current.value).root,)
+      else:
+        children = current.children
+        if gate == 'MASK':
+          gate = MASK_FALLBACK_GATES[current.value[0]]
+        elif gate == 'TABLE':
+          gate = 'AND'
+
+      access = None
+      pushed = False
+      while True:
+        if child_access is not None:
+          frame[2] += child_access
+          if gate == 'AND':
+            if not child_access:
+              access = False
+          elif gate == 'NAND':
+            if not child_access:
+              access = True
+          elif gate == 'OR':
+            if child_access:
+              access = True
+          elif gate == 'NOR':
+            if child_access:
+              access = False
+          elif gate == 'XOR':
+            if frame[2] > 0 and frame[1] > frame[2]:
+              access = True
+          elif gate == 'NOT':
+            access = not child_access
+          else:
+            access = child_access
+          child_access = None
+          if access is not None:
+            break
+        if frame[1] == len(children):
+          access = gate in ['AND', 'NOR']
+          break
+        child = children[frame[1]]
+        frame[1] += 1
+        child_access = self.__getEvaluatedNode(node = child, context = context, evaluation = evaluation)
+        if child_access is None:
+          if budget is not None:
+            self.__spendBudget(budget = budget, callbacks = 0)
+          stack.append([child, 0, 0])
+          pushed = True
+          break
+      if pushed:
+        continue
+
+      nodes[current] = access
+      if current.gate == 'POLICY':
+        evaluation['policies'][current.value] = access
+      stack.pop()
+      child_access = access
+    return child_access
+
+  def __evaluateNodeUnknown(self, node, context, evaluation):
+    """Works like __evaluateNode(), but in three-valued logic where the result of a permission can be UNKNOWN. A logic gate is only UNKNOWN if its known children don't decide it."""
+    access = self.__getEvaluatedNode(node = node, context = context, evaluation = evaluation)
+    if access is not None:
+      return access
+
+    # Each frame holds the node, the number of children that have been evaluated and the number of them that were true and unknown
+    nodes = evaluation['nodes']
+    budget = evaluation['budget']
+    stack = [[node, 0, 0, 0]]
+    child_access = None
+    while stack:
+      frame = stack[-1]
+      current = frame[0]
+      gate = current.gate
+      if gate == 'POLICY':
+        children = (self.__getCompiledPolicy(name = current.value).root,)
+      else:
+        children = current.children
+        if gate == 'MASK':
+          gate = MASK_FALLBACK_GATES[current.value[0]]
+        elif gate == 'TABLE':
+          gate = 'AND'
+
+      access = None
+      pushed = False
+      while True:
+        if child_access is UNKNOWN:
+          frame[3] += 1
+          if gate in ['NOT', 'POLICY']:
+            access = UNKNOWN
+          child_access = None
+        elif child_access is not None:
+          frame[2] += child_access
+          if gate == 'XOR':
+            if frame[2] > 0 and frame[1] > frame[2] + frame[3]:
+              access = True
+          else:
+            access = self.__getShortCircuitedAccess(gate = gate, child_access = child_access, evaluated = frame[1], granted = frame[2])
+          child_access = None
+        if access is not None:
+          break
+        if frame[1] == len(children):
+          access = UNKNOWN if frame[3] else gate in ['AND', 'NOR']
+          break
+        child = children[frame[1]]
+        frame[1] += 1
+        child_access = self.__getEvaluatedNode(node = child, context = context, evaluation = evaluation)
+        if child_access is None:
+          if budget is not None:
+            self.__spendBudget(budget = budget, callbacks = 0)
+          stack.append([child, 0, 0, 0])
+          pushed = True
+          break
+      if pushed:
+        continue
+
+      nodes[current] = access
+      if current.gate == 'POLICY':
+        evaluation['policies'][current.value] = access
+      stack.pop()
+      child_access = access
+    return child_access
+
+  def __getEvaluatedNode(self, node, context, evaluation):
+    """Gets the result of a node that can be evaluated without evaluating any child nodes, or None if the node has to be evaluated with its children."""
+    nodes = evaluation['nodes']
+    if node in nodes:
+      return nodes[node]
+
+    gate = node.gate
+    if gate == 'LEAF':
+      leaf_results = evaluation['leaf_results']
+      if node in leaf_results:
+        evaluation['leaves'].add((node.type, node.value))
+        return leaf_results[node]
+      access = self.__externalAccessCheck(permission = node.value, context = context, type = node.type, evaluation = evaluation)
+      leaf_results[node] = access
+      return access
+    if gate == 'TRUE':
+      return True
+    if gate == 'FALSE':
+      return False
+    if gate == 'POLICY':
+      # decisions are tagged with the policies that they evaluated, so that changing a policy only discards those decisions
+      evaluation['leaves'].add(('POLICY', node.value))
+      if node.value in evaluation['policies']:
+        return evaluation['policies'][node.value]
+    if gate == 'MASK':
+      mode, mask, values = node.value
+      universe = self.__type_universes.get(node.type)
+      if universe is None or universe[0] is not values:
+        # the node was compiled for another universe, so its LEAF nodes are evaluated instead
+        return None
+      masked = self.__getContextMask(type = node.type, context = context, evaluation = evaluation) & mask
+      if mode == 'ANY':
+        access = masked != 0
+      elif mode == 'ALL':
+        access = masked == mask
+      elif mode == 'NOT_ANY':
+        access = masked == 0
+      elif mode == 'NOT_ALL':
+        access = masked != mask
+      else:
+        access = masked != 0 and masked != mask
+      if self.__decision_cache is not None:
+        evaluation['leaves'].update((child.type, child.value) for child in node.children)
+      nodes[node] = access
+      return access
+    if gate == 'TABLE':
+      spec, table, tags = node.value
+      index = 0
+      shift = 0
+      for type, values, bits in spec:
+        universe = self.__type_universes.get(type)
+        if universe is None or universe[0] is not values:
+          # the node was compiled for another universe, so its subtree is evaluated instead
+          return None
+        mask = self.__getContextMask(type = type, context = context, evaluation = evaluation)
+        for bit in bits:
+          if mask & bit:
+            index |= 1 << shift
+          shift += 1
+      access = table >> index & 1 == 1
+      if self.__decision_cache is not None:
+        evaluation['leaves'].update(tags)
+      nodes[node] = access
+      return access
+    return None
+
+  def __checkAccessSteps(self, compiled, context, allow_bypass):
+    # A generator that yields frozensets of requested permissions and finally yields the access result
+    evaluation = self.__createEvaluation()
+    evaluation['sent'] = {}
+    result = []
+    if allow_bypass and compiled.no_bypass is not None:
+      steps = self.__evaluateNodeSteps(node = compiled.no_bypass, context = context, evaluation = evaluation, result = result)
+      for request in steps:
+        self.__storeSentResults(request = request, results = (yield request), evaluation = evaluation)
+      # bypassing access is not allowed if the NO_BYPASS condition is unknown
+      allow_bypass = result.pop() is False
+    if allow_bypass and self.__checkBypassAccess(context = context, evaluation = evaluation):
+      yield True
+      return
+    steps = self.__evaluateNodeSteps(node = compiled.root, context = context, evaluation = evaluation, result = result)
+    for request in steps:
+      self.__storeSentResults(request = request, results = (yield request), evaluation = evaluation)
+    yield result.pop() is True
+
+  def __evaluateNodeSteps(self, node, context, evaluation, result):
+    # Works like __evaluateNodeUnknown(), but yields the permissions that are needed instead of calling the callbacks.
+    # The results are stored by __checkAccessSteps() before the generator is resumed, and the access result is appended to result.
+    nodes = evaluation['nodes']
+    access, request = self.__getSteppedNode(node = node, context = context, evaluation = evaluation)
+    while request is not None:
+      yield request
+      access, request = self.__getSteppedNode(node = node, context = context, evaluation = evaluation)
+    if access is not None:
+      result.append(access)
+      return
+
+    stack = [[node, 0, 0, 0]]
+    child_access = None
+    while stack:
+      frame = stack[-1]
+      current = frame[0]
+      gate = current.gate
+      if gate == 'POLICY':
+        children = (self.__getCompiledPolicy(name = current.value).root,)
+      else:
+        children = current.children
+        if gate == 'TABLE':
+          gate = 'AND'
+
+      access = None
+      pushed = False
+      while True:
+        if child_access is UNKNOWN:
+          frame[3] += 1
+          if gate in ['NOT', 'POLICY']:
+            access = UNKNOWN
+          child_access = None
+        elif child_access is not None:
+          frame[2] += child_access
+          if gate == 'XOR':
+            if frame[2] > 0 and frame[1] > frame[2] + frame[3]:
+              access = True
+          else:
+            access = self.__getShortCircuitedAccess(gate = gate, child_access = child_access, evaluated = frame[1], granted = frame[2])
+          child_access = None
+        if access is not None:
+          break
+        if frame[1] == len(children):
+          access = UNKNOWN if frame[3] else gate in ['AND', 'NOR']
+          break
+        child = children[frame[1]]
+        frame[1] += 1
+        child_access, request = self.__getSteppedNode(node = child, context = context, evaluation = evaluation)
+        while request is not None:
+          yield request
+          child_access, request = self.__getSteppedNode(node = child, context = context, evaluation = evaluation)
+        if child_access is None:
+          stack.append([child, 0, 0, 0])
+          pushed = True
+          break
+      if pushed:
+        continue
+
+      nodes[current] = access
+      if current.gate == 'POLICY':
+        evaluation['policies'][current.value] = access
+      stack.pop()
+      child_access = access
+    result.append(child_access)
+
+  def __getShortCircuitedAccess(self, gate, child_access, evaluated, granted):
+    """Gets the result of a logic gate that is decided by the result of its latest evaluated child, or None if more children have to be evaluated."""
+    if gate == 'AND':
+      return False if not child_access else None
+    if gate == 'NAND':
+      return True if not child_access else None
+    if gate == 'OR':
+      return True if child_access else None
+    if gate == 'NOR':
+      return False if child_access else None
+    if gate == 'XOR':
+      return True if granted > 0 and evaluated > granted else None
+    if gate == 'NOT':
+      return not child_access
+    return child_access
+
+  def __getSteppedNode(self, node, context, evaluation):
+    """Gets a tuple with the result of a node that can be evaluated without evaluating any child nodes and the frozenset of permissions that are needed to evaluate it. Both are None if the node has to be evaluated with its children."""
+    gate = node.gate
+    if gate in ['LEAF', 'MASK']:
+      if node in evaluation['nodes']:
+        return (evaluation['nodes'][node], None)
+      leaves = [node] if gate == 'LEAF' else node.children
+      sent = evaluation['sent']
+      request = []
+      for leaf in leaves:
+        if (leaf.type, leaf.value) not in sent:
+          if not self.typeExists(name = leaf.type):
+            raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(leaf.type))
+          request.append((leaf.type, leaf.value))
+      if request:
+        return (None, frozenset(request))
+      if gate == 'LEAF':
+        access = sent[(node.type, node.value)]
+      else:
+        # all permissions of a MASK node are requested together, and the node is evaluated as its equivalent logic gate
+        unknown = sum(1 for leaf in leaves if sent[(leaf.type, leaf.value)] is UNKNOWN)
+        granted = sum(1 for leaf in leaves if sent[(leaf.type, leaf.value)] is True)
+        denied = len(leaves) - granted - unknown
+        mask_gate = MASK_FALLBACK_GATES[node.value[0]]
+        if mask_gate in ['AND', 'NAND']:
+          access = False if denied else UNKNOWN if unknown else True
+        elif mask_gate in ['OR', 'NOR']:
+          access = True if granted else UNKNOWN if unknown else False
+        else:
+          access = True if granted and denied else UNKNOWN if unknown else False
+        if mask_gate in ['NAND', 'NOR'] and access is not UNKNOWN:
+          access = not access
+      evaluation['nodes'][node] = access
+      return (access, None)
+    if gate == 'TABLE':
+      if node in evaluation['nodes']:
+        return (evaluation['nodes'][node], None)
+      return (None, None)
+    return (self.__getEvaluatedNode(node = node, context = context, evaluation = evaluation), None)
+
+  def __storeSentResults(self, request, results, evaluation):
+    if not isinstance(results, dict):
+      raise InvalidArgumentTypeException('The results sent to the generator must be a dictionary.')
+    sent = evaluation['sent']
+    for leaf in request:
+      if leaf not in results:
+        raise InvalidArgumentValueException('The results sent to the generator are missing the requested permission {0}.'.format(leaf))
+      if not isinstance(results[leaf], bool) and results[leaf] is not UNKNOWN:
+        raise InvalidArgumentValueException('The result for the permission {0} must be a boolean or UNKNOWN.'.format(leaf))
+      sent[leaf] = results[leaf]
+
+  def __getCompiledPolicy(self, name):
+    if name not in self.__compiled_policies:
+      if not self.policyExists(name = name):
+        raise PolicyNotRegisteredException('The policy "{0}" has not been registered. Please use LogicalPermissions::addPolicy() or LogicalPermissions::setPolicies() to register policies.'.format(name))
+      self.__compiled_policies[name] = self.compile(permissions = self.__policies[name])
+    return self.__compiled_policies[name]
+
+  def __filterItems(self, permissions_for, items, base_context, known_types, item_key, allow_bypass):
+    # The residual permission trees are cached by their permission trees, and the least recently used one is evicted when the cache is full
+    residuals = OrderedDict()
+    bypass_evaluation = self.__createEvaluation()
+    for item in items:
+      permissions = permissions_for(item)
+      if isinstance(permissions, CompiledPermissions):
+        key = permissions
+      else:
+        try:
+          key = self.__compiler.getTreeKey(permissions = permissions)
+          hash(key)
+        except TypeError:
+          raise InvalidArgumentValueException('The permission tree for an item contains an unhashable value. Evaluated permissions: {0}'.format(permissions))
+      residual = residuals.pop(key, None)
+      if residual is None:
+        residual = self.partialEvaluate(permissions = permissions, context = base_context, known_types = known_types)
+        if len(residuals) >= self.__filter_residuals_max_size:
+          residuals.popitem(last = False)
+      # reinserting the residual permission tree marks it as the most recently used
+      residuals[key] = residual
+
+      if residual.root.gate == 'TRUE' and residual.no_bypass is None:
+        yield item
+        continue
+
+      context = base_context.copy()
+      context[item_key] = item
+      evaluation = self.__createEvaluation()
+      self.__preparePrefetch(compiled_list = [residual], evaluation = evaluation)
+      if allow_bypass:
+        evaluation['bypass'] = self.__checkBypassAccess(context = base_context, evaluation = bypass_evaluation)
+      if self.__checkCompiledAccess(compiled = residual, context = context, allow_bypass = allow_bypass, evaluation = evaluation):
+        yield item
+
+  def __collectLeaves(self, node, leaves, visited, policies):
+    stack = [node]
+    while stack:
+      node = stack.pop()
+      if node in visited:
+        continue
+      visited.add(node)
+      if node.gate == 'LEAF':
+        leaves.setdefault(node.type, set()).add(node.value)
+      elif node.gate == 'POLICY':
+        policies.add(node.value)
+        stack.append(self.__getCompiledPolicy(name = node.value).root)
+      stack.extend(node.children)
+
+  def __getNodeSubjects(self, node, population):
+    # The nodes are evaluated in post-order with an explicit stack, and each node is evaluated to the frozenset of subjects that it grants access to.
+    # The subjects for which a node is unknown, because of a fallback of 'unknown', are kept in a separate frozenset for the nodes that have any.
+    nodes = population['nodes']
+    unknowns = population['unknowns']
+    subjects = population['subjects']
+    stack = [(node, False)]
+    while stack:
+      current, expanded = stack.pop()
+      if current in nodes:
+        continue
+      gate = current.gate
+      if gate == 'POLICY':
+        children = (self.__getCompiledPolicy(name = current.value).root,)
+        gate = 'AND'
+      else:
+        children = current.children
+        if gate == 'MASK':
+          gate = MASK_FALLBACK_GATES[current.value[0]]
+        elif gate == 'TABLE':
+          gate = 'AND'
+      if children and not expanded:
+        stack.append((current, True))
+        stack.extend((child, False) for child in children if child not in nodes)
+        continue
+
+      unknown = None
+      if gate == 'LEAF':
+        result, unknown = self.__getLeafSubjects(node = current, population = population)
+      elif gate == 'TRUE':
+        result = subjects
+      elif gate == 'FALSE':
+        result = frozenset()
+      elif gate == 'NOT':
+        unknown = unknowns.get(children[0])
+        result = subjects - nodes[children[0]]
+        if unknown:
+          result -= unknown
+      elif any(child in unknowns for child in children):
+        result, unknown = self.__getUnknownGateSubjects(gate = gate, children = children, population = population)
+      else:
+        child_subjects = sorted((nodes[child] for child in children), key = len)
+        any_subjects = frozenset().union(*child_subjects)
+        all_subjects = subjects.intersection(*child_subjects)
+        if gate == 'AND':
+          result = all_subjects
+        elif gate == 'NAND':
+          result = subjects - all_subjects
+        elif gate == 'OR':
+          result = any_subjects
+        elif gate == 'NOR':
+          result = subjects - any_subjects
+        else:
+          result = any_subjects - all_subjects if child_subjects else frozenset()
+      nodes[current] = result
+      if unknown:
+        unknowns[current] = unknown
+    return nodes[node]
+
+  def __getUnknownGateSubjects(self, gate, children, population):
+    """Evaluates a logic gate in three-valued logic, where some of its children are unknown for some subjects. Returns a tuple with the frozensets of subjects that it grants access to and that it is unknown for."""
+    subjects = population['subjects']
+    granted = [population['nodes'][child] for child in children]
+    denied = [subjects - population['nodes'][child] - population['unknowns'].get(child, frozenset()) for child in children]
+    any_granted = frozenset().union(*granted)
+    all_granted = subjects.intersection(*granted)
+    any_denied = frozenset().union(*denied)
+    all_denied = subjects.intersection(*denied)
+    if gate in ['AND', 'NAND']:
+      result, denied_result = all_granted, any_denied
+    elif gate in ['OR', 'NOR']:
+      result, denied_result = any_granted, all_denied
+    else:
+      # an XOR gate needs a granted and a denied child, and it is denied if all of its children are granted or all are denied
+      result, denied_result = any_granted & any_denied, all_granted | all_denied
+    unknown = subjects - result - denied_result
+    if gate in ['NAND', 'NOR']:
+      result = denied_result
+    return (result, unknown)
+
+  def __getLeafSubjects(self, node, population):
+    if not self.typeExists(name = node.type):
+      raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(node.type))
+    index = population['index']
+    if node.type in index.getTypes():
+      # subjects that were added to the index during the evaluation are left out
+      return (index.getSubjects(type = node.type, value = node.value) & population['subjects'], None)
+    if population['context_for'] is None:
+      raise InvalidArgumentValueException('The permission type "{0}" is not indexed by the population index. Please index the type or pass context_for to evaluate it for each subject.'.format(node.type))
+    subjects = []
+    unknown = []
+    for subject in population['subjects']:
+      context, evaluation = self.__getSubjectEvaluation(subject = subject, population = population)
+      access = self.__evaluateNode(node = node, context = context, evaluation = evaluation)
+      if access is UNKNOWN:
+        unknown.append(subject)
+      elif access:
+        subjects.append(subject)
+    return (frozenset(subjects), frozenset(unknown))
+
+  def __getSubjectEvaluation(self, subject, population):
+    evaluations = population['evaluations']
+    if subject not in evaluations:
+      context = population['context_for'](subject)
+      if not isinstance(context, dict):
+        raise InvalidCallbackReturnTypeException('The context_for callback must return a dictionary.')
+      evaluation = self.__createEvaluation()
+      evaluation['unknown'] = self.__unknown_fallback
+      evaluations[subject] = (context, evaluation)
+    return evaluations[subject]
+
+  def __translateNodeToSql(self, node, context, known_types, params):
+    # The nodes are translated in post-order with an explicit stack, and each node is translated to a tuple with its SQL string and its parameters
+    results = {}
+    stack = [(node, False)]
+    while stack:
+      current, expanded = stack.pop()
+      if current in results:
+        continue
+      gate = current.gate
+      if gate in ['LEAF', 'MASK'] and current.type in known_types or gate == 'TABLE' and all(type in known_types for type, values, bits in current.value[0]):
+        # partial evaluation only keeps the permissions of known types whose result is unknown
+        results[current] = ('1 = NULL', [])
+        continue
+      if gate == 'MASK':
+        gate = MASK_FALLBACK_GATES[current.value[0]]
+      if gate == 'XOR':
+        # At least one child must be true and at least one child must be false
+        children = (self.__compiler.getGateNode(gate = 'OR', children = current.children), self.__compiler.getGateNode(gate = 'AND', children = current.children))
+      elif gate == 'TABLE':
+        children = current.children
+      elif gate in ['LEAF', 'TRUE', 'FALSE']:
+        children = ()
+      else:
+        children = current.children
+      if children and not expanded:
+        stack.append((current, True))
+        stack.extend((child, False) for child in reversed(children) if child not in results)
+        continue
+
+      if gate == 'TRUE':
+        result = ('1 = 1', [])
+      elif gate == 'FALSE':
+        result = ('1 = 0', [])
+      elif gate == 'LEAF':
+        builder = self.__sql_builders.get(current.type)
+        if builder is None:
+          raise InvalidArgumentValueException('The permission type "{0}" has no SQL builder. Please use LogicalPermissions::setTypeSqlBuilder() to set one or pass the type in known_types.'.format(current.type))
+        fragment = builder(current.value, context)
+        if not isinstance(fragment, tuple) or len(fragment) != 2 or not isinstance(fragment[0], str) or not isinstance(fragment[1], (list, tuple)):
+          raise InvalidCallbackReturnTypeException('The SQL builder for the permission type "{0}" must return a tuple with an SQL string and a list of parameters.'.format(current.type))
+        result = (fragment[0], list(fragment[1]))
+      elif gate == 'TABLE':
+        result = results[children[0]]
+      elif gate == 'NOT':
+        result = ('NOT ({0})'.format(results[children[0]][0]), results[children[0]][1])
+      elif gate == 'XOR':
+        any_sql, any_params = results[children[0]]
+        all_sql, all_params = results[children[1]]
+        result = ('({0}) AND NOT ({1})'.format(any_sql, all_sql), any_params + all_params)
+      else:
+        operator = ' AND ' if gate in ['AND', 'NAND'] else ' OR '
+        sql = operator.join('({0})'.format(results[child][0]) for child in children)
+        if gate in ['NAND', 'NOR']:
+          sql = 'NOT ({0})'.format(sql)
+        result = (sql, [param for child in children for param in results[child][1]])
+      results[current] = result
+    params.extend(results[node][1])
+    return results[node][0]
+
+  def __partialEvaluateNode(self, node, context, known_types, evaluation, residuals):
+    # The nodes are partially evaluated with an explicit stack so that deep permission trees don't hit the recursion limit.
+    # Each frame holds the node, its children and the residuals of the children that have been evaluated. The children are evaluated
+    # in order and the remaining ones are skipped once a logic gate is decided, so that their permissions are not evaluated.
+    if node in residuals:
+      return residuals[node]
+
+    stack = [[node, self.__getPartialChildren(node = node, known_types = known_types), []]]
+    while stack:
+      frame = stack[-1]
+      current, children, child_residuals = frame
+      if len(child_residuals) < len(children) and not self.__isPartiallyDecided(gate = current.gate, child_residuals = child_residuals):
+        child = children[len(child_residuals)]
+        if child in residuals:
+          child_residuals.append(residuals[child])
+        else:
+          stack.append([child, self.__getPartialChildren(node = child, known_types = known_types), []])
+        continue
+
+      residual = self.__getPartialResidual(node = current, context = context, known_types = known_types, evaluation = evaluation, child_residuals = child_residuals)
+      residuals[current] = residual
+      stack.pop()
+      if stack:
+        stack[-1][2].append(residual)
+    return residuals[node]
+
+  def __getPartialChildren(self, node, known_types):
+    gate = node.gate
+    if gate == 'POLICY':
+      return (self.__getCompiledPolicy(name = node.value).root,)
+    if gate == 'TABLE':
+      if all(type in known_types for type, values, bits in node.value[0]):
+        return ()
+      return node.children
+    if gate in ['AND', 'NAND', 'OR', 'NOR', 'XOR', 'NOT']:
+      return node.children
+    return ()
+
+  def __isPartiallyDecided(self, gate, child_residuals):
+    if not child_residuals:
+      return False
+    if gate in ['AND', 'NAND']:
+      # AND and NAND are decided by a FALSE child, OR and NOR by a TRUE child
+      return child_residuals[-1].gate == 'FALSE'
+    if gate in ['OR', 'NOR']:
+      return child_residuals[-1].gate == 'TRUE'
+    if gate == 'XOR':
+      # An XOR gate needs at least one TRUE and at least one FALSE child
+      gates = [child_residual.gate for child_residual in child_residuals]
+      return 'TRUE' in gates and 'FALSE' in gates
+    return False
+
+  def __getPartialResidual(self, node, context, known_types, evaluation, child_residuals):
+    compiler = self.__compiler
+    gate = node.gate
+    if gate in ['LEAF', 'MASK'] or (gate == 'TABLE' and not child_residuals):
+      if gate != 'TABLE' and node.type not in known_types:
+        return node
+      if evaluation['unknown']:
+        access = self.__evaluateNodeUnknown(node = node, context = context, evaluation = evaluation)
+        if access is UNKNOWN:
+          return node
+        return compiler.getBooleanNode(access)
+      return compiler.getBooleanNode(self.__evaluateNode(node = node, context = context, evaluation = evaluation))
+    if gate == 'TABLE':
+      return child_residuals[0]
+    if gate == 'POLICY':
+      return child_residuals[0]
+    if gate == 'NOT':
+      return compiler.getNegatedNode(child_residuals[0])
+    if gate in ['AND', 'NAND', 'OR', 'NOR']:
+      deciding_gate = 'FALSE' if gate in ['AND', 'NAND'] else 'TRUE'
+      children = [child_residual for child_residual in child_residuals if child_residual.gate not in ['TRUE', 'FALSE']]
+      if child_residuals and child_residuals[-1].gate == deciding_gate:
+        residual = compiler.getBooleanNode(deciding_gate == 'TRUE')
+      elif not children:
+        residual = compiler.getBooleanNode(deciding_gate == 'FALSE')
+      else:
+        residual = compiler.getGateNode(gate = 'AND' if gate in ['AND', 'NAND'] else 'OR', children = children)
+      if gate in ['NAND', 'NOR']:
+        residual = compiler.getNegatedNode(residual)
+      return residual
+    if gate == 'XOR':
+      children = [child_residual for child_residual in child_residuals if child_residual.gate not in ['TRUE', 'FALSE']]
+      gates = [child_residual.gate for child_residual in child_residuals]
+      has_true = 'TRUE' in gates
+      has_false = 'FALSE' in gates
+      if has_true and has_false:
+        return compiler.getBooleanNode(True)
+      if not children:
+        return compiler.getBooleanNode(False)
+      if has_true:
+        return compiler.getGateNode(gate = 'NAND', children = children)
+      if has_false:
+        return compiler.getGateNode(gate = 'OR', children = children)
+      return compiler.getGateNode(gate = 'XOR', children = children)
+    return node
+
+  def __dispatch(self, permissions, context = {}, type = None, evaluation = None):
     if isinstance(permissions, bool):
       if permissions == True:
         if type is not None:
@@ -255,9 +2382,9 @@ class LogicalPermissions(object):
         if type is not None:
           raise InvalidArgumentValueException('You cannot put a boolean permission as a descendant to a permission type. Existing type: {0}. Evaluated permissions: {1}'.format(type, permissions))
         return False
-      return self.__externalAccessCheck(permission = permissions, context = context, type = type)
+      return self.__externalAccessCheck(permission = permissions, context = context, type = type, evaluation = evaluation)
     if isinstance(permissions, list) and len(permissions) > 0:
-      return self.__processOR(permissions = permissions, context = context, type = type)
+      return self.__processOR(permissions = permissions, context = context, type = type, evaluation = evaluation)
     if isinstance(permissions, dict):
       if len(permissions) == 1:
         key = list(permissions.keys())[0]
@@ -269,34 +2396,38 @@ class LogicalPermissions(object):
           if key_upper == 'NO_BYPASS':
             raise InvalidArgumentValueException('The NO_BYPASS key must be placed highest in the permission hierarchy. Evaluated permissions: {}'.format(permissions))
           if key_upper == 'AND':
-            return self.__processAND(permissions = value, context = context, type = type)
+            return self.__processAND(permissions = value, context = context, type = type, evaluation = evaluation)
           if key_upper == 'NAND':
-            return self.__processNAND(permissions = value, context = context, type = type)
+            return self.__processNAND(permissions = value, context = context, type = type, evaluation = evaluation)
           if key_upper == 'OR':
-            return self.__processOR(permissions = value, context = context, type = type)
+            return self.__processOR(permissions = value, context = context, type = type, evaluation = evaluation)
           if key_upper == 'NOR':
-            return self.__processNOR(permissions = value, context = context, type = type)
+            return self.__processNOR(permissions = value, context = context, type = type, evaluation = evaluation)
           if key_upper == 'XOR':
-            return self.__processXOR(permissions = value, context = context, type = type)
+            return self.__processXOR(permissions = value, context = context, type = type, evaluation = evaluation)
           if key_upper == 'NOT':
-            return self.__processNOT(permissions = value, context = context, type = type)
+            return self.__processNOT(permissions = value, context = context, type = type, evaluation = evaluation)
           if key_upper == 'TRUE' or key_upper == 'FALSE':
             raise InvalidArgumentValueException('A boolean permission cannot have children. Evaluated permissions: {}'.format(permissions))
+          if key_upper == 'POLICY':
+            if type is not None:
+              raise InvalidArgumentValueException('You cannot put a policy reference as a descendant to a permission type. Existing type: {0}. Evaluated permissions: {1}'.format(type, permissions))
+            key = 'POLICY'
 
           if type is not None:
             raise InvalidArgumentValueException('You cannot put a permission type as a descendant to another permission type. Existing type: {0}. Evaluated permissions: {1}'.format(type, permissions))
-          if not self.typeExists(key):
+          if key != 'POLICY' and not self.typeExists(key):
             raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(key))
           type = key
 
         if isinstance(value, (dict, list)):
-          return self.__processOR(permissions = value, context = context, type = type)
-        return self.__dispatch(permissions = value, context = context, type = type)
+          return self.__processOR(permissions = value, context = context, type = type, evaluation = evaluation)
+        return self.__dispatch(permissions = value, context = context, type = type, evaluation = evaluation)
       if len(permissions) > 1:
-        return self.__processOR(permissions = permissions, context = context, type = type)
+        return self.__processOR(permissions = permissions, context = context, type = type, evaluation = evaluation)
     raise InvalidArgumentTypeException('Permissions must either be a boolean, a string, a dictionary or a list. Evaluated permissions: {0}'.format(permissions))
 
-  def __processAND(self, permissions, context, type = None):
+  def __processAND(self, permissions, context, type = None, evaluation = None):
     access = False
     if isinstance(permissions, list):
       if len(permissions) < 1:
@@ -304,7 +2435,7 @@ class LogicalPermissions(object):
 
       access = True
       for permission in permissions:
-        access = access and self.__dispatch(permissions = permission, context = context, type = type)
+        access = access and self.__dispatch(permissions = permission, context = context, type = type, evaluation = evaluation)
         if not access:
           break
     elif isinstance(permissions, dict):
@@ -314,14 +2445,14 @@ class LogicalPermissions(object):
       access = True
       for key in permissions:
         subpermissions = {key: permissions[key]}
-        access = access and self.__dispatch(permissions = subpermissions, context = context, type = type)
+        access = access and self.__dispatch(permissions = subpermissions, context = context, type = type, evaluation = evaluation)
         if not access:
           break
     else:
       raise InvalidValueForLogicGateException('The value of an AND gate must be a list or a dict. Current value: {0}'.format(permissions))
     return access
 
-  def __processNAND(self, permissions, context, type = None):
+  def __processNAND(self, permissions, context, type = None, evaluation = None):
     if isinstance(permissions, list):
       if len(permissions) < 1:
         raise InvalidValueForLogicGateException('The value list of a NAND gate must contain a minimum of one element. Current value: {0}'.format(permissions))
@@ -331,16 +2462,16 @@ class LogicalPermissions(object):
     else:
       raise InvalidValueForLogicGateException('The value of a NAND gate must be a list or a dict. Current value: {0}'.format(permissions))
 
-    return not self.__processAND(permissions = permissions, context = context, type = type)
+    return not self.__processAND(permissions = permissions, context = context, type = type, evaluation = evaluation)
 
-  def __processOR(self, permissions, context, type = None):
+  def __processOR(self, permissions, context, type = None, evaluation = None):
     access = False
     if isinstance(permissions, list):
       if len(permissions) < 1:
         raise InvalidValueForLogicGateException('The value list of an OR gate must contain a minimum of one element. Current value: {0}'.format(permissions))
 
       for permission in permissions:
-        access = access or self.__dispatch(permissions = permission, context = context, type = type)
+        access = access or self.__dispatch(permissions = permission, context = context, type = type, evaluation = evaluation)
         if access:
           break
     elif isinstance(permissions, dict):
@@ -349,14 +2480,14 @@ class LogicalPermissions(object):
 
       for key in permissions:
         subpermissions = {key: permissions[key]}
-        access = access or self.__dispatch(permissions = subpermissions, context = context, type = type)
+        access = access or self.__dispatch(permissions = subpermissions, context = context, type = type, evaluation = evaluation)
         if access:
           break
     else:
       raise InvalidValueForLogicGateException('The value of an OR gate must be a list or a dict. Current value: {0}'.format(permissions))
     return access
 
-  def __processNOR(self, permissions, context, type = None):
+  def __processNOR(self, permissions, context, type = None, evaluation = None):
     if isinstance(permissions, list):
       if len(permissions) < 1:
         raise InvalidValueForLogicGateException('The value list of a NOR gate must contain a minimum of one element. Current value: {0}'.format(permissions))
@@ -366,9 +2497,9 @@ class LogicalPermissions(object):
     else:
       raise InvalidValueForLogicGateException('The value of a NOR gate must be a list or a dict. Current value: {0}'.format(permissions))
 
-    return not self.__processOR(permissions = permissions, context = context, type = type)
+    return not self.__processOR(permissions = permissions, context = context, type = type, evaluation = evaluation)
 
-  def __processXOR(self, permissions, context, type = None):
+  def __processXOR(self, permissions, context, type = None, evaluation = None):
     access = False
     count_true = 0
     count_false = 0
@@ -377,7 +2508,7 @@ class LogicalPermissions(object):
         raise InvalidValueForLogicGateException('The value list of an XOR gate must contain a minimum of two elements. Current value: {0}'.format(permissions))
 
       for permission in permissions:
-        this_access = self.__dispatch(permissions = permission, context = context, type = type)
+        this_access = self.__dispatch(permissions = permission, context = context, type = type, evaluation = evaluation)
         if this_access:
           count_true += 1
         else:
@@ -391,7 +2522,7 @@ class LogicalPermissions(object):
 
       for key in permissions:
         subpermissions = {key: permissions[key]}
-        this_access = self.__dispatch(permissions = subpermissions, context = context, type = type)
+        this_access = self.__dispatch(permissions = subpermissions, context = context, type = type, evaluation = evaluation)
         if this_access:
           count_true += 1
         else:
@@ -403,7 +2534,7 @@ class LogicalPermissions(object):
       raise InvalidValueForLogicGateException('The value of an XOR gate must be a list or a dict. Current value: {0}'.format(permissions))
     return access
 
-  def __processNOT(self, permissions, context, type = None):
+  def __processNOT(self, permissions, context, type = None, evaluation = None):
     if isinstance(permissions, dict):
       if len(permissions) != 1:
         raise InvalidValueForLogicGateException('A NOT permission must have exactly one child in the value dict. Current value: {0}'.format(permissions))
@@ -413,15 +2544,79 @@ class LogicalPermissions(object):
     else:
       raise InvalidValueForLogicGateException('The value of a NOT gate must either be a dict or a string. Current value: {0}'.format(permissions))
 
-    return not self.__dispatch(permissions = permissions, context = context, type = type)
+    return not self.__dispatch(permissions = permissions, context = context, type = type, evaluation = evaluation)
 
-  def __externalAccessCheck(self, permission, context, type):
-    if not self.typeExists(type):
+  def __externalAccessCheck(self, permission, context, type, evaluation = None):
+    if type == 'POLICY':
+      return self.__policyAccessCheck(name = permission, context = context, evaluation = evaluation)
+    trusted = False
+    if evaluation is not None:
+      evaluation['leaves'].add((type, permission))
+      trusted = evaluation['trusted']
+    if not trusted and not self.typeExists(type):
       raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(type))
-    access = False
-    callback = self.getTypeCallback(type)
-    if hasattr(callback, '__call__'):
-      access = callback(permission, context)
-      if not isinstance(access, bool):
-        raise InvalidCallbackReturnTypeException('The registered callback for the permission type "{0}" must return a boolean.'.format(type))
+    projection = None
+    dependencies = self.__type_dependencies.get(type)
+    if dependencies is not None and dependencies[1]:
+      projection = self.__getContextProjection(paths = dependencies[0], context = context)
+      if projection is not None:
+        access = self.__leaf_cache.get(type, {}).get(permission, {}).get(projection)
+        if access is not None:
+          return access
+
+    access = None
+    if evaluation is not None and type in self.__prefetch_callbacks:
+      access = self.__getPrefetchedAccess(permission = permission, context = context, type = type, evaluation = evaluation)
+    if access is None:
+      access = False
+      timed_out = False
+      guarded = type in self.__type_timeouts or type in self.__circuit_breakers or (evaluation is not None and evaluation['deadline'] is not None)
+      budget = evaluation['budget'] if evaluation is not None else None
+      if trusted:
+        callback = self.__types.get(type)
+        if callback is not None:
+          if guarded:
+            access, timed_out = self.__callGuarded(callback = callback, permission = permission, context = context, type = type, evaluation = evaluation)
+          else:
+            if budget is not None:
+              self.__spendBudget(budget = budget, callbacks = 1)
+            access = callback(permission, context)
+      else:
+        callback = self.getTypeCallback(type)
+        if hasattr(callback, '__call__'):
+          if guarded:
+            access, timed_out = self.__callGuarded(callback = callback, permission = permission, context = context, type = type, evaluation = evaluation)
+          else:
+            if budget is not None:
+              self.__spendBudget(budget = budget, callbacks = 1)
+            access = callback(permission, context)
+          if not isinstance(access, bool) and access is not UNKNOWN:
+            raise InvalidCallbackReturnTypeException('The registered callback for the permission type "{0}" must return a boolean.'.format(type))
+      if timed_out:
+        # fallback results are not cached
+        projection = None
+
+    if projection is not None:
+      if self.__leaf_cache_size >= self.__leaf_cache_max_size:
+        self.__clearLeafCache()
+      bucket = self.__leaf_cache.setdefault(type, {}).setdefault(permission, {})
+      if projection not in bucket:
+        self.__leaf_cache_size += 1
+      bucket[projection] = access
+    return access
+
+  def __policyAccessCheck(self, name, context, evaluation = None):
+    if evaluation is not None and name in evaluation['policies']:
+      return evaluation['policies'][name]
+    if not self.policyExists(name = name):
+      raise PolicyNotRegisteredException('The policy "{0}" has not been registered. Please use LogicalPermissions::addPolicy() or LogicalPermissions::setPolicies() to register policies.'.format(name))
+
+    permissions = self.__policies[name]
+    access = True
+    if isinstance(permissions, (str, bool)):
+      access = self.__dispatch(permissions = permissions, context = context, evaluation = evaluation)
+    elif permissions:
+      access = self.__processOR(permissions = permissions, context = context, evaluation = evaluation)
+    if evaluation is not None:
+      evaluation['policies'][name] = access
     return access
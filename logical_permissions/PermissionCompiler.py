@@ -0,0 +1,791 @@
+from logical_permissions.exceptions import *
+from logical_permissions.PermissionNode import PermissionNode
+from logical_permissions.CompiledPermissions import CompiledPermissions
+from collections import OrderedDict
+import sys
+import weakref
+
+try:
+  long
+except NameError: # Python 3 compability
+  long = int
+
+try:
+  intern = sys.intern
+except AttributeError: # Python 2 compability
+  pass
+
+# The MASK node modes for gates whose children are all in the same universe, and their negations
+MASK_MODES = {'OR': 'ANY', 'AND': 'ALL', 'NOR': 'NOT_ANY', 'NAND': 'NOT_ALL', 'XOR': 'XOR'}
+NEGATED_MASK_MODES = {'ANY': 'NOT_ANY', 'ALL': 'NOT_ALL', 'NOT_ANY': 'ANY', 'NOT_ALL': 'ALL'}
+
+# The largest permission trees that PermissionCompiler::generateCode() generates code for, counted without sharing subtrees
+GENERATED_CODE_MAX_NODES = 1000
+GENERATED_CODE_MAX_DEPTH = 32
+
+# Unique tokens that mark the structure in the keys from PermissionCompiler::getTreeKey()
+TREE_KEY_DICT = object()
+TREE_KEY_LIST = object()
+TREE_KEY_END = object()
+
+# Marks that the next item on the stack in PermissionCompiler::getTreeKey() is a dictionary key
+TREE_KEY_DICT_KEY = object()
+
+# Marks the keys of the cached compilations that keep the child order of the permission tree
+TREE_KEY_ORDERED = object()
+
+# The keys that are compared case-insensitively, and the tokens for boolean strings
+CANONICAL_KEYS = frozenset(['AND', 'NAND', 'OR', 'NOR', 'XOR', 'NOT', 'TRUE', 'FALSE', 'NO_BYPASS', 'POLICY'])
+BOOLEAN_TOKENS = {'TRUE': ('bool', True), 'FALSE': ('bool', False)}
+
+def generated_xor(children):
+  # An XOR gate is decided as soon as one child is true and another one is false
+  granted = False
+  denied = False
+  for child in children:
+    if child():
+      granted = True
+    else:
+      denied = True
+    if granted and denied:
+      return True
+  return False
+
+class PermissionCompiler(object):
+  """Compiles permission trees into directed acyclic graphs of PermissionNode objects.
+
+  The compiler hash-conses the nodes it creates: structurally identical subtrees are only created once and are shared between all permission trees compiled by the same compiler. The children of the AND, NAND, OR, NOR and XOR gates are order-insensitive when subtrees are compared, so for example {'OR': ['a', 'b']} and {'OR': ['b', 'a']} share the same node, unless the permission trees are compiled with their child order kept. Each node is its own interning key and is held by a weak reference only, so no separate key is stored per node. Permission trees that compile to the same nodes get CompiledPermissions objects that compare equal. The compilations of the most recently compiled permission trees are cached by their tree keys, and the least recently used one is forgotten when the cache is full, so that the keys of permission trees that are only compiled once don't accumulate.
+
+  """
+
+  def __init__(self, type_exists, type_universe = None):
+    """
+    Args:
+      type_exists: A callable that is passed the name of a permission type and returns whether the type is registered.
+      type_universe (optional): A callable that is passed the name of a permission type and returns a tuple with the universe of the type and a dictionary with the structure {permission: bit, ...}, or None if the type has no universe. Gates over permissions in a universe are compiled into MASK nodes. Default value is None.
+
+    """
+    self.__type_exists = type_exists
+    self.__type_universe = type_universe
+    self.__truth_table_bit_limit = 8
+    self.__tree_limits = {'max_nodes': None, 'max_depth': None, 'max_leaves_per_type': None}
+    # A set of weak references to the interned nodes, where each reference is also its own value so that the interned node can be looked up
+    self.__nodes = {}
+    # the callback is shared by all weak references, since a bound method would be created for each of them otherwise
+    self.__forget_node = self.__forgetNode
+    self.__trees = OrderedDict()
+    self.__trees_max_size = 1000
+    # whether the nodes that are created keep the order of their children, which is only set while compile() is running
+    self.__ordered = False
+
+  def compile(self, permissions, errors = None, ordered = False):
+    """Compiles a permission tree.
+
+    Args:
+      permissions: A dictionary, list, string or boolean of the permission tree to be compiled
+      errors (optional): A list that the errors in the permission tree are appended to, or None if the first error should be raised. When errors are collected, each invalid subtree is compiled as FALSE and the compilation continues. Default value is None.
+      ordered (optional): True if the logic gates must evaluate their children in the order of the permission tree, like LogicalPermissions does for the permission tree itself, or False if they can share the nodes of permission trees that only differ in the order of the children. Default value is False.
+
+    Returns:
+      A CompiledPermissions object.
+
+    """
+    if not isinstance(permissions, (dict, list, str, bool)):
+      raise InvalidArgumentTypeException('The permissions parameter must be a dictionary or a list, or in certain cases a string or boolean.')
+
+    try:
+      tree_key = self.getTreeKey(permissions = permissions)
+      if ordered:
+        tree_key = (TREE_KEY_ORDERED,) + tree_key
+      compiled = self.__trees.pop(tree_key, None)
+    except TypeError: # unhashable values are reported when the permission tree is compiled
+      tree_key = None
+      compiled = None
+    if compiled is not None:
+      # reinserting the compiled permission tree marks it as the most recently used
+      self.__trees[tree_key] = compiled
+      if isinstance(compiled, CompiledPermissions):
+        return compiled
+      # the permission tree was rejected for exceeding the tree limits, and the cached value is the message
+      return self.__rejectTree(error = PermissionLimitExceededException(compiled), errors = errors)
+
+    error_count = len(errors) if errors is not None else 0
+    counts = None
+    if any(limit is not None for limit in self.__tree_limits.values()):
+      # the limits are checked while the nodes are created, so that permission trees far beyond them are rejected early
+      counts = {'depths': {}, 'terminals': 0, 'leaves': {}}
+    self.__ordered = ordered
+    try:
+      root, no_bypass = self.__compileTree(permissions = permissions, errors = errors, counts = counts)
+      if counts is not None:
+        error = self.__checkTreeLimits(roots = [node for node in [root, no_bypass] if node is not None])
+        if error is not None:
+          raise error
+    except PermissionLimitExceededException as error:
+      if tree_key is not None and (errors is None or len(errors) == error_count):
+        self.__cacheTree(tree_key = tree_key, value = str(error))
+      return self.__rejectTree(error = error, errors = errors)
+    finally:
+      self.__ordered = False
+
+    compiled = self.getCompiledPermissions(root = root, no_bypass = no_bypass)
+    if tree_key is not None and (errors is None or len(errors) == error_count):
+      self.__cacheTree(tree_key = tree_key, value = compiled)
+    return compiled
+
+  def getCompiledPermissions(self, root, no_bypass = None):
+    """Gets a CompiledPermissions object for a root node and a NO_BYPASS node.
+
+    The CompiledPermissions objects are not interned, since the nodes already are, but the objects for the same nodes compare equal.
+
+    Args:
+      root: The PermissionNode that is evaluated to decide access
+      no_bypass (optional): The PermissionNode for the NO_BYPASS condition, or None if there is no NO_BYPASS condition
+
+    Returns:
+      A CompiledPermissions object.
+
+    """
+    return CompiledPermissions(root = root, no_bypass = no_bypass)
+
+  def getTruthTableBitLimit(self):
+    """Gets the maximum number of universe permissions that a subtree can depend on to be compiled into a truth table."""
+    return self.__truth_table_bit_limit
+
+  def setTruthTableBitLimit(self, limit):
+    """Sets the maximum number of universe permissions that a subtree can depend on to be compiled into a truth table.
+
+    Subtrees that only consist of logic gates over permissions in universes and that depend on at most this many permissions are compiled into TABLE nodes, which look up the result in a precomputed truth table with 2 ** limit entries. Zero disables truth tables.
+
+    Args:
+      limit: An integer with the maximum number of permissions
+
+    """
+    if isinstance(limit, bool) or not isinstance(limit, (int, long)):
+      raise InvalidArgumentTypeException('The limit parameter must be an integer.')
+    if limit < 0 or limit > 20:
+      raise InvalidArgumentValueException('The limit parameter must be between 0 and 20.')
+    self.__truth_table_bit_limit = limit
+    self.clearTrees()
+
+  def getTreeLimits(self):
+    """Gets the size limits for compiled permission trees.
+
+    Returns:
+      A dictionary with the structure {'max_nodes': max_nodes, 'max_depth': max_depth, 'max_leaves_per_type': max_leaves_per_type}, where a limit is None if it isn't set.
+
+    """
+    return dict(self.__tree_limits)
+
+  def setTreeLimits(self, max_nodes = None, max_depth = None, max_leaves_per_type = None):
+    """Sets the size limits for compiled permission trees.
+
+    The limits are checked on the compiled nodes, so identical subtrees are only counted once. A permission tree that exceeds a limit raises a PermissionLimitExceededException while it is compiled, as soon as the nodes that have been created so far exceed the limit, and the rejection is cached like a compiled permission tree.
+
+    Args:
+      max_nodes (optional): The maximum number of distinct nodes, or None for no limit. Default value is None.
+      max_depth (optional): The maximum number of nodes on a path from the root, or None for no limit. Default value is None.
+      max_leaves_per_type (optional): The maximum number of distinct permissions of a single permission type, or None for no limit. Default value is None.
+
+    """
+    limits = {'max_nodes': max_nodes, 'max_depth': max_depth, 'max_leaves_per_type': max_leaves_per_type}
+    for name, limit in limits.items():
+      if limit is None:
+        continue
+      if isinstance(limit, bool) or not isinstance(limit, (int, long)):
+        raise InvalidArgumentTypeException('The {0} parameter must be an integer or None.'.format(name))
+      if limit < 1:
+        raise InvalidArgumentValueException('The {0} parameter must be greater than zero.'.format(name))
+    self.__tree_limits = limits
+    self.clearTrees()
+
+  def clearTrees(self):
+    """Forgets the cached compilations of permission trees, so that the next compilation of each permission tree is validated again."""
+    self.__trees.clear()
+
+  def getStatistics(self):
+    """Gets statistics for the compiler.
+
+    Returns:
+      A dictionary with the number of compiled permission trees that are cached by their tree keys and the number of distinct nodes that are in use.
+
+    """
+    trees = sum(1 for compiled in self.__trees.values() if isinstance(compiled, CompiledPermissions))
+    return {'trees': trees, 'nodes': len(self.__nodes)}
+
+  def getTreeKey(self, permissions):
+    """Gets a hashable key for a permission tree.
+
+    Two permission trees get the same key if they have the same structure, so the key can be used for caching the compiled permission tree. Logic gates, boolean strings and the NO_BYPASS and POLICY keys are compared case-insensitively, and boolean strings are treated as booleans.
+
+    Args:
+      permissions: A dictionary, list, string or boolean of the permission tree
+
+    Returns:
+      A hashable key.
+
+    """
+    # The key is a flat tuple of tokens rather than nested tuples, because hashing and comparing nested tuples
+    # is recursive and would hit the recursion limit for deep permission trees.
+    # The key is computed for every permission tree that checkAccess() counts for the tiered execution, so the loop avoids method calls and allocations.
+    tokens = []
+    append = tokens.append
+    stack = [permissions]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+      permissions = pop()
+      if isinstance(permissions, str):
+        # only the boolean strings TRUE and FALSE have four or five characters and need to be uppercased
+        if len(permissions) in (4, 5):
+          append(BOOLEAN_TOKENS.get(permissions.upper(), permissions))
+        else:
+          append(permissions)
+      elif permissions is TREE_KEY_END:
+        append(TREE_KEY_END)
+      elif permissions is TREE_KEY_DICT_KEY:
+        append(pop())
+      elif isinstance(permissions, dict):
+        append(TREE_KEY_DICT)
+        push(TREE_KEY_END)
+        for key in reversed(list(permissions)):
+          push(permissions[key])
+          if isinstance(key, str) and len(key) <= 9 and key.upper() in CANONICAL_KEYS:
+            key = key.upper()
+          push(key)
+          push(TREE_KEY_DICT_KEY)
+      elif isinstance(permissions, list):
+        append(TREE_KEY_LIST)
+        push(TREE_KEY_END)
+        stack.extend(reversed(permissions))
+      elif isinstance(permissions, bool):
+        append(BOOLEAN_TOKENS['TRUE'] if permissions else BOOLEAN_TOKENS['FALSE'])
+      else:
+        append(permissions)
+    return tuple(tokens)
+
+  def getNode(self, gate, children = (), type = None, value = None):
+    """Gets the shared node with the given properties, creating it if it doesn't exist yet.
+
+    Args:
+      gate: A string with the kind of the node. See PermissionNode.
+      children (optional): A list or tuple of child nodes
+      type (optional): The name of the permission type for a LEAF node
+      value (optional): The permission string for a LEAF node or the policy name for a POLICY node
+
+    Returns:
+      A PermissionNode.
+
+    """
+    # the gates, type names and permission strings are repeated across many permission trees
+    gate = intern(gate)
+    if isinstance(type, str):
+      type = intern(type)
+    if isinstance(value, str):
+      value = intern(value)
+
+    # Each node is its own key, so the new node is looked up through a weak reference to it and is kept if there is no equal node yet
+    node = PermissionNode(gate = gate, children = tuple(children), type = type, value = value, ordered = self.__ordered)
+    reference = self.__nodes.get(weakref.ref(node))
+    if reference is not None:
+      existing = reference()
+      if existing is not None:
+        return existing
+    reference = weakref.ref(node, self.__forget_node)
+    self.__nodes[reference] = reference
+    return node
+
+  def getGateNode(self, gate, children):
+    """Gets the shared node for a logic gate, simplifying gates with a single child.
+
+    Args:
+      gate: A string with one of the logic gates AND, NAND, OR, NOR, XOR and NOT
+      children: A list of child nodes
+
+    Returns:
+      A PermissionNode.
+
+    """
+    if gate == 'NOT' or (len(children) == 1 and gate in ['NAND', 'NOR']):
+      return self.getNegatedNode(children[0])
+    if len(children) == 1 and gate in ['AND', 'OR']:
+      return self.getMaskedNode(node = children[0])
+
+    if self.__type_universe is not None:
+      # The permissions in a universe are grouped by type, and each group is compiled into a single MASK node.
+      groups = OrderedDict()
+      rest = []
+      for child in children:
+        if child.gate == 'LEAF':
+          universe = self.__type_universe(child.type)
+          if universe is not None and child.value in universe[1]:
+            groups.setdefault(child.type, []).append(child)
+            continue
+        rest.append(child)
+      if groups and not rest and len(groups) == 1:
+        type, leaves = groups.popitem()
+        return self.getMaskNode(mode = MASK_MODES[gate], type = type, leaves = leaves)
+      if groups and gate == 'XOR':
+        # an XOR gate can't be split into groups, so each permission in a universe gets its own MASK node
+        children = [self.getMaskedNode(node = child) for child in children]
+      elif groups:
+        mode = 'ALL' if gate in ['AND', 'NAND'] else 'ANY'
+        # the MASK nodes are evaluated first since they are cheap and may short-circuit the gate
+        children = [self.getMaskNode(mode = mode, type = type, leaves = leaves) for type, leaves in groups.items()] + rest
+
+    return self.getNode(gate = gate, children = children)
+
+  def getNegatedNode(self, node):
+    """Gets the shared node for the negation of a node."""
+    if node.gate == 'NOT':
+      return node.children[0]
+    if node.gate in ['TRUE', 'FALSE']:
+      return self.getBooleanNode(node.gate == 'FALSE')
+    node = self.getMaskedNode(node = node)
+    if node.gate == 'MASK' and node.value[0] in NEGATED_MASK_MODES:
+      return self.getMaskNode(mode = NEGATED_MASK_MODES[node.value[0]], type = node.type, leaves = node.children)
+    return self.getNode(gate = 'NOT', children = (node,))
+
+  def getMaskedNode(self, node):
+    """Gets the MASK node for a LEAF node whose permission is in the universe of its type, or else the node itself."""
+    if node.gate == 'LEAF' and self.__type_universe is not None:
+      universe = self.__type_universe(node.type)
+      if universe is not None and node.value in universe[1]:
+        return self.getMaskNode(mode = 'ANY', type = node.type, leaves = [node])
+    return node
+
+  def getMaskNode(self, mode, type, leaves):
+    """Gets the shared MASK node that compares the permissions in the universe of a type with a bitmask.
+
+    Args:
+      mode: A string with the comparison. ANY, ALL, NOT_ANY, NOT_ALL or XOR.
+      type: The name of the permission type
+      leaves: A list of LEAF nodes of the type whose permissions are in the universe of the type
+
+    Returns:
+      A PermissionNode.
+
+    """
+    values, bits = self.__type_universe(type)
+    mask = 0
+    for leaf in leaves:
+      mask |= bits[leaf.value]
+    return self.getNode(gate = 'MASK', children = leaves, type = type, value = (mode, mask, values))
+
+  def generateCode(self, root):
+    """Generates a Python function that evaluates a compiled permission tree.
+
+    The logic gates are translated into short-circuiting Python expressions that evaluate their children in the same order as LogicalPermissions, so exactly the same permissions are checked. The other nodes are evaluated by the passed evaluate function. Subtrees that are shared within the permission tree are repeated in the generated code, so no code is generated for permission trees that expand to more than GENERATED_CODE_MAX_NODES nodes or that are deeper than GENERATED_CODE_MAX_DEPTH nodes.
+
+    Args:
+      root: The PermissionNode at the root of the permission tree
+
+    Returns:
+      A function that is passed an evaluate function, the context and the evaluation, where the evaluate function is called with a node, the context and the evaluation and returns the result of the node. The function returns True or False. None is returned if the permission tree is too large.
+
+    """
+    constants = OrderedDict()
+    size = [0]
+
+    def expression(node, depth):
+      size[0] += 1
+      if size[0] > GENERATED_CODE_MAX_NODES or depth > GENERATED_CODE_MAX_DEPTH:
+        return None
+      gate = node.gate
+      if gate == 'TRUE':
+        return 'True'
+      if gate == 'FALSE':
+        return 'False'
+      if gate not in ['AND', 'NAND', 'OR', 'NOR', 'XOR', 'NOT']:
+        index = constants.setdefault(node, len(constants))
+        return 'evaluate(nodes[{0}], context, evaluation)'.format(index)
+      children = []
+      for child in node.children:
+        child_expression = expression(child, depth + 1)
+        if child_expression is None:
+          return None
+        children.append(child_expression)
+      if gate == 'NOT':
+        return '(not {0})'.format(children[0])
+      if gate == 'XOR':
+        return 'xor(({0},))'.format(', '.join('lambda: {0}'.format(child) for child in children))
+      joined = '({0})'.format((' and ' if gate in ['AND', 'NAND'] else ' or ').join(children))
+      if gate in ['NAND', 'NOR']:
+        return '(not {0})'.format(joined)
+      return joined
+
+    body = expression(root, 1)
+    if body is None:
+      return None
+    source = 'def check(evaluate, context, evaluation):\n  return {0}\n'.format(body)
+    namespace = {'nodes': tuple(constants), 'xor': generated_xor}
+    exec(compile(source, '<permissions>', 'exec'), namespace)
+    return namespace['check']
+
+  def getBooleanNode(self, value):
+    """Gets the shared TRUE or FALSE node."""
+    if value:
+      return self.getNode(gate = 'TRUE')
+    return self.getNode(gate = 'FALSE')
+
+  def __forgetNode(self, reference):
+    # dead weak references are only equal to themselves, so this removes the reference of the node that was garbage collected
+    self.__nodes.pop(reference, None)
+
+  def __compileTree(self, permissions, errors, counts):
+    # Returns a tuple with the root node and the NO_BYPASS node, or None if there is no NO_BYPASS condition
+    no_bypass = None
+    if isinstance(permissions, dict):
+      permissions = dict(permissions)
+
+      # uppercasing of no_bypass key for backward compatibility
+      if 'no_bypass' in permissions:
+        permissions['NO_BYPASS'] = permissions.pop('no_bypass')
+
+      if 'NO_BYPASS' in permissions:
+        no_bypass_value = permissions.pop('NO_BYPASS')
+        if isinstance(no_bypass_value, bool):
+          no_bypass = self.getBooleanNode(no_bypass_value)
+        elif isinstance(no_bypass_value, str) and no_bypass_value.upper() in ['TRUE', 'FALSE']:
+          no_bypass = self.getBooleanNode(no_bypass_value.upper() == 'TRUE')
+        elif isinstance(no_bypass_value, dict):
+          no_bypass = self.__run(self.__compileGate(gate = 'OR', permissions = no_bypass_value), errors = errors, counts = counts)
+        else:
+          error = InvalidArgumentValueException('The NO_BYPASS value must be a boolean, a boolean string or a dictionary. Current value: {0}'.format(no_bypass_value))
+          if errors is None:
+            raise error
+          errors.append(error)
+          no_bypass = self.getBooleanNode(False)
+
+    if isinstance(permissions, (str, bool)):
+      root = self.__run(self.__compileDispatch(permissions = permissions), errors = errors, counts = counts)
+    elif permissions:
+      root = self.__run(self.__compileGate(gate = 'OR', permissions = permissions), errors = errors, counts = counts)
+    else:
+      root = self.getBooleanNode(True)
+    if root.gate == 'LEAF':
+      root = self.getMaskedNode(node = root)
+    root = self.__tabulate(root = root)
+    if no_bypass is not None:
+      no_bypass = self.__tabulate(root = no_bypass)
+    return (root, no_bypass)
+
+  def __cacheTree(self, tree_key, value):
+    self.__trees[tree_key] = value
+    while len(self.__trees) > self.__trees_max_size:
+      self.__trees.popitem(last = False)
+
+  def __rejectTree(self, error, errors):
+    if errors is None:
+      raise error
+    errors.append(error)
+    return self.getCompiledPermissions(root = self.getBooleanNode(False))
+
+  def __tabulate(self, root):
+    if self.__type_universe is None or self.__truth_table_bit_limit == 0:
+      return root
+
+    # The variables of a node are the (type, bit) pairs of the universe permissions it depends on, or None if it depends on anything else
+    order = self.__getPostOrder(root = root)
+    variables = {}
+    mask_counts = {}
+    for node in order:
+      gate = node.gate
+      if gate == 'MASK':
+        mask = node.value[1]
+        variables[node] = frozenset((node.type, 1 << index) for index in range(mask.bit_length()) if mask >> index & 1)
+        mask_counts[node] = 1
+      elif gate in ['TRUE', 'FALSE']:
+        variables[node] = frozenset()
+        mask_counts[node] = 0
+      elif gate in ['AND', 'NAND', 'OR', 'NOR', 'XOR', 'NOT'] and all(variables[child] is not None for child in node.children):
+        variables[node] = frozenset().union(*[variables[child] for child in node.children])
+        mask_counts[node] = sum(mask_counts[child] for child in node.children)
+      else:
+        variables[node] = None
+
+    # The largest subtrees with at least two MASK nodes that are within the bit limit are replaced. The children of an AND, NAND, OR or NOR gate
+    # that can't be replaced as a whole are grouped, since for example {'OR': [a, b, c]} is equivalent to {'OR': [{'OR': [a, b]}, c]}.
+    limit = self.__truth_table_bit_limit
+    tabulated = set()
+    groups = {}
+    visited = set()
+    stack = [root]
+    while stack:
+      node = stack.pop()
+      if node in visited:
+        continue
+      visited.add(node)
+      if variables[node] is not None and mask_counts[node] > 1 and len(variables[node]) <= limit:
+        tabulated.add(node)
+        continue
+      if node.gate == 'MASK':
+        continue
+      children = list(node.children)
+      if node.gate in ['AND', 'NAND', 'OR', 'NOR']:
+        group = [child for child in children if variables[child] is not None]
+        group_variables = frozenset().union(*[variables[child] for child in group])
+        if len(group) > 1 and sum(mask_counts[child] for child in group) > 1 and len(group_variables) <= limit:
+          groups[node] = (group, group_variables)
+          children = [child for child in children if variables[child] is None]
+      stack.extend(children)
+    if not tabulated and not groups:
+      return root
+
+    replacements = {}
+    for node in order:
+      if node in tabulated:
+        replacements[node] = self.__getTableNode(node = node, variables = variables[node])
+      elif node in groups:
+        group, group_variables = groups[node]
+        group_node = self.getNode(gate = 'AND' if node.gate in ['AND', 'NAND'] else 'OR', children = group)
+        children = [self.__getTableNode(node = group_node, variables = group_variables)]
+        children += [replacements[child] for child in node.children if child not in group]
+        replacements[node] = self.getNode(gate = node.gate, children = children)
+      elif node.children and node.gate != 'MASK' and any(replacements.get(child, child) is not child for child in node.children):
+        replacements[node] = self.getNode(gate = node.gate, children = [replacements.get(child, child) for child in node.children])
+      else:
+        replacements[node] = node
+    return replacements[root]
+
+  def __checkTreeLimits(self, roots):
+    # The depth of each node is computed in post-order, and the nodes below a MASK node are its LEAF nodes
+    limits = self.__tree_limits
+    depths = {}
+    leaves = {}
+    stack = [(root, False) for root in roots]
+    while stack:
+      node, expanded = stack.pop()
+      if expanded:
+        depths[node] = 1 + max([depths[child] for child in node.children] or [0])
+        if limits['max_depth'] is not None and depths[node] > limits['max_depth']:
+          return PermissionLimitExceededException('The permission tree exceeds the maximum depth of {0} nodes.'.format(limits['max_depth']))
+        continue
+      if node in depths:
+        continue
+      depths[node] = None
+      if limits['max_nodes'] is not None and len(depths) > limits['max_nodes']:
+        return PermissionLimitExceededException('The permission tree exceeds the maximum of {0} nodes.'.format(limits['max_nodes']))
+      if node.gate == 'LEAF':
+        leaves[node.type] = leaves.get(node.type, 0) + 1
+        if limits['max_leaves_per_type'] is not None and leaves[node.type] > limits['max_leaves_per_type']:
+          return PermissionLimitExceededException('The permission tree exceeds the maximum of {0} permissions of the permission type "{1}".'.format(limits['max_leaves_per_type'], node.type))
+      stack.append((node, True))
+      for child in node.children:
+        if child not in depths:
+          stack.append((child, False))
+    return None
+
+  def __countNode(self, node, counts):
+    # The counts are lower bounds of what __checkTreeLimits() finds in the finished permission tree, so a permission tree is only rejected early if
+    # it would be rejected anyway. Every LEAF, POLICY, TRUE and FALSE node is kept, while a NOT node may still be cancelled by a parent NOT gate,
+    # so it doesn't count towards the depth.
+    limits = self.__tree_limits
+    depths = counts['depths']
+    if node in depths:
+      return
+    stack = [node]
+    while stack:
+      current = stack[-1]
+      missing = [child for child in current.children if child not in depths]
+      if missing:
+        stack.extend(missing)
+        continue
+      stack.pop()
+      depth = max([depths[child] for child in current.children] or [0])
+      depths[current] = depth if current.gate == 'NOT' else depth + 1
+    if limits['max_depth'] is not None and depths[node] > limits['max_depth']:
+      raise PermissionLimitExceededException('The permission tree exceeds the maximum depth of {0} nodes.'.format(limits['max_depth']))
+    if node.gate in ['LEAF', 'POLICY', 'TRUE', 'FALSE']:
+      counts['terminals'] += 1
+      if limits['max_nodes'] is not None and counts['terminals'] > limits['max_nodes']:
+        raise PermissionLimitExceededException('The permission tree exceeds the maximum of {0} nodes.'.format(limits['max_nodes']))
+    if node.gate == 'LEAF':
+      leaves = counts['leaves']
+      leaves[node.type] = leaves.get(node.type, 0) + 1
+      if limits['max_leaves_per_type'] is not None and leaves[node.type] > limits['max_leaves_per_type']:
+        raise PermissionLimitExceededException('The permission tree exceeds the maximum of {0} permissions of the permission type "{1}".'.format(limits['max_leaves_per_type'], node.type))
+
+  def __getTableNode(self, node, variables):
+    # The truth table of each node is an integer whose bit number i is the result for the assignment i of the variables
+    variables = sorted(variables)
+    size = 1 << len(variables)
+    full = (1 << size) - 1
+    vectors = {}
+    for index, variable in enumerate(variables):
+      vector = 0
+      for assignment in range(size):
+        if assignment >> index & 1:
+          vector |= 1 << assignment
+      vectors[variable] = vector
+
+    tables = {}
+    tags = set()
+    for current in self.__getPostOrder(root = node):
+      gate = current.gate
+      if gate in ['MASK', 'AND', 'NAND', 'OR', 'NOR', 'XOR']:
+        if gate == 'MASK':
+          mode = current.value[0]
+          mask = current.value[1]
+          children = [vectors[(current.type, 1 << index)] for index in range(mask.bit_length()) if mask >> index & 1]
+          tags.update((child.type, child.value) for child in current.children)
+          gate = {'ANY': 'OR', 'ALL': 'AND', 'NOT_ANY': 'NOR', 'NOT_ALL': 'NAND', 'XOR': 'XOR'}[mode]
+        else:
+          children = [tables[child] for child in current.children]
+        any_table = 0
+        all_table = full
+        for child in children:
+          any_table |= child
+          all_table &= child
+        table = {'AND': all_table, 'NAND': full ^ all_table, 'OR': any_table, 'NOR': full ^ any_table, 'XOR': any_table & (full ^ all_table)}[gate]
+      elif gate == 'NOT':
+        table = full ^ tables[current.children[0]]
+      else:
+        table = full if gate == 'TRUE' else 0
+      tables[current] = table
+
+    # The variables are grouped by type so that the bitmask of each type is only looked up once
+    spec = []
+    for type, bit in variables:
+      if not spec or spec[-1][0] != type:
+        spec.append((type, self.__type_universe(type)[0], []))
+      spec[-1][2].append(bit)
+    spec = tuple((type, values, tuple(bits)) for type, values, bits in spec)
+    return self.getNode(gate = 'TABLE', children = (node,), value = (spec, tables[node], frozenset(tags)))
+
+  def __getPostOrder(self, root):
+    order = []
+    visited = set()
+    stack = [(root, False)]
+    while stack:
+      node, expanded = stack.pop()
+      if expanded:
+        order.append(node)
+        continue
+      if node in visited:
+        continue
+      visited.add(node)
+      stack.append((node, True))
+      if node.gate != 'MASK':
+        for child in reversed(node.children):
+          stack.append((child, False))
+    return order
+
+  def __run(self, generator, errors = None, counts = None):
+    # The compile steps are generators that yield a (gate, permissions, type) tuple when they need a child node compiled,
+    # and yield the finished node last. They are run with an explicit stack so that deep permission trees don't hit the recursion limit.
+    # If counts is given, the tree limits are checked for every finished node with __countNode().
+    stack = [generator]
+    node = None
+    while True:
+      try:
+        step = stack[-1].send(node)
+      except (InvalidArgumentTypeException, InvalidArgumentValueException) as error:
+        if errors is None:
+          raise
+        # the invalid subtree is replaced so that the errors in the rest of the permission tree are found as well
+        errors.append(error)
+        step = self.getBooleanNode(False)
+      if isinstance(step, PermissionNode):
+        if counts is not None:
+          self.__countNode(node = step, counts = counts)
+        stack.pop()
+        if not stack:
+          return step
+        node = step
+      else:
+        gate, permissions, type = step
+        if gate is None:
+          stack.append(self.__compileDispatch(permissions = permissions, type = type))
+        else:
+          stack.append(self.__compileGate(gate = gate, permissions = permissions, type = type))
+        node = None
+
+  def __compileDispatch(self, permissions, type = None):
+    if isinstance(permissions, bool):
+      if type is not None:
+        raise InvalidArgumentValueException('You cannot put a boolean permission as a descendant to a permission type. Existing type: {0}. Evaluated permissions: {1}'.format(type, permissions))
+      yield self.getBooleanNode(permissions)
+      return
+    if isinstance(permissions, str):
+      if permissions.upper() in ['TRUE', 'FALSE']:
+        if type is not None:
+          raise InvalidArgumentValueException('You cannot put a boolean permission as a descendant to a permission type. Existing type: {0}. Evaluated permissions: {1}'.format(type, permissions))
+        yield self.getBooleanNode(permissions.upper() == 'TRUE')
+        return
+      if type is None:
+        raise InvalidArgumentValueException('A permission string must be placed as a descendant to a permission type. Evaluated permissions: {0}'.format(permissions))
+      if type == 'POLICY':
+        yield self.getNode(gate = 'POLICY', value = permissions)
+      else:
+        yield self.getNode(gate = 'LEAF', type = type, value = permissions)
+      return
+    if isinstance(permissions, list) and len(permissions) > 0:
+      yield (yield ('OR', permissions, type))
+      return
+    if isinstance(permissions, dict):
+      if len(permissions) == 1:
+        key = list(permissions.keys())[0]
+        value = permissions[key]
+        if not isinstance(key, (int, long, float)):
+          key_upper = key.upper()
+          if key_upper == 'NO_BYPASS':
+            raise InvalidArgumentValueException('The NO_BYPASS key must be placed highest in the permission hierarchy. Evaluated permissions: {}'.format(permissions))
+          if key_upper in ['AND', 'NAND', 'OR', 'NOR', 'XOR', 'NOT']:
+            yield (yield (key_upper, value, type))
+            return
+          if key_upper == 'TRUE' or key_upper == 'FALSE':
+            raise InvalidArgumentValueException('A boolean permission cannot have children. Evaluated permissions: {}'.format(permissions))
+          if key_upper == 'POLICY':
+            if type is not None:
+              raise InvalidArgumentValueException('You cannot put a policy reference as a descendant to a permission type. Existing type: {0}. Evaluated permissions: {1}'.format(type, permissions))
+            key = 'POLICY'
+
+          if type is not None:
+            raise InvalidArgumentValueException('You cannot put a permission type as a descendant to another permission type. Existing type: {0}. Evaluated permissions: {1}'.format(type, permissions))
+          if key != 'POLICY' and not self.__type_exists(key):
+            raise PermissionTypeNotRegisteredException('The permission type "{0}" has not been registered. Please use LogicalPermissions::addType() or LogicalPermissions::setTypes() to register permission types.'.format(key))
+          type = key
+
+        if isinstance(value, (dict, list)):
+          yield (yield ('OR', value, type))
+        else:
+          yield (yield (None, value, type))
+        return
+      if len(permissions) > 1:
+        yield (yield ('OR', permissions, type))
+        return
+    raise InvalidArgumentTypeException('Permissions must either be a boolean, a string, a dictionary or a list. Evaluated permissions: {0}'.format(permissions))
+
+  def __compileGate(self, gate, permissions, type = None):
+    article = 'an' if gate in ['AND', 'OR', 'XOR'] else 'a'
+    if gate == 'NOT':
+      if isinstance(permissions, dict):
+        if len(permissions) != 1:
+          raise InvalidValueForLogicGateException('A NOT permission must have exactly one child in the value dict. Current value: {0}'.format(permissions))
+      elif isinstance(permissions, str):
+        if not permissions:
+          raise InvalidValueForLogicGateException('A NOT permission cannot have an empty string as its value.')
+      else:
+        raise InvalidValueForLogicGateException('The value of a NOT gate must either be a dict or a string. Current value: {0}'.format(permissions))
+
+      yield self.getNegatedNode((yield (None, permissions, type)))
+      return
+
+    minimum = 2 if gate == 'XOR' else 1
+    if isinstance(permissions, list):
+      if len(permissions) < minimum:
+        raise InvalidValueForLogicGateException('The value list of {0} {1} gate must contain a minimum of {2}. Current value: {3}'.format(article, gate, 'two elements' if minimum == 2 else 'one element', permissions))
+      children = []
+      for permission in permissions:
+        children.append((yield (None, permission, type)))
+    elif isinstance(permissions, dict):
+      if len(permissions) < minimum:
+        raise InvalidValueForLogicGateException('The value dict of {0} {1} gate must contain a minimum of {2}. Current value: {3}'.format(article, gate, 'two elements' if minimum == 2 else 'one element', permissions))
+      children = []
+      for key in permissions:
+        children.append((yield (None, {key: permissions[key]}, type)))
+    else:
+      raise InvalidValueForLogicGateException('The value of {0} {1} gate must be a list or a dict. Current value: {2}'.format(article, gate, permissions))
+
+    yield self.getGateNode(gate = gate, children = children)
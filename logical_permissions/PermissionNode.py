@@ -0,0 +1,88 @@
+# The logic gates whose children can be reordered without changing the result
+COMMUTATIVE_GATES = frozenset(['AND', 'NAND', 'OR', 'NOR', 'XOR'])
+
+class PermissionNode(object):
+  """A node in a compiled permission tree.
+
+  Nodes are created by PermissionCompiler and are shared between all compiled permission trees that contain an identical subtree, so they must never be modified after creation.
+
+  Attributes:
+    gate: A string with the kind of the node. Either one of the logic gates AND, NAND, OR, NOR, XOR and NOT, one of the booleans TRUE and FALSE, LEAF for a permission that is evaluated by a permission type callback, POLICY for a policy reference, MASK for permissions in the universe of a type that are evaluated with a bitmask or TABLE for a subtree over permissions in universes that is evaluated with a precomputed truth table.
+    children: A tuple with the child nodes of a logic gate, the LEAF nodes of a MASK node or the original subtree of a TABLE node.
+    type: The name of the permission type for a LEAF or MASK node.
+    value: The permission string for a LEAF node, the policy name for a POLICY node, a tuple with the mode, the bitmask and the universe for a MASK node or a tuple with the variables, the truth table and the permissions for a TABLE node.
+    ordered: A boolean that is True if the children of an AND, NAND, OR, NOR or XOR gate are compared in their order, so that the node is only shared by permission trees that evaluate its children in the same order.
+
+  """
+
+  # Nodes are kept in memory for every compiled permission tree, so they don't get an instance dictionary
+  __slots__ = ('gate', 'children', 'type', 'value', 'ordered', '__hash', '__weakref__')
+
+  def __init__(self, gate, children = (), type = None, value = None, ordered = False):
+    self.gate = gate
+    self.children = children
+    self.type = type
+    self.value = value
+    self.ordered = ordered and gate in COMMUTATIVE_GATES
+    # each node is its own key when PermissionCompiler interns it, and the hash is computed once since nodes are dictionary keys during evaluation
+    self.__hash = hash((gate, type, value, self.ordered, self.__getChildIds()))
+
+  def __getChildIds(self):
+    # The children are compared by identity since they are interned as well, and regardless of their order for the commutative gates unless the node is ordered.
+    # The children of MASK and TABLE nodes follow from their values, so they are not compared.
+    if self.gate in COMMUTATIVE_GATES and not self.ordered:
+      return tuple(sorted(id(child) for child in self.children))
+    if self.gate in COMMUTATIVE_GATES:
+      return tuple(id(child) for child in self.children)
+    if self.gate == 'NOT':
+      return (id(self.children[0]),)
+    return ()
+
+  def __eq__(self, other):
+    if self is other:
+      return True
+    if not isinstance(other, PermissionNode) or self.__hash != other.__hash:
+      return False
+    return self.gate == other.gate and self.type == other.type and self.value == other.value and self.ordered == other.ordered and self.__getChildIds() == other.__getChildIds()
+
+  def __ne__(self, other):
+    return not self.__eq__(other)
+
+  def __hash__(self):
+    return self.__hash
+
+  def __repr__(self):
+    # The nodes are formatted in post-order with an explicit stack so that deep trees don't hit the recursion limit
+    reprs = {}
+    stack = [(self, False)]
+    while stack:
+      node, expanded = stack.pop()
+      if node in reprs:
+        continue
+      children = node.__getReprChildren()
+      if children and not expanded:
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(children) if child not in reprs)
+        continue
+      reprs[node] = node.__formatRepr(reprs)
+    return reprs[self]
+
+  def __getReprChildren(self):
+    if self.gate in ['LEAF', 'MASK', 'POLICY']:
+      return ()
+    if self.gate == 'TABLE':
+      return self.children[:1]
+    return self.children
+
+  def __formatRepr(self, reprs):
+    if self.gate == 'LEAF':
+      return '{0}({1!r}: {2!r})'.format(self.gate, self.type, self.value)
+    if self.gate == 'MASK':
+      return '{0}({1}, {2!r}: {3!r})'.format(self.gate, self.value[0], self.type, [child.value for child in self.children])
+    if self.gate == 'TABLE':
+      return '{0}({1})'.format(self.gate, reprs[self.children[0]])
+    if self.gate == 'POLICY':
+      return '{0}({1!r})'.format(self.gate, self.value)
+    if self.children:
+      return '{0}({1})'.format(self.gate, ', '.join(reprs[child] for child in self.children))
+    return self.gate
@@ -0,0 +1,143 @@
+from logical_permissions.exceptions import *
+import threading
+
+class PopulationIndex(object):
+  """An index of the permissions of a population of subjects, such as all users, that LogicalPermissions::getSubjectsWithAccess() uses to find every subject that a permission tree grants access to.
+
+  The index is kept for membership-style permission types, such as roles or groups, and maps each permission of an indexed type to the set of subjects that it is granted to. The permissions of a subject must be exactly those that the callback of the type grants access to when the subject is evaluated. Updating a subject only changes the index entries for the permissions that were added or removed.
+
+  """
+
+  def __init__(self, types):
+    """
+    Args:
+      types: A list with the names of the indexed permission types
+
+    """
+    if not isinstance(types, (list, tuple, set, frozenset)):
+      raise InvalidArgumentTypeException('The types parameter must be a list.')
+    for type in types:
+      if not isinstance(type, str):
+        raise InvalidArgumentValueException('The indexed types must be strings.')
+      if not type:
+        raise InvalidArgumentValueException('The name for an indexed type cannot be empty.')
+
+    self.__types = frozenset(types)
+    self.__subjects = {}
+    self.__index = dict((type, {}) for type in self.__types)
+    self.__lock = threading.Lock()
+
+  def getTypes(self):
+    """Gets the indexed permission types.
+
+    Returns:
+      A frozenset with the names of the indexed permission types.
+
+    """
+    return self.__types
+
+  def setSubject(self, subject, permissions):
+    """Adds a subject or replaces the permissions of an existing subject.
+
+    Args:
+      subject: A hashable subject, such as a user id
+      permissions: A dictionary with the structure {type: [permission, ...], ...} with the permissions of the indexed types that are granted to the subject. Indexed types that are left out are granted no permissions.
+
+    """
+    if not isinstance(permissions, dict):
+      raise InvalidArgumentTypeException('The permissions parameter must be a dictionary.')
+    for type, values in permissions.items():
+      if type not in self.__types:
+        raise InvalidArgumentValueException('The permission type "{0}" is not indexed.'.format(type))
+      if not isinstance(values, (list, tuple, set, frozenset)):
+        raise InvalidArgumentTypeException('The permissions of the type "{0}" must be a list, tuple, set or frozenset.'.format(type))
+      if not all(isinstance(value, str) for value in values):
+        raise InvalidArgumentValueException('The permissions of the type "{0}" must be strings.'.format(type))
+    try:
+      hash(subject)
+    except TypeError:
+      raise InvalidArgumentTypeException('The subject parameter must be hashable.')
+
+    permissions = dict((type, frozenset(values)) for type, values in permissions.items() if values)
+    with self.__lock:
+      previous = self.__subjects.get(subject, {})
+      for type in self.__types:
+        old_values = previous.get(type, frozenset())
+        new_values = permissions.get(type, frozenset())
+        for value in old_values - new_values:
+          self.__removeEntry(type = type, value = value, subject = subject)
+        for value in new_values - old_values:
+          self.__index[type].setdefault(value, set()).add(subject)
+      self.__subjects[subject] = permissions
+
+  def removeSubject(self, subject):
+    """Removes a subject from the index.
+
+    Args:
+      subject: A hashable subject, such as a user id
+
+    """
+    with self.__lock:
+      if subject not in self.__subjects:
+        raise InvalidArgumentValueException('The subject {0!r} is not in the index.'.format(subject))
+      for type, values in self.__subjects.pop(subject).items():
+        for value in values:
+          self.__removeEntry(type = type, value = value, subject = subject)
+
+  def subjectExists(self, subject):
+    """Checks whether a subject is in the index.
+
+    Args:
+      subject: A hashable subject, such as a user id
+
+    Returns:
+      True if the subject is found or False if the subject isn't found.
+
+    """
+    with self.__lock:
+      return subject in self.__subjects
+
+  def getSubjectPermissions(self, subject):
+    """Gets the indexed permissions of a subject.
+
+    Args:
+      subject: A hashable subject, such as a user id
+
+    Returns:
+      A dictionary with the structure {type: frozenset([permission, ...]), ...} with a key for every indexed type.
+
+    """
+    with self.__lock:
+      if subject not in self.__subjects:
+        raise InvalidArgumentValueException('The subject {0!r} is not in the index.'.format(subject))
+      permissions = self.__subjects[subject]
+      return dict((type, permissions.get(type, frozenset())) for type in self.__types)
+
+  def getSubjects(self, type = None, value = None):
+    """Gets the subjects in the index, or the subjects that a permission is granted to.
+
+    Args:
+      type (optional): A string with the name of an indexed permission type, or None to get all subjects. Default value is None.
+      value (optional): A permission string of the permission type, such as a role. It is required if type is not None. Default value is None.
+
+    Returns:
+      A frozenset with the subjects.
+
+    """
+    if type is None and value is not None:
+      raise InvalidArgumentValueException('The value parameter cannot be used without the type parameter.')
+    if type is not None and value is None:
+      raise InvalidArgumentValueException('The type parameter cannot be used without the value parameter.')
+    if type is not None and type not in self.__types:
+      raise InvalidArgumentValueException('The permission type "{0}" is not indexed.'.format(type))
+
+    with self.__lock:
+      if type is None:
+        return frozenset(self.__subjects)
+      return frozenset(self.__index[type].get(value, ()))
+
+  def __removeEntry(self, type, value, subject):
+    subjects = self.__index[type][value]
+    subjects.discard(subject)
+    if not subjects:
+      del self.__index[type][value]
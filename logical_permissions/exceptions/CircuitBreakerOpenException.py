@@ -0,0 +1,2 @@
+class CircuitBreakerOpenException(Exception):
+  pass
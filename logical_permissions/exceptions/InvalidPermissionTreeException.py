@@ -0,0 +1,6 @@
+from logical_permissions.exceptions import InvalidArgumentValueException
+
+class InvalidPermissionTreeException(InvalidArgumentValueException):
+  def __init__(self, message, errors = []):
+    InvalidArgumentValueException.__init__(self, message)
+    self.errors = list(errors)
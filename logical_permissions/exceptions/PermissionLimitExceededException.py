@@ -0,0 +1,2 @@
+class PermissionLimitExceededException(Exception):
+  pass
@@ -0,0 +1,2 @@
+class PermissionTimeoutException(Exception):
+  pass
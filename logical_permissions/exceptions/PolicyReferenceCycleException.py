@@ -0,0 +1,4 @@
+from logical_permissions.exceptions import InvalidArgumentValueException
+
+class PolicyReferenceCycleException(InvalidArgumentValueException):
+  pass
@@ -1,8 +1,10 @@
 # -*- coding: UTF-8 -*-
 
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
 from codecs import open
 from os import path
+import sys
 
 here = path.abspath(path.dirname(__file__))
 
@@ -22,6 +24,14 @@ USAGE
 Please refer to https://github.com/ordermind/logical-permissions-py for documentation.
 """
 
+class BuildPy(build_py):
+  # The AsyncBatcher module uses the async and await syntax, so it is left out of the build on Python versions before 3.5
+  def find_package_modules(self, package, package_dir):
+    modules = build_py.find_package_modules(self, package, package_dir)
+    if sys.version_info < (3, 5):
+      modules = [module for module in modules if module[1] != 'AsyncBatcher']
+    return modules
+
 setup(
   name = 'logical-permissions',
   version = '1.2.6',
@@ -46,4 +56,5 @@ setup(
   ],
   keywords = 'permissions',
   packages = find_packages(exclude=['tests*']),
+  cmdclass = {'build_py': BuildPy},
 )
@@ -0,0 +1,163 @@
+import unittest
+import sys
+import gc
+import threading
+from logical_permissions.LogicalPermissions import LogicalPermissions
+from logical_permissions.CircuitBreaker import CircuitBreaker
+from logical_permissions.exceptions import *
+
+if sys.version_info >= (3, 5):
+  import asyncio
+  from logical_permissions.AsyncBatcher import AsyncBatcher
+
+@unittest.skipIf(sys.version_info < (3, 5), 'The AsyncBatcher requires Python 3.5 or later.')
+class AsyncBatcherTest(unittest.TestCase):
+
+  def setUp(self):
+    self.loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(self.loop)
+
+  def tearDown(self):
+    asyncio.set_event_loop(None)
+    self.loop.close()
+
+  def runAll(self, coroutines):
+    # The tasks are started in a fixed order, since asyncio.gather() starts them in arbitrary order on Python 3.6
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    return self.loop.run_until_complete(asyncio.gather(*tasks))
+
+  def testCreationParamPermissionsWrongType(self):
+    with self.assertRaises(InvalidArgumentTypeException):
+      AsyncBatcher(permissions = {})
+
+  def testSetBatchCallbackUnregisteredType(self):
+    batcher = AsyncBatcher(permissions = LogicalPermissions())
+    with self.assertRaises(PermissionTypeNotRegisteredException):
+      batcher.setBatchCallback('role', lambda lookups: [])
+
+  def testSetBatchCallbackParamCallbackWrongType(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: False)
+    batcher = AsyncBatcher(permissions = lp)
+    with self.assertRaises(InvalidArgumentTypeException):
+      batcher.setBatchCallback('role', 0)
+
+  def testBatchCallbackWrongReturnType(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: False)
+    batcher = AsyncBatcher(permissions = lp)
+    batcher.setBatchCallback('role', lambda lookups: [True])
+    with self.assertRaises(InvalidCallbackReturnTypeException):
+      self.runAll([batcher.checkAccessAsync({'role': 'admin'}, {'user': {}}), batcher.checkAccessAsync({'role': 'editor'}, {'user': {}})])
+
+  def testBatchCallbackExceptionRetrievesEveryLookup(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: False)
+    lp.setTypeUniverse('role', ['admin', 'editor'], lambda context: [])
+    def role_batch(lookups):
+      raise KeyError('role')
+    batcher = AsyncBatcher(permissions = lp)
+    batcher.setBatchCallback('role', role_batch)
+    unhandled = []
+    self.loop.set_exception_handler(lambda loop, context: unhandled.append(context))
+    with self.assertRaises(KeyError):
+      self.runAll([batcher.checkAccessAsync(lp.compile({'role': {'OR': ['admin', 'editor']}}), {'user': {}})])
+    gc.collect()
+    self.assertEqual(unhandled, [])
+
+  def testCheckAccessAsync(self):
+    lp = LogicalPermissions()
+    flag_calls = []
+    def flag_callback(flag, context):
+      flag_calls.append(flag)
+      return context['user'].get(flag, False)
+    lp.addType('role', lambda role, context: role in context['user']['roles'])
+    lp.addType('flag', flag_callback)
+    lp.setBypassCallback(lambda context: context['user'].get('bypass', False))
+    batches = []
+    def role_batch(lookups):
+      batches.append([(role, context['user']['id']) for role, context in lookups])
+      future = self.loop.create_future()
+      self.loop.call_soon(future.set_result, [role in context['user']['roles'] for role, context in lookups])
+      return future
+    batcher = AsyncBatcher(permissions = lp)
+    batcher.setBatchCallback('role', role_batch)
+    self.assertIs(batcher.getBatchCallback('role'), role_batch)
+
+    permissions = lp.compile({'OR': [{'role': 'admin'}, {'AND': [{'role': 'editor'}, {'flag': 'is_author'}]}]})
+    users = [
+      {'id': 1, 'roles': ['admin']},
+      {'id': 2, 'roles': ['editor'], 'is_author': True},
+      {'id': 3, 'roles': ['editor']},
+      {'id': 4, 'roles': [], 'bypass': True},
+    ]
+    contexts = [{'user': user} for user in users]
+    results = self.runAll([batcher.checkAccessAsync(permissions, context) for context in contexts])
+    self.assertEqual(results, [True, True, False, True])
+    self.assertEqual(results, [lp.checkAccess(permissions, context) for context in contexts])
+
+    # The lookups of all access checks are dispatched together in each step
+    self.assertEqual(batches, [[('admin', 1), ('admin', 2), ('admin', 3)], [('editor', 2), ('editor', 3)]])
+    self.assertEqual(batcher.getStatistics(), {'batches': 2, 'lookups': 5})
+    self.assertEqual(flag_calls[:2], ['is_author', 'is_author'])
+
+    # Lookups of the same permission with the same context are only passed once
+    del batches[:]
+    self.runAll([batcher.checkAccessAsync({'role': 'admin'}, contexts[0]), batcher.checkAccessAsync({'role': ['admin', 'writer']}, contexts[0])])
+    self.assertEqual(batches, [[('admin', 1)]])
+
+    batcher.setBatchCallback('role', None)
+    self.assertIsNone(batcher.getBatchCallback('role'))
+    self.assertEqual(self.runAll([batcher.checkAccessAsync({'role': 'writer'}, contexts[0])]), [False])
+    self.assertEqual(batches, [[('admin', 1)]])
+
+  def testCheckAccessAsyncTypeTimeout(self):
+    lp = LogicalPermissions()
+    released = threading.Event()
+    self.addCleanup(released.set)
+    def flag_callback(flag, context):
+      if flag == 'slow':
+        released.wait(5)
+      return True
+    lp.addType('flag', flag_callback)
+    lp.setTypeTimeout('flag', 0.05)
+    batcher = AsyncBatcher(permissions = lp)
+
+    # The slow lookup runs in the executor and times out without blocking the event loop
+    order = []
+    tasks = []
+    for flag in ['slow', 'fast']:
+      tasks.append(asyncio.ensure_future(batcher.checkAccessAsync({'flag': flag}, {'user': {}})))
+      tasks[-1].add_done_callback(lambda task, flag = flag: order.append(flag))
+    tick = self.loop.create_future()
+    self.loop.call_later(0.001, lambda: (order.append('tick'), tick.set_result(True)))
+    self.assertEqual(self.loop.run_until_complete(asyncio.gather(*(tasks + [tick]))), [False, True, True])
+    self.assertEqual(order[-1], 'slow')
+    self.assertEqual(lp.getStatistics()['timeouts'], {'flag': 1})
+
+    lp.setTypeTimeout('flag', 0.05, 'raise')
+    with self.assertRaises(PermissionTimeoutException):
+      self.runAll([batcher.checkAccessAsync({'flag': 'slow'}, {'user': {}})])
+
+  def testCheckAccessAsyncUnknownFallback(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: role in context['roles'])
+    lp.addType('flag', lambda flag, context: False)
+    breaker = CircuitBreaker(failure_threshold = 1, fallback = 'unknown')
+    breaker.allowCall()
+    breaker.recordFailure()
+    lp.setTypeCircuitBreaker('flag', breaker)
+    batcher = AsyncBatcher(permissions = lp)
+    batcher.setBatchCallback('role', lambda lookups: [role in context['roles'] for role, context in lookups])
+
+    # An unknown permission is not negated into a grant
+    permissions_list = [
+      {'AND': [{'role': 'r'}, {'NOT': {'flag': 'banned'}}]},
+      {'OR': [{'NOT': {'flag': 'banned'}}, {'role': 'r'}]},
+    ]
+    results = self.runAll([batcher.checkAccessAsync(permissions, {'roles': ['r']}) for permissions in permissions_list])
+    self.assertEqual(results, [False, True])
+    self.assertEqual(results, [lp.checkAccess(permissions, {'roles': ['r']}) for permissions in permissions_list])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import threading
+import time
+from logical_permissions.CallbackPool import CallbackPool
+from logical_permissions.exceptions import *
+
+class CallbackPoolTest(unittest.TestCase):
+
+  def testCreationParamMaxWorkersWrongType(self):
+    with self.assertRaises(InvalidArgumentTypeException):
+      CallbackPool(max_workers = '4')
+
+  def testCreationParamMaxWorkersWrongValue(self):
+    with self.assertRaises(InvalidArgumentValueException):
+      CallbackPool(max_workers = 0)
+
+  def testCall(self):
+    pool = CallbackPool(max_workers = 2)
+    self.assertEqual(pool.call(lambda a, b: a + b, (1, 2), 5), (True, 3))
+    self.assertEqual(pool.call(lambda a, b: a * b, (2, 3), 5), (True, 6))
+    # The worker thread is reused
+    self.assertEqual(pool.getStatistics()['workers'], 1)
+    pool.shutdown()
+
+  def testCallException(self):
+    pool = CallbackPool()
+    def callback():
+      raise KeyError('key')
+    with self.assertRaises(KeyError):
+      pool.call(callback, (), 5)
+    pool.shutdown()
+
+  def testCallTimeout(self):
+    pool = CallbackPool(max_workers = 2)
+    released = threading.Event()
+    self.addCleanup(released.set)
+    calls = []
+    def callback(value):
+      calls.append(value)
+      released.wait(5)
+      return value
+
+    self.assertEqual(pool.call(callback, (1,), 0.01), (False, None))
+    self.assertEqual(pool.call(callback, (2,), 0.01), (False, None))
+    self.assertEqual(pool.getStatistics(), {'workers': 2, 'idle': 0, 'abandoned': 2})
+
+    # While all worker threads are busy with calls that timed out, calls are rejected without waiting
+    started = time.time()
+    self.assertEqual(pool.call(callback, (3,), 5), (False, None))
+    self.assertLess(time.time() - started, 1)
+    self.assertEqual(calls, [1, 2])
+
+    released.set()
+    while pool.getStatistics()['abandoned']:
+      time.sleep(0.001)
+    self.assertEqual(pool.call(callback, (4,), 5), (True, 4))
+    self.assertEqual(pool.getStatistics()['workers'], 2)
+    pool.shutdown()
+
+  def testCallTimeoutQueued(self):
+    pool = CallbackPool(max_workers = 1)
+    released = threading.Event()
+    self.addCleanup(released.set)
+    calls = []
+    def callback(value):
+      calls.append(value)
+      released.wait(5)
+      return value
+
+    thread = threading.Thread(target = pool.call, args = (callback, (1,), 5))
+    thread.start()
+    while not calls:
+      time.sleep(0.001)
+    # A call that times out before a worker thread has started it is cancelled
+    self.assertEqual(pool.call(callback, (2,), 0.01), (False, None))
+    released.set()
+    thread.join()
+    self.assertEqual(pool.call(callback, (3,), 5), (True, 3))
+    self.assertEqual(calls, [1, 3])
+    pool.shutdown()
+
+  def testShutdown(self):
+    pool = CallbackPool()
+    pool.call(lambda: True, (), 5)
+    pool.shutdown()
+    for _ in range(500):
+      if not pool.getStatistics()['workers']:
+        break
+      time.sleep(0.01)
+    self.assertEqual(pool.getStatistics()['workers'], 0)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+from logical_permissions.CircuitBreaker import CircuitBreaker
+from logical_permissions.exceptions import *
+
+class CircuitBreakerTest(unittest.TestCase):
+
+  def testCreationParamFailureThresholdWrongType(self):
+    with self.assertRaises(InvalidArgumentTypeException):
+      CircuitBreaker(failure_threshold = '5')
+
+  def testCreationParamFailureThresholdWrongValue(self):
+    with self.assertRaises(InvalidArgumentValueException):
+      CircuitBreaker(failure_threshold = 0)
+
+  def testCreationParamResetTimeoutWrongValue(self):
+    with self.assertRaises(InvalidArgumentValueException):
+      CircuitBreaker(reset_timeout = -1)
+
+  def testCreationParamLatencyThresholdWrongType(self):
+    with self.assertRaises(InvalidArgumentTypeException):
+      CircuitBreaker(latency_threshold = '1')
+
+  def testCreationParamFallbackWrongValue(self):
+    with self.assertRaises(InvalidArgumentValueException):
+      CircuitBreaker(fallback = 'ignore')
+
+  def testCreationParamClockWrongType(self):
+    with self.assertRaises(InvalidArgumentTypeException):
+      CircuitBreaker(clock = 0)
+
+  def testTrip(self):
+    now = [100]
+    breaker = CircuitBreaker(failure_threshold = 2, reset_timeout = 10, clock = lambda: now[0])
+    self.assertEqual(breaker.getState(), 'closed')
+    self.assertTrue(breaker.allowCall())
+    breaker.recordFailure()
+    self.assertTrue(breaker.allowCall())
+    breaker.recordSuccess(duration = 0)
+    self.assertTrue(breaker.allowCall())
+    breaker.recordFailure()
+    self.assertEqual(breaker.getState(), 'closed')
+    self.assertTrue(breaker.allowCall())
+    breaker.recordFailure()
+    self.assertEqual(breaker.getState(), 'open')
+    self.assertFalse(breaker.allowCall())
+    now[0] = 109
+    self.assertFalse(breaker.allowCall())
+    self.assertEqual(breaker.getStatistics(), {'calls': 4, 'failures': 3, 'rejections': 2, 'trips': 1, 'state': 'open', 'consecutive_failures': 2})
+
+  def testHalfOpen(self):
+    now = [100]
+    breaker = CircuitBreaker(failure_threshold = 1, reset_timeout = 10, clock = lambda: now[0])
+    self.assertTrue(breaker.allowCall())
+    breaker.recordFailure()
+    now[0] = 110
+    self.assertEqual(breaker.getState(), 'half_open')
+
+    # Only a single probe call is let through
+    self.assertTrue(breaker.allowCall())
+    self.assertFalse(breaker.allowCall())
+    breaker.recordFailure()
+    self.assertEqual(breaker.getState(), 'open')
+    self.assertEqual(breaker.getStatistics()['trips'], 2)
+
+    now[0] = 120
+    self.assertTrue(breaker.allowCall())
+    breaker.recordSuccess(duration = 0)
+    self.assertEqual(breaker.getState(), 'closed')
+    self.assertTrue(breaker.allowCall())
+
+  def testLateSuccessWhileOpen(self):
+    now = [100]
+    breaker = CircuitBreaker(failure_threshold = 1, reset_timeout = 10, clock = lambda: now[0])
+    slow_ticket = breaker.allowCall()
+    self.assertTrue(breaker.allowCall())
+    breaker.recordFailure()
+    self.assertEqual(breaker.getState(), 'open')
+
+    # A call that started before the circuit breaker opened doesn't close it
+    breaker.recordSuccess(duration = 0, ticket = slow_ticket)
+    self.assertEqual(breaker.getState(), 'open')
+    self.assertFalse(breaker.allowCall())
+
+  def testNonProbeSuccessWhileHalfOpen(self):
+    now = [100]
+    breaker = CircuitBreaker(failure_threshold = 1, reset_timeout = 10, clock = lambda: now[0])
+    slow_ticket = breaker.allowCall()
+    self.assertTrue(breaker.allowCall())
+    breaker.recordFailure()
+    now[0] = 110
+    probe_ticket = breaker.allowCall()
+    self.assertTrue(probe_ticket)
+    self.assertNotEqual(probe_ticket, slow_ticket)
+
+    # Only the probe call closes a half-open circuit breaker
+    breaker.recordSuccess(duration = 0, ticket = slow_ticket)
+    self.assertEqual(breaker.getState(), 'half_open')
+    self.assertFalse(breaker.allowCall())
+    breaker.recordSuccess(duration = 0, ticket = probe_ticket)
+    self.assertEqual(breaker.getState(), 'closed')
+
+  def testLatencyThreshold(self):
+    breaker = CircuitBreaker(failure_threshold = 2, latency_threshold = 0.5)
+    breaker.allowCall()
+    breaker.recordSuccess(duration = 1)
+    breaker.allowCall()
+    breaker.recordSuccess(duration = 0.5)
+    self.assertEqual(breaker.getStatistics()['consecutive_failures'], 0)
+    breaker.allowCall()
+    breaker.recordSuccess(duration = 1)
+    breaker.allowCall()
+    breaker.recordSuccess(duration = 2)
+    self.assertEqual(breaker.getState(), 'open')
+
+  def testReset(self):
+    breaker = CircuitBreaker(failure_threshold = 1)
+    breaker.allowCall()
+    breaker.recordFailure()
+    self.assertEqual(breaker.getState(), 'open')
+    breaker.reset()
+    self.assertEqual(breaker.getState(), 'closed')
+    self.assertTrue(breaker.allowCall())
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from logical_permissions.DecisionCache import DecisionCache
+from logical_permissions.exceptions import *
+
+class DecisionCacheTest(unittest.TestCase):
+
+  def testCreationParamFingerprintWrongType(self):
+    with self.assertRaises(InvalidArgumentTypeException):
+      DecisionCache(fingerprint = 0)
+
+  def testCreationParamTtlWrongValue(self):
+    with self.assertRaises(InvalidArgumentValueException):
+      DecisionCache(fingerprint = lambda context: None, ttl = 0)
+
+  def testCreationParamMaxSizeWrongType(self):
+    with self.assertRaises(InvalidArgumentTypeException):
+      DecisionCache(fingerprint = lambda context: None, max_size = 'test')
+
+  def testGetSet(self):
+    cache = DecisionCache(fingerprint = lambda context: None)
+    self.assertIsNone(cache.get('key', version = 1))
+    cache.set('key', False, version = 1)
+    self.assertFalse(cache.get('key', version = 1))
+    self.assertIsNone(cache.get('key', version = 2))
+    self.assertIsNone(cache.get('key', version = 1))
+    self.assertEqual(cache.getStatistics(), {'hits': 1, 'misses': 3, 'evictions': 0, 'expirations': 0, 'invalidations': 0, 'size': 0})
+
+  def testTtl(self):
+    now = [100]
+    cache = DecisionCache(fingerprint = lambda context: None, ttl = 10, clock = lambda: now[0])
+    cache.set('key', True, version = 1)
+    now[0] = 109
+    self.assertTrue(cache.get('key', version = 1))
+    now[0] = 110
+    self.assertIsNone(cache.get('key', version = 1))
+    self.assertEqual(cache.getStatistics()['expirations'], 1)
+
+  def testMaxSize(self):
+    cache = DecisionCache(fingerprint = lambda context: None, max_size = 2)
+    cache.set('key1', True, version = 1)
+    cache.set('key2', True, version = 1)
+    self.assertTrue(cache.get('key1', version = 1))
+    cache.set('key3', True, version = 1)
+    self.assertIsNone(cache.get('key2', version = 1))
+    self.assertTrue(cache.get('key1', version = 1))
+    self.assertTrue(cache.get('key3', version = 1))
+    self.assertEqual(cache.getStatistics()['evictions'], 1)
+    self.assertEqual(cache.getStatistics()['size'], 2)
+
+  def testInvalidateParamValueWithoutType(self):
+    cache = DecisionCache(fingerprint = lambda context: None)
+    with self.assertRaises(InvalidArgumentValueException):
+      cache.invalidate(value = 'editor')
+
+  def testInvalidate(self):
+    cache = DecisionCache(fingerprint = lambda context: None)
+    cache.set('key1', True, version = 1, tags = [('role', 'editor'), ('flag', 'is_author')])
+    cache.set('key2', True, version = 1, tags = [('role', 'admin')])
+    cache.set('key3', True, version = 1, tags = [('flag', 'is_author')])
+    cache.set('key4', True, version = 1)
+    cache.invalidate(type = 'role', value = 'editor')
+    self.assertIsNone(cache.get('key1', version = 1))
+    self.assertTrue(cache.get('key2', version = 1))
+    cache.invalidate(type = 'role')
+    self.assertIsNone(cache.get('key2', version = 1))
+    self.assertTrue(cache.get('key3', version = 1))
+    cache.invalidate()
+    self.assertIsNone(cache.get('key3', version = 1))
+    self.assertIsNone(cache.get('key4', version = 1))
+    self.assertEqual(cache.getStatistics()['invalidations'], 4)
+
+  def testClear(self):
+    cache = DecisionCache(fingerprint = lambda context: None)
+    cache.set('key', True, version = 1)
+    cache.clear()
+    self.assertIsNone(cache.get('key', version = 1))
+
+if __name__ == '__main__':
+  unittest.main()
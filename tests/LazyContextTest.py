@@ -0,0 +1,61 @@
+import unittest
+from logical_permissions.LazyContext import LazyContext
+from logical_permissions.exceptions import *
+
+class LazyContextTest(unittest.TestCase):
+
+  def testCreationParamValuesWrongType(self):
+    with self.assertRaises(InvalidArgumentTypeException):
+      LazyContext(values = [])
+
+  def testCreationParamLoadersWrongType(self):
+    with self.assertRaises(InvalidArgumentTypeException):
+      LazyContext(loaders = {'user': 0})
+
+  def testLoad(self):
+    calls = []
+    def load_user(context):
+      calls.append('user')
+      return {'id': context['user_id']}
+    context = LazyContext(values = {'user_id': 1}, loaders = {'user': load_user})
+    self.assertTrue(isinstance(context, dict))
+    self.assertTrue('user' in context)
+    self.assertEqual(sorted(context.keys()), ['user', 'user_id'])
+    self.assertEqual(len(context), 2)
+    self.assertFalse(context.isLoaded('user'))
+    self.assertEqual(calls, [])
+    self.assertEqual(context['user'], {'id': 1})
+    self.assertEqual(context.get('user'), {'id': 1})
+    self.assertTrue(context.isLoaded('user'))
+    self.assertEqual(calls, ['user'])
+    self.assertIsNone(context.get('document'))
+    with self.assertRaises(KeyError):
+      context['document']
+
+  def testSetDelete(self):
+    calls = []
+    context = LazyContext(loaders = {'user': lambda context: calls.append('user')})
+    context['user'] = {'id': 2}
+    self.assertEqual(context['user'], {'id': 2})
+    del context['user']
+    self.assertFalse('user' in context)
+    self.assertEqual(calls, [])
+
+  def testCopy(self):
+    calls = []
+    def load_user(context):
+      calls.append('user')
+      return {'id': 1}
+    context = LazyContext(values = {'request': 1}, loaders = {'user': load_user})
+    context_copy = context.copy()
+    context_copy['item'] = 'document'
+    self.assertTrue(isinstance(context_copy, LazyContext))
+    self.assertFalse('item' in context)
+    self.assertEqual(calls, [])
+    self.assertEqual(context_copy['user'], {'id': 1})
+    self.assertEqual(context['user'], {'id': 1})
+    self.assertEqual(calls, ['user'])
+    self.assertEqual(context, {'request': 1, 'user': {'id': 1}})
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,5 +1,13 @@
 import unittest
-from logical_permissions.LogicalPermissions import LogicalPermissions
+import sys
+import threading
+import time
+import sqlite3
+from logical_permissions.LogicalPermissions import LogicalPermissions, UNKNOWN
+from logical_permissions.DecisionCache import DecisionCache
+from logical_permissions.LazyContext import LazyContext
+from logical_permissions.PopulationIndex import PopulationIndex
+from logical_permissions.CircuitBreaker import CircuitBreaker
 from logical_permissions.exceptions import *
 
 class LogicalPermissionsTest(unittest.TestCase):
@@ -41,6 +49,26 @@ class LogicalPermissionsTest(unittest.TestCase):
     lp.addType(name = 'test', callback = lambda: true)
     self.assertTrue(lp.typeExists(name = 'test'))
 
+  def testAddTypeParamContextKeysWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.addType(name = 'test', callback = lambda: true, context_keys = 'user')
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.addType(name = 'test', callback = lambda: true, context_keys = ['user..id'])
+    self.assertFalse(lp.typeExists(name = 'test'))
+
+  def testAddTypeParamPureWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.addType(name = 'test', callback = lambda: true, pure = 1)
+
+  def testAddTypeDependencies(self):
+    lp = LogicalPermissions()
+    lp.addType(name = 'test', callback = lambda: true, context_keys = ['user.roles', ('document', 'id')], pure = True)
+    self.assertEqual(lp.getTypeDependencies(name = 'test'), {'context_keys': [('user', 'roles'), ('document', 'id')], 'pure': True})
+    lp.addType(name = 'test2', callback = lambda: true)
+    self.assertIsNone(lp.getTypeDependencies(name = 'test2'))
+
   # -------------LogicalPermissions::removeType()--------------
 
   def testRemoveTypeParamNameWrongType(self):
@@ -136,6 +164,65 @@ class LogicalPermissionsTest(unittest.TestCase):
     lp.setTypeCallback(name = 'test', callback = callback)
     self.assertIs(lp.getTypeCallback(name = 'test'), callback)
 
+  def testSetTypeCallbackDependencies(self):
+    lp = LogicalPermissions()
+    callback = lambda: true
+    lp.addType(name = 'test', callback = callback, context_keys = ['user'], pure = True)
+    lp.setTypeCallback(name = 'test', callback = callback, context_keys = ['document'], pure = True)
+    self.assertEqual(lp.getTypeDependencies(name = 'test'), {'context_keys': [('document',)], 'pure': True})
+    lp.setTypeCallback(name = 'test', callback = lambda: true)
+    self.assertIsNone(lp.getTypeDependencies(name = 'test'))
+
+  def testCheckAccessPureTypeCache(self):
+    lp = LogicalPermissions()
+    calls = []
+    def role_callback(role, context):
+      calls.append(role)
+      return role in context['user']['roles']
+    lp.addType('role', role_callback, context_keys = ['user.id'], pure = True)
+    users = {1: ['editor'], 2: ['admin']}
+    def impure_role_callback(role, context):
+      calls.append(role)
+      return role in users[context['user']['id']]
+    user = {'id': 1, 'roles': ['editor']}
+    self.assertTrue(lp.checkAccess({'role': ['admin', 'editor']}, {'user': user, 'request': 1}))
+    self.assertFalse(lp.checkAccess(lp.compile({'role': {'AND': ['editor', 'admin']}}), {'user': user, 'request': 2}))
+    self.assertEqual(calls, ['admin', 'editor'])
+    self.assertTrue(lp.checkAccess({'role': 'admin'}, {'user': {'id': 2, 'roles': ['admin']}}))
+    self.assertEqual(calls, ['admin', 'editor', 'admin'])
+
+    # Changing the declarations or the callback discards the cached results
+    lp.setTypeCallback('role', role_callback, context_keys = ['user.id', 'user.roles'], pure = True)
+    self.assertFalse(lp.checkAccess({'role': 'admin'}, {'user': user}))
+    self.assertEqual(len(calls), 4)
+    self.assertFalse(lp.checkAccess({'role': 'admin'}, {'user': user}))
+    self.assertEqual(len(calls), 4)
+    lp.setTypeCallback('role', impure_role_callback, context_keys = ['user.id'])
+    self.assertFalse(lp.checkAccess({'role': 'admin'}, {'user': user}))
+    self.assertFalse(lp.checkAccess({'role': 'admin'}, {'user': user}))
+    self.assertEqual(len(calls), 6)
+
+  def testCheckAccessPureTypeCacheContainerKinds(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: isinstance(context['user'], (list, set)), context_keys = ['user'], pure = True)
+    self.assertTrue(lp.checkAccess({'role': 'admin'}, {'user': ['dict']}))
+    self.assertFalse(lp.checkAccess({'role': 'admin'}, {'user': {}}))
+    self.assertTrue(lp.checkAccess({'role': 'admin'}, {'user': ['admin']}))
+    self.assertFalse(lp.checkAccess({'role': 'admin'}, {'user': ('admin',)}))
+    self.assertTrue(lp.checkAccess({'role': 'admin'}, {'user': set(['admin'])}))
+    self.assertFalse(lp.checkAccess({'role': 'admin'}, {'user': frozenset(['admin'])}))
+
+  def testCheckAccessPureTypeCacheScalars(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: repr(context.get('user', 'missing')) == role, context_keys = ['user'], pure = True)
+    self.assertTrue(lp.checkAccess({'role': 'None'}, {'user': None}))
+    self.assertFalse(lp.checkAccess({'role': 'None'}, {}))
+    self.assertTrue(lp.checkAccess({'role': '1'}, {'user': 1}))
+    self.assertFalse(lp.checkAccess({'role': '1'}, {'user': 1.0}))
+    self.assertFalse(lp.checkAccess({'role': '1'}, {'user': True}))
+    self.assertTrue(lp.checkAccess({'role': "{1: 'admin'}"}, {'user': {1: 'admin'}}))
+    self.assertFalse(lp.checkAccess({'role': "{1: 'admin'}"}, {'user': {True: 'admin'}}))
+
   # ------------LogicalPermissions::getTypes()---------------
 
   def testGetTypes(self):
@@ -190,6 +277,373 @@ class LogicalPermissionsTest(unittest.TestCase):
     types['test2'] = lambda: true
     self.assertFalse('test2' in lp.getTypes())
 
+  # ------------LogicalPermissions::setTypeSqlBuilder()---------------
+
+  def testSetTypeSqlBuilderUnregisteredType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PermissionTypeNotRegisteredException):
+      lp.setTypeSqlBuilder(name = 'test', builder = lambda value, context: ('1 = 1', []))
+
+  def testSetTypeSqlBuilderParamBuilderWrongType(self):
+    lp = LogicalPermissions()
+    lp.addType(name = 'test', callback = lambda: true)
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setTypeSqlBuilder(name = 'test', builder = 0)
+
+  def testSetTypeSqlBuilder(self):
+    lp = LogicalPermissions()
+    lp.addType(name = 'test', callback = lambda: true)
+    self.assertIsNone(lp.getTypeSqlBuilder(name = 'test'))
+    builder = lambda value, context: ('1 = 1', [])
+    lp.setTypeSqlBuilder(name = 'test', builder = builder)
+    self.assertIs(lp.getTypeSqlBuilder(name = 'test'), builder)
+    lp.removeType(name = 'test')
+    lp.addType(name = 'test', callback = lambda: true)
+    self.assertIsNone(lp.getTypeSqlBuilder(name = 'test'))
+
+  # ------------LogicalPermissions::setTypePrefetch()---------------
+
+  def testSetTypePrefetchUnregisteredType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PermissionTypeNotRegisteredException):
+      lp.setTypePrefetch(name = 'test', prefetch = lambda values, context: {})
+
+  def testSetTypePrefetchParamPrefetchWrongType(self):
+    lp = LogicalPermissions()
+    lp.addType(name = 'test', callback = lambda: true)
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setTypePrefetch(name = 'test', prefetch = 0)
+
+  def testSetTypePrefetch(self):
+    lp = LogicalPermissions()
+    lp.addType(name = 'test', callback = lambda: true)
+    self.assertIsNone(lp.getTypePrefetch(name = 'test'))
+    prefetch = lambda values, context: {}
+    lp.setTypePrefetch(name = 'test', prefetch = prefetch)
+    self.assertIs(lp.getTypePrefetch(name = 'test'), prefetch)
+    lp.setTypePrefetch(name = 'test', prefetch = None)
+    self.assertIsNone(lp.getTypePrefetch(name = 'test'))
+    lp.addType(name = 'test2', callback = lambda: true, prefetch = prefetch)
+    self.assertIs(lp.getTypePrefetch(name = 'test2'), prefetch)
+    lp.removeType(name = 'test2')
+    lp.addType(name = 'test2', callback = lambda: true)
+    self.assertIsNone(lp.getTypePrefetch(name = 'test2'))
+
+  def testCheckAccessPrefetchWrongReturnType(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: True, prefetch = lambda roles, context: {'admin': 1})
+    with self.assertRaises(InvalidCallbackReturnTypeException):
+      lp.checkAccess(lp.compile({'role': 'admin'}), {})
+
+  def testCheckAccessPrefetch(self):
+    lp = LogicalPermissions()
+    calls = []
+    prefetches = []
+    def role_callback(role, context):
+      calls.append(role)
+      return role in context['user']['roles']
+    def role_prefetch(roles, context):
+      prefetches.append(roles)
+      return dict((role, role in context['user']['roles']) for role in roles if role != 'writer')
+    lp.addType('role', role_callback, prefetch = role_prefetch)
+    lp.addType('flag', lambda flag, context: context['user'].get(flag, False))
+    lp.addPolicy('is_staff', {'role': ['admin', 'editor']})
+    user = {'roles': ['editor', 'writer']}
+    permissions = [lp.compile({'POLICY': 'is_staff'}), lp.compile({'AND': [{'flag': 'is_author'}, {'role': 'writer'}]}), lp.compile({'role': 'writer'})]
+    self.assertEqual(lp.checkAccessMany(permissions, {'user': user}), [True, False, True])
+    self.assertEqual(prefetches, [frozenset(['admin', 'editor', 'writer'])])
+    self.assertEqual(calls, ['writer'])
+
+    # The prefetch callback is only called for evaluations that consult the type
+    self.assertFalse(lp.checkAccess(permissions[1], {'user': user}))
+    self.assertEqual(len(prefetches), 1)
+    # Permission trees that aren't compiled are prefetched as well
+    self.assertTrue(lp.checkAccess({'OR': [{'flag': 'is_author'}, {'role': ['editor', 'writer']}]}, {'user': user}))
+    self.assertEqual(prefetches[1:], [frozenset(['editor', 'writer'])])
+    self.assertEqual(calls, ['writer'])
+
+    items = [{'roles': ['admin']}, {'roles': []}]
+    self.assertEqual(list(lp.filter(lambda item: {'role': 'admin'}, items, {'user': user})), [])
+    self.assertEqual(prefetches[2:], [frozenset(['admin']), frozenset(['admin'])])
+
+  # ------------LogicalPermissions::setTypeUniverse()---------------
+
+  def testSetTypeUniverseUnregisteredType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PermissionTypeNotRegisteredException):
+      lp.setTypeUniverse(name = 'role', values = ['admin'], values_callback = lambda context: [])
+
+  def testSetTypeUniverseParamValuesWrongType(self):
+    lp = LogicalPermissions()
+    lp.addType(name = 'role', callback = lambda role, context: True)
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setTypeUniverse(name = 'role', values = 'admin', values_callback = lambda context: [])
+
+  def testSetTypeUniverseParamValuesCallbackWrongType(self):
+    lp = LogicalPermissions()
+    lp.addType(name = 'role', callback = lambda role, context: True)
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setTypeUniverse(name = 'role', values = ['admin'])
+
+  def testSetTypeUniverse(self):
+    lp = LogicalPermissions()
+    lp.addType(name = 'role', callback = lambda role, context: True)
+    self.assertIsNone(lp.getTypeUniverse(name = 'role'))
+    values_callback = lambda context: context['user']['roles']
+    lp.setTypeUniverse(name = 'role', values = ['editor', 'admin'], values_callback = values_callback)
+    self.assertEqual(lp.getTypeUniverse(name = 'role'), {'values': ['admin', 'editor'], 'values_callback': values_callback})
+    lp.setTypeUniverse(name = 'role', values = None)
+    self.assertIsNone(lp.getTypeUniverse(name = 'role'))
+
+  def testCheckAccessTypeUniverse(self):
+    lp = LogicalPermissions()
+    calls = []
+    def role_callback(role, context):
+      calls.append(role)
+      return role in context['user']['roles']
+    def values_callback(context):
+      calls.append('values')
+      return context['user']['roles']
+    lp.addType('role', role_callback)
+    lp.addType('flag', lambda flag, context: context['user'].get(flag, False))
+    lp.setTypeUniverse('role', ['admin', 'editor', 'writer'], values_callback)
+    lp.setTruthTableBitLimit(0)
+    permissions = {
+      'OR': [
+        {'role': {'AND': ['editor', 'writer']}},
+        {'AND': [{'flag': 'is_author'}, {'role': ['admin', 'editor']}]},
+        {'role': {'XOR': ['admin', 'writer']}},
+        {'NOT': {'role': {'NOR': ['admin', 'superuser']}}},
+      ],
+    }
+    compiled = lp.compile(permissions)
+    self.assertEqual(compiled.root.children[0].gate, 'MASK')
+    users = [
+      {'roles': []},
+      {'roles': ['editor']},
+      {'roles': ['editor', 'writer']},
+      {'roles': ['editor'], 'is_author': True},
+      {'roles': ['writer']},
+      {'roles': ['admin', 'writer']},
+      {'roles': ['superuser']},
+    ]
+    results = [lp.checkAccess(permissions, {'user': user}) for user in users]
+    self.assertEqual(results, [False, False, True, True, True, True, True])
+    del calls[:]
+    self.assertEqual([lp.checkAccess(compiled, {'user': user}) for user in users], results)
+    self.assertEqual(calls.count('values'), len(users))
+    self.assertEqual(set(call for call in calls if call != 'values'), set(['superuser']))
+
+    # Compiled permission trees fall back to the callbacks when the universe changes
+    lp.setTypeUniverse('role', ['admin', 'editor'], values_callback)
+    del calls[:]
+    self.assertEqual([lp.checkAccess(compiled, {'user': user}) for user in users], results)
+    self.assertNotIn('values', calls)
+    lp.setTypeUniverse('role', ['writer', 'admin', 'editor'], values_callback)
+    del calls[:]
+    self.assertEqual([lp.checkAccess(compiled, {'user': user}) for user in users], results)
+    self.assertEqual(set(call for call in calls if call != 'values'), set(['superuser']))
+
+    # Known universe types are folded by partial evaluation, and unknown ones are translated to SQL
+    self.assertEqual(lp.partialEvaluate(compiled, {'user': users[2]}, ['role']).root.gate, 'TRUE')
+    lp.setTypeSqlBuilder('role', lambda role, context: ('role = ?', [role]))
+    lp.setTypeSqlBuilder('flag', lambda flag, context: ('{0} = 1'.format(flag), []))
+    sql, params = lp.toSqlWhere({'role': {'AND': ['editor', 'writer']}})
+    self.assertEqual(sql, '(role = ?) AND (role = ?)')
+    self.assertEqual(sorted(params), ['editor', 'writer'])
+
+  # ------------LogicalPermissions::setTruthTableBitLimit()---------------
+
+  def testSetTruthTableBitLimitParamLimitWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setTruthTableBitLimit(limit = '8')
+
+  def testSetTruthTableBitLimitParamLimitWrongValue(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.setTruthTableBitLimit(limit = 21)
+
+  def testSetTruthTableBitLimit(self):
+    lp = LogicalPermissions()
+    self.assertEqual(lp.getTruthTableBitLimit(), 8)
+    lp.setTruthTableBitLimit(limit = 4)
+    self.assertEqual(lp.getTruthTableBitLimit(), 4)
+
+  def testCheckAccessTruthTable(self):
+    lp = LogicalPermissions()
+    calls = []
+    def role_callback(role, context):
+      calls.append(role)
+      return role in context['user']['roles']
+    lp.addType('role', role_callback)
+    lp.addType('group', lambda group, context: group in context['user']['groups'])
+    lp.addType('flag', lambda flag, context: context['user'].get(flag, False))
+    lp.setTypeUniverse('role', ['admin', 'editor', 'writer'], lambda context: context['user']['roles'])
+    lp.setTypeUniverse('group', ['sales', 'support'], lambda context: context['user']['groups'])
+    permissions = {
+      'OR': [
+        {'AND': [{'role': 'editor'}, {'group': {'NOT': 'sales'}}]},
+        {'XOR': [{'role': 'admin'}, {'group': 'support'}]},
+        {'flag': 'is_author'},
+      ],
+    }
+    compiled = lp.compile(permissions)
+    self.assertEqual([child.gate for child in compiled.root.children], ['TABLE', 'LEAF'])
+    users = []
+    for roles in [[], ['editor'], ['admin'], ['writer', 'editor']]:
+      for groups in [[], ['sales'], ['support'], ['sales', 'support']]:
+        users.append({'roles': roles, 'groups': groups})
+    results = [lp.checkAccess(permissions, {'user': user}) for user in users]
+    self.assertEqual([lp.checkAccess(compiled, {'user': user}) for user in users], results)
+
+    lp.setTruthTableBitLimit(limit = 3)
+    self.assertEqual(sorted(child.gate for child in lp.compile(permissions).root.children), ['LEAF', 'TABLE', 'TABLE'])
+    lp.setTruthTableBitLimit(limit = 1)
+    self.assertEqual(sorted(child.gate for child in lp.compile(permissions).root.children), ['AND', 'LEAF', 'XOR'])
+    lp.setTruthTableBitLimit(limit = 8)
+
+    # The subtree is evaluated instead when the universe changes, or partially evaluated when not all types are known
+    lp.setTypeUniverse('group', ['sales'], lambda context: context['user']['groups'])
+    del calls[:]
+    self.assertEqual([lp.checkAccess(compiled, {'user': user}) for user in users], results)
+    self.assertEqual(calls, [])
+    residual = lp.partialEvaluate(compiled, {'user': {'roles': ['editor']}}, ['role'])
+    self.assertTrue(lp.checkAccess(residual, {'user': {'roles': [], 'groups': []}}))
+    self.assertFalse(lp.checkAccess(residual, {'user': {'roles': [], 'groups': ['sales']}}))
+
+  # ------------LogicalPermissions::setTreeLimits()---------------
+
+  def testSetTreeLimitsParamMaxNodesWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setTreeLimits(max_nodes = '100')
+
+  def testSetTreeLimitsParamMaxDepthWrongValue(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.setTreeLimits(max_depth = 0)
+
+  def testSetTreeLimits(self):
+    lp = LogicalPermissions()
+    self.assertEqual(lp.getTreeLimits(), {'max_nodes': None, 'max_depth': None, 'max_leaves_per_type': None})
+    lp.setTreeLimits(max_nodes = 100, max_leaves_per_type = 10)
+    self.assertEqual(lp.getTreeLimits(), {'max_nodes': 100, 'max_depth': None, 'max_leaves_per_type': 10})
+    lp.setTreeLimits()
+    self.assertEqual(lp.getTreeLimits(), {'max_nodes': None, 'max_depth': None, 'max_leaves_per_type': None})
+
+  # ------------LogicalPermissions::setTieringThresholds()---------------
+
+  def testSetTieringThresholdsParamCompileThresholdWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setTieringThresholds(compile_threshold = '10')
+
+  def testSetTieringThresholdsParamGenerateThresholdWrongValue(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.setTieringThresholds(compile_threshold = 10, generate_threshold = -1)
+
+  def testSetTieringThresholds(self):
+    lp = LogicalPermissions()
+    self.assertIsNone(lp.getTieringThresholds())
+    lp.setTieringThresholds(compile_threshold = 10, generate_threshold = 100)
+    self.assertEqual(lp.getTieringThresholds(), {'compile_threshold': 10, 'generate_threshold': 100})
+    lp.setTieringThresholds()
+    self.assertIsNone(lp.getTieringThresholds())
+    self.assertNotIn('tiers', lp.getStatistics())
+
+  # ------------LogicalPermissions::setTypeTimeout()---------------
+
+  def testSetTypeTimeoutUnregisteredType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PermissionTypeNotRegisteredException):
+      lp.setTypeTimeout(name = 'flag', timeout = 1)
+
+  def testSetTypeTimeoutParamTimeoutWrongType(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: True)
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setTypeTimeout(name = 'flag', timeout = '1')
+
+  def testSetTypeTimeoutParamFallbackWrongValue(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: True)
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.setTypeTimeout(name = 'flag', timeout = 1, fallback = 'ignore')
+
+  def testSetTypeTimeout(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: True)
+    self.assertIsNone(lp.getTypeTimeout(name = 'flag'))
+    lp.setTypeTimeout(name = 'flag', timeout = 0.5, fallback = 'unknown')
+    self.assertEqual(lp.getTypeTimeout(name = 'flag'), {'timeout': 0.5, 'fallback': 'unknown'})
+    lp.setTypeTimeout(name = 'flag', timeout = None)
+    self.assertIsNone(lp.getTypeTimeout(name = 'flag'))
+
+  # ------------LogicalPermissions::setEvaluationTimeout()---------------
+
+  def testSetEvaluationTimeoutParamTimeoutWrongValue(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.setEvaluationTimeout(timeout = 0)
+
+  def testSetEvaluationTimeout(self):
+    lp = LogicalPermissions()
+    self.assertIsNone(lp.getEvaluationTimeout())
+    lp.setEvaluationTimeout(timeout = 2, fallback = 'raise')
+    self.assertEqual(lp.getEvaluationTimeout(), {'timeout': 2, 'fallback': 'raise'})
+    lp.setEvaluationTimeout(timeout = None)
+    self.assertIsNone(lp.getEvaluationTimeout())
+
+  # ------------LogicalPermissions::setEvaluationBudget()---------------
+
+  def testSetEvaluationBudgetParamMaxCallbacksWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setEvaluationBudget(max_callbacks = 1.5)
+
+  def testSetEvaluationBudgetParamMaxTimeWrongValue(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.setEvaluationBudget(max_time = 0)
+
+  def testSetEvaluationBudgetParamClockWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setEvaluationBudget(max_time = 1, clock = 0)
+
+  def testSetEvaluationBudget(self):
+    lp = LogicalPermissions()
+    self.assertIsNone(lp.getEvaluationBudget())
+    lp.setEvaluationBudget(max_callbacks = 50)
+    self.assertEqual(lp.getEvaluationBudget(), {'max_callbacks': 50, 'max_time': None, 'clock': time.time})
+    lp.setEvaluationBudget(max_callbacks = None, max_time = None)
+    self.assertIsNone(lp.getEvaluationBudget())
+
+  # ------------LogicalPermissions::setTypeCircuitBreaker()---------------
+
+  def testSetTypeCircuitBreakerUnregisteredType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PermissionTypeNotRegisteredException):
+      lp.setTypeCircuitBreaker(name = 'flag', breaker = CircuitBreaker())
+
+  def testSetTypeCircuitBreakerParamBreakerWrongType(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: True)
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setTypeCircuitBreaker(name = 'flag', breaker = 5)
+
+  def testSetTypeCircuitBreaker(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: True)
+    breaker = CircuitBreaker()
+    self.assertIsNone(lp.getTypeCircuitBreaker(name = 'flag'))
+    lp.setTypeCircuitBreaker(name = 'flag', breaker = breaker)
+    self.assertIs(lp.getTypeCircuitBreaker(name = 'flag'), breaker)
+    lp.setTypeCircuitBreaker(name = 'flag', breaker = None)
+    self.assertIsNone(lp.getTypeCircuitBreaker(name = 'flag'))
+
   # ------------LogicalPermissions::getBypassCallback()---------------
 
   def testGetBypassCallback(self):
@@ -209,11 +663,219 @@ class LogicalPermissionsTest(unittest.TestCase):
     lp.setBypassCallback(callback = callback)
     self.assertIs(lp.getBypassCallback(), callback)
 
+  # ------------LogicalPermissions::addPolicy()---------------
+
+  def testAddPolicyParamNameWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.addPolicy(name = 0, permissions = True)
+
+  def testAddPolicyParamNameEmpty(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.addPolicy(name = '', permissions = True)
+
+  def testAddPolicyParamNameIsCoreKey(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.addPolicy(name = 'true', permissions = True)
+
+  def testAddPolicyParamNameExists(self):
+    lp = LogicalPermissions()
+    lp.addPolicy(name = 'test', permissions = True)
+    with self.assertRaises(PolicyAlreadyExistsException):
+      lp.addPolicy(name = 'test', permissions = True)
+
+  def testAddPolicyParamPermissionsWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.addPolicy(name = 'test', permissions = 50)
+
+  def testAddPolicyParamPermissionsNoBypass(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.addPolicy(name = 'test', permissions = {'no_bypass': True, 0: True})
+
+  def testAddPolicyReferenceCycle(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PolicyReferenceCycleException):
+      lp.addPolicy(name = 'test', permissions = {'POLICY': 'test'})
+    lp.addPolicy(name = 'test1', permissions = {'POLICY': {'AND': ['test2', 'test3']}})
+    lp.addPolicy(name = 'test2', permissions = {'POLICY': 'test3'})
+    with self.assertRaises(PolicyReferenceCycleException):
+      lp.addPolicy(name = 'test3', permissions = {'OR': [False, {'policy': ['test1']}]})
+    self.assertFalse(lp.policyExists(name = 'test3'))
+
+  def testAddPolicyLongReferenceChain(self):
+    lp = LogicalPermissions()
+    length = sys.getrecursionlimit() * 2
+    lp.addPolicy(name = 'policy0', permissions = True)
+    for index in range(1, length):
+      lp.addPolicy(name = 'policy{0}'.format(index), permissions = {'POLICY': 'policy{0}'.format(index - 1)})
+    with self.assertRaises(PolicyReferenceCycleException):
+      lp.setPolicies(policies = dict(('policy{0}'.format(index), {'POLICY': 'policy{0}'.format((index + 1) % length)}) for index in range(length)))
+    lp.setPolicies(policies = dict(('policy{0}'.format(index), {'POLICY': 'policy{0}'.format(index + 1)} if index + 1 < length else True) for index in range(length)))
+    self.assertTrue(lp.policyExists(name = 'policy{0}'.format(length - 1)))
+
+  def testAddPolicy(self):
+    lp = LogicalPermissions()
+    permissions = {'role': 'admin'}
+    lp.addPolicy(name = 'test', permissions = permissions)
+    self.assertTrue(lp.policyExists(name = 'test'))
+    permissions['role'] = 'editor'
+    self.assertEqual(lp.getPolicy(name = 'test'), {'role': 'admin'})
+
+  # ------------LogicalPermissions::removePolicy()---------------
+
+  def testRemovePolicyUnregisteredPolicy(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PolicyNotRegisteredException):
+      lp.removePolicy(name = 'test')
+
+  def testRemovePolicy(self):
+    lp = LogicalPermissions()
+    lp.addPolicy(name = 'test', permissions = True)
+    lp.removePolicy(name = 'test')
+    self.assertFalse(lp.policyExists(name = 'test'))
+
+  # ------------LogicalPermissions::getPolicy()---------------
+
+  def testGetPolicyUnregisteredPolicy(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PolicyNotRegisteredException):
+      lp.getPolicy(name = 'test')
+
+  # ------------LogicalPermissions::setPolicies()---------------
+
+  def testSetPoliciesParamPoliciesWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setPolicies(policies = 55)
+
+  def testSetPoliciesReferenceCycle(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PolicyReferenceCycleException):
+      lp.setPolicies(policies = {'test1': {'POLICY': 'test2'}, 'test2': {'POLICY': 'test1'}})
+
+  def testSetPolicies(self):
+    lp = LogicalPermissions()
+    policies = {'test1': {'POLICY': 'test2'}, 'test2': True}
+    lp.setPolicies(policies = policies)
+    policies['test3'] = False
+    self.assertEqual(lp.getPolicies(), {'test1': {'POLICY': 'test2'}, 'test2': True})
+
+  # ------------LogicalPermissions::getPoliciesReferencing()---------------
+
+  def testGetPoliciesReferencingParamTypeWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.getPoliciesReferencing(type = 0)
+
+  def testGetPoliciesReferencing(self):
+    lp = LogicalPermissions()
+    lp.setPolicies({
+      'is_staff': {'role': ['admin', 'editor']},
+      'is_writer': {'AND': [{'POLICY': 'is_staff'}, {'role': {'NOT': 'writer'}}]},
+      'can_publish': {'policy': 'is_writer', 'flag': 'is_author'},
+      'is_public': True,
+    })
+    self.assertEqual(lp.getPoliciesReferencing('role', 'editor'), frozenset(['is_staff', 'is_writer', 'can_publish']))
+    self.assertEqual(lp.getPoliciesReferencing('role', 'writer'), frozenset(['is_writer', 'can_publish']))
+    self.assertEqual(lp.getPoliciesReferencing('flag'), frozenset(['can_publish']))
+    self.assertEqual(lp.getPoliciesReferencing('POLICY', 'is_writer'), frozenset(['can_publish']))
+    self.assertEqual(lp.getPoliciesReferencing('role', 'reviewer'), frozenset())
+
+    lp.removePolicy('is_writer')
+    self.assertEqual(lp.getPoliciesReferencing('role', 'editor'), frozenset(['is_staff']))
+    lp.addPolicy('is_writer', {'role': 'writer'})
+    self.assertEqual(lp.getPoliciesReferencing('role', 'editor'), frozenset(['is_staff']))
+    self.assertEqual(lp.getPoliciesReferencing('role', 'writer'), frozenset(['is_writer', 'can_publish']))
+    lp.setPolicies({'is_staff': {'role': 'admin'}, 'is_public': True})
+    self.assertEqual(lp.getPoliciesReferencing('role'), frozenset(['is_staff']))
+
+  def testGetPoliciesReferencingCoreKeyValues(self):
+    lp = LogicalPermissions()
+    lp.addPolicy('is_or', {'role': ['or', 'admin']})
+    lp.addPolicy('is_not_policy', {'role': {'NOT': 'policy'}})
+    lp.addPolicy('is_true', {'role': 'TRUE'})
+    self.assertEqual(lp.getPoliciesReferencing('role', 'or'), frozenset(['is_or']))
+    self.assertEqual(lp.getPoliciesReferencing('role', 'admin'), frozenset(['is_or']))
+    self.assertEqual(lp.getPoliciesReferencing('role', 'policy'), frozenset(['is_not_policy']))
+    self.assertEqual(lp.getPoliciesReferencing('role', 'TRUE'), frozenset())
+
+  # ------------LogicalPermissions::setDecisionCache()---------------
+
+  def testSetDecisionCacheParamCacheWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.setDecisionCache(cache = {})
+
+  def testSetDecisionCache(self):
+    lp = LogicalPermissions()
+    self.assertIsNone(lp.getDecisionCache())
+    cache = DecisionCache(fingerprint = lambda context: None)
+    lp.setDecisionCache(cache = cache)
+    self.assertIs(lp.getDecisionCache(), cache)
+    lp.setDecisionCache(cache = None)
+    self.assertIsNone(lp.getDecisionCache())
+
+  def testCheckAccessDecisionCache(self):
+    lp = LogicalPermissions()
+    calls = []
+    def role_callback(role, context):
+      calls.append(role)
+      return role in context['user']['roles']
+    lp.addType('role', role_callback)
+    lp.setDecisionCache(DecisionCache(fingerprint = lambda context: (context['user']['id'], tuple(context['user']['roles']))))
+    compiled = lp.compile({'role': ['admin', 'editor']})
+    user = {'id': 1, 'roles': ['editor']}
+    self.assertTrue(lp.checkAccess(compiled, {'user': user, 'request': 1}))
+    self.assertTrue(lp.checkAccess(lp.compile({'role': ['editor', 'admin']}), {'user': user, 'request': 2}))
+    self.assertEqual(calls, ['admin', 'editor'])
+    self.assertTrue(lp.checkAccess(compiled, {'user': user}, False))
+    self.assertEqual(len(calls), 4)
+    self.assertFalse(lp.checkAccess(compiled, {'user': {'id': 2, 'roles': []}}))
+    self.assertEqual(lp.getStatistics()['decision_cache'], {'hits': 1, 'misses': 3, 'evictions': 0, 'expirations': 0, 'invalidations': 0, 'size': 3})
+
+    # Changing the registry makes the cached decisions stale
+    lp.setTypeCallback('role', lambda role, context: False)
+    self.assertFalse(lp.checkAccess(compiled, {'user': user}))
+    lp.setBypassCallback(lambda context: True)
+    self.assertTrue(lp.checkAccess(compiled, {'user': user}))
+
+  def testCheckAccessDecisionCachePolicyChange(self):
+    lp = LogicalPermissions()
+    calls = []
+    def role_callback(role, context):
+      calls.append(role)
+      return role in context['user']['roles']
+    lp.addType('role', role_callback)
+    lp.setDecisionCache(DecisionCache(fingerprint = lambda context: tuple(context['user']['roles'])))
+    lp.setPolicies({'is_staff': {'role': ['admin', 'editor']}, 'is_writer': {'role': 'writer'}})
+    staff_permissions = lp.compile({'POLICY': 'is_staff'})
+    writer_permissions = lp.compile({'POLICY': 'is_writer'})
+    user = {'roles': ['editor']}
+    self.assertEqual(lp.checkAccessMany([staff_permissions, writer_permissions], {'user': user}), [True, False])
+    self.assertEqual(lp.getRequiredLeaves(staff_permissions)['leaves'], {'role': frozenset(['admin', 'editor'])})
+
+    # Only the decisions that evaluated the changed policy are discarded
+    lp.removePolicy('is_staff')
+    lp.addPolicy('is_staff', {'role': 'admin'})
+    self.assertEqual(lp.getStatistics()['decision_cache']['invalidations'], 1)
+    del calls[:]
+    self.assertEqual(lp.checkAccessMany([staff_permissions, writer_permissions], {'user': user}), [False, False])
+    self.assertEqual(calls, ['admin'])
+    self.assertEqual(lp.getRequiredLeaves(staff_permissions)['leaves'], {'role': frozenset(['admin'])})
+
+    lp.setPolicies({'is_staff': {'role': 'admin'}, 'is_writer': {'role': 'editor'}})
+    self.assertEqual(lp.getStatistics()['decision_cache']['invalidations'], 2)
+    self.assertEqual(lp.checkAccessMany([staff_permissions, writer_permissions], {'user': user}), [False, True])
+
   # ------------LogicalPermissions:getValidPermissionKeys()------------
 
   def testGetValidPermissionKeys(self):
     lp = LogicalPermissions()
-    self.assertEqual(sorted(lp.getValidPermissionKeys()), sorted(['NO_BYPASS', 'AND', 'NAND', 'OR', 'NOR', 'XOR', 'NOT', 'TRUE', 'FALSE']))
+    self.assertEqual(sorted(lp.getValidPermissionKeys()), sorted(['NO_BYPASS', 'AND', 'NAND', 'OR', 'NOR', 'XOR', 'NOT', 'TRUE', 'FALSE', 'POLICY']))
     def flag_callback(flag, context):
       access = False
       if flag is 'testflag':
@@ -236,7 +898,7 @@ class LogicalPermissionsTest(unittest.TestCase):
       'misc': misc_callback,
     }
     lp.setTypes(types)
-    self.assertEqual(sorted(lp.getValidPermissionKeys()), sorted(['NO_BYPASS', 'AND', 'NAND', 'OR', 'NOR', 'XOR', 'NOT', 'TRUE', 'FALSE', 'flag', 'role', 'misc']))
+    self.assertEqual(sorted(lp.getValidPermissionKeys()), sorted(['NO_BYPASS', 'AND', 'NAND', 'OR', 'NOR', 'XOR', 'NOT', 'TRUE', 'FALSE', 'POLICY', 'flag', 'role', 'misc']))
 
   # ------------LogicalPermissions::checkAccess()---------------
 
@@ -1724,5 +2386,1211 @@ class LogicalPermissionsTest(unittest.TestCase):
     user['roles'] = ['admin', 'writer']
     self.assertTrue(lp.checkAccess(permissions, {'user': user}))
 
+  def testCheckAccessPolicyUnregisteredPolicy(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PolicyNotRegisteredException):
+      lp.checkAccess({'POLICY': 'test'})
+
+  def testCheckAccessPolicyIllegalDescendant(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: True)
+    lp.addPolicy('test', True)
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.checkAccess({'role': {'POLICY': 'test'}})
+
+  def testCheckAccessPolicy(self):
+    lp = LogicalPermissions()
+    calls = []
+    def role_callback(role, context):
+      calls.append(role)
+      return role in context['user']['roles']
+    lp.addType('role', role_callback)
+    lp.addPolicy('is_staff', {'role': ['admin', 'editor']})
+    lp.addPolicy('is_writer', {'AND': {'POLICY': 'is_staff', 'role': 'writer'}})
+
+    permissions = {
+      'NO_BYPASS': {
+        'POLICY': 'is_staff',
+      },
+      'OR': [
+        {'policy': {'AND': ['is_staff', 'is_writer']}},
+        {'NOT': {'POLICY': 'is_staff'}},
+      ],
+    }
+    self.assertFalse(lp.checkAccess(permissions, {'user': {'roles': ['editor']}}))
+    self.assertEqual(calls, ['admin', 'editor', 'writer'])
+    self.assertTrue(lp.checkAccess(permissions, {'user': {'roles': ['editor', 'writer']}}))
+    self.assertTrue(lp.checkAccess(permissions, {'user': {'roles': []}}))
+
+  def testCheckAccessCompiledDeepTree(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: flag in context['flags'])
+    permissions = {'flag': 'leaf'}
+    for level in range(sys.getrecursionlimit() * 2):
+      if level % 2:
+        permissions = {'AND': [{'flag': 'granted'}, {'OR': [permissions, {'flag': 'denied{0}'.format(level)}]}]}
+      else:
+        permissions = {'NOT': {'NOR': [{'flag': 'denied{0}'.format(level)}, permissions]}}
+    compiled = lp.compile(permissions)
+    self.assertIs(lp.compile(permissions), compiled)
+    self.assertTrue(lp.checkAccess(compiled, {'flags': ['granted', 'leaf']}))
+    self.assertFalse(lp.checkAccess(compiled, {'flags': ['granted']}))
+    self.assertEqual(len(lp.getRequiredLeaves(compiled)['leaves']['flag']), sys.getrecursionlimit() * 2 + 2)
+
+  def testCheckAccessTypeTimeout(self):
+    lp = LogicalPermissions()
+    released = threading.Event()
+    self.addCleanup(released.set)
+    calls = []
+    def flag_callback(flag, context):
+      calls.append(flag)
+      if flag == 'slow':
+        released.wait(5)
+      return flag in context['user']['flags']
+    lp.addType('flag', flag_callback)
+    lp.addType('role', lambda role, context: role in context['user']['roles'])
+    lp.setBypassCallback(lambda context: True)
+    user = {'flags': ['fast', 'slow'], 'roles': ['editor']}
+
+    lp.setTypeTimeout('flag', 0.01)
+    self.assertTrue(lp.checkAccess({'flag': 'fast'}, {'user': user}, False))
+    self.assertFalse(lp.checkAccess({'flag': 'slow'}, {'user': user}, False))
+    lp.setTypeTimeout('flag', 0.01, 'allow')
+    self.assertTrue(lp.checkAccess({'flag': ['slow', 'other']}, {'user': user}, False))
+    lp.setTypeTimeout('flag', 0.01, 'raise')
+    with self.assertRaises(PermissionTimeoutException):
+      lp.checkAccess({'flag': 'slow'}, {'user': user}, False)
+    self.assertEqual(lp.getStatistics()['timeouts'], {'flag': 3})
+
+    # The callbacks that timed out keep their worker threads busy, and once all of them are the fallback is used right away
+    lp.setTypeTimeout('flag', 0.01)
+    while lp.getStatistics()['callback_pools']['flag']['abandoned'] < 4:
+      lp.checkAccess({'flag': 'slow'}, {'user': user}, False)
+    del calls[:]
+    self.assertFalse(lp.checkAccess({'flag': 'fast'}, {'user': user}, False))
+    self.assertEqual(calls, [])
+    self.assertEqual(lp.getStatistics()['callback_pools']['flag'], {'workers': 4, 'idle': 0, 'abandoned': 4})
+    released.set()
+    while lp.getStatistics()['callback_pools']['flag']['abandoned']:
+      time.sleep(0.001)
+    released.clear()
+    self.assertTrue(lp.checkAccess({'flag': 'fast'}, {'user': user}, False))
+    self.assertEqual(lp.getStatistics()['callback_pools']['flag']['workers'], 4)
+
+    # An unknown permission doesn't matter if the other children decide the logic gate
+    lp.setTypeTimeout('flag', 0.01, 'unknown')
+    self.assertTrue(lp.checkAccess(lp.compile({'XOR': [{'flag': 'slow'}, {'flag': 'fast'}, {'role': 'admin'}]}), {'user': user}, False))
+    self.assertTrue(lp.checkAccess({'OR': [{'flag': 'slow'}, {'role': 'editor'}]}, {'user': user}, False))
+    self.assertFalse(lp.checkAccess({'AND': [{'flag': 'slow'}, {'role': 'admin'}]}, {'user': user}, False))
+    self.assertFalse(lp.checkAccess({'AND': [{'flag': 'slow'}, {'role': 'editor'}]}, {'user': user}, False))
+    self.assertFalse(lp.checkAccess({'NOT': {'AND': [{'flag': 'slow'}, {'role': 'editor'}]}}, {'user': user}, False))
+    self.assertTrue(lp.checkAccess({'NO_BYPASS': {'role': 'admin'}, 'flag': 'slow'}, {'user': user}))
+    self.assertFalse(lp.checkAccess({'NO_BYPASS': {'flag': 'slow'}, 'role': 'admin'}, {'user': user}))
+
+    # Decisions that used a fallback are not cached
+    lp.setDecisionCache(DecisionCache(fingerprint = lambda context: 1))
+    compiled = lp.compile({'OR': [{'flag': 'slow'}, {'role': 'editor'}]})
+    self.assertTrue(lp.checkAccess(compiled, {'user': user}, False))
+    self.assertEqual(lp.getDecisionCache().getStatistics()['size'], 0)
+
+  def testCheckAccessEvaluationTimeout(self):
+    lp = LogicalPermissions()
+    released = threading.Event()
+    self.addCleanup(released.set)
+    calls = []
+    def flag_callback(flag, context):
+      calls.append(flag)
+      if flag == 'slow':
+        released.wait(5)
+      return True
+    lp.addType('flag', flag_callback)
+    lp.setEvaluationTimeout(0.05)
+    self.assertTrue(lp.checkAccess({'flag': 'fast'}))
+    # Once the deadline has passed the remaining callbacks are not called
+    self.assertFalse(lp.checkAccess({'OR': [{'flag': 'slow'}, {'flag': 'fast'}]}))
+    self.assertEqual(calls, ['fast', 'slow'])
+    lp.setEvaluationTimeout(0.05, 'raise')
+    with self.assertRaises(PermissionTimeoutException):
+      lp.checkAccess(lp.compile({'flag': ['slow', 'fast']}))
+
+  def testCheckAccessTiering(self):
+    lp = LogicalPermissions()
+    calls = []
+    def role_callback(role, context):
+      calls.append(role)
+      return role in context['user']['roles']
+    lp.addType('role', role_callback)
+    lp.setBypassCallback(lambda context: context['user'].get('bypass', False))
+    lp.setTieringThresholds(compile_threshold = 2, generate_threshold = 1)
+    permissions = {
+      'NO_BYPASS': {'role': 'blocked'},
+      'OR': [
+        {'AND': [{'role': 'editor'}, {'NOT': {'role': 'guest'}}]},
+        {'XOR': [{'role': 'writer'}, {'role': 'reviewer'}]},
+        {'NOR': [{'role': 'editor'}, {'role': 'writer'}]},
+      ],
+    }
+    users = [
+      {'roles': ['editor']},
+      {'roles': ['editor', 'guest', 'writer']},
+      {'roles': ['writer', 'reviewer']},
+      {'roles': ['reviewer', 'guest']},
+      {'roles': ['blocked', 'writer', 'reviewer'], 'bypass': True},
+      {'roles': ['guest'], 'bypass': True},
+    ]
+    expected = [True, True, False, True, False, True]
+    tiers = [
+      {'interpreted': 1, 'compiled': 0, 'generated': 0},
+      {'interpreted': 1, 'compiled': 0, 'generated': 0},
+      {'interpreted': 0, 'compiled': 1, 'generated': 0},
+      {'interpreted': 0, 'compiled': 0, 'generated': 1},
+      {'interpreted': 0, 'compiled': 0, 'generated': 1},
+      {'interpreted': 0, 'compiled': 0, 'generated': 1},
+    ]
+    compiled = lp.compile(permissions)
+    for user, access, tier in zip(users, expected, tiers):
+      self.assertEqual(lp.checkAccess(permissions, {'user': user}), access)
+      self.assertEqual(lp.getStatistics()['tiers'], tier)
+
+      # The compiled and generated tiers call the same callbacks as the evaluation of the compiled permission tree
+      if tier['interpreted'] == 0:
+        tiered_calls = list(calls)
+        del calls[:]
+        reference = LogicalPermissions()
+        reference.addType('role', role_callback)
+        reference.setBypassCallback(lp.getBypassCallback())
+        reference.checkAccess(reference.compile(permissions), {'user': user})
+        self.assertEqual(tiered_calls, calls)
+      del calls[:]
+
+    # Compiled permission trees that are passed directly skip the interpreted tier
+    other = lp.compile({'role': ['admin', 'editor']})
+    lp.checkAccess(other, {'user': users[0]})
+    self.assertEqual(lp.getStatistics()['tiers'], {'interpreted': 0, 'compiled': 1, 'generated': 1})
+
+    # A hot permission tree object that is changed is recognized as a different permission tree
+    hot = {'role': ['admin', 'writer']}
+    for i in range(5):
+      self.assertFalse(lp.checkAccess(hot, {'user': users[0]}))
+    hot['role'].append('editor')
+    self.assertTrue(lp.checkAccess(hot, {'user': users[0]}))
+    hot['role'] = 'writer'
+    self.assertFalse(lp.checkAccess(hot, {'user': users[0]}))
+
+    # Permission trees that the interpreter accepts but that can't be compiled stay interpreted
+    lp.setTieringThresholds(compile_threshold = 0)
+    self.assertTrue(lp.checkAccess({'OR': [True, {'role': {'AND': []}}]}, {'user': users[0]}))
+    self.assertEqual(lp.getStatistics()['tiers'], {'interpreted': 1, 'compiled': 0, 'generated': 0})
+
+    # Permission trees that compare equal but differ in the types of their values are counted separately
+    self.assertTrue(lp.checkAccess({'OR': [True, {'role': 'editor'}]}, {'user': users[0]}))
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.checkAccess({'OR': [1, {'role': 'editor'}]}, {'user': users[0]})
+    self.assertEqual(lp.getStatistics()['tiers'], {'interpreted': 2, 'compiled': 1, 'generated': 0})
+
+  def testCheckAccessTieringChildOrder(self):
+    lp = LogicalPermissions()
+    calls = []
+    def role_callback(role, context):
+      calls.append(role)
+      return role in context['roles']
+    lp.addType('role', role_callback)
+    lp.setTieringThresholds(compile_threshold = 2)
+    # An equivalent permission tree with the children in a different order is compiled first
+    lp.compile({'OR': [{'POLICY': 'later'}, True]})
+    lp.compile({'AND': [{'role': 'writer'}, {'role': 'editor'}]})
+
+    # The results and the called callbacks are the same before and after the permission trees are promoted
+    results = []
+    for i in range(4):
+      results.append((lp.checkAccess({'OR': [True, {'POLICY': 'later'}]}), lp.checkAccess({'AND': [{'role': 'editor'}, {'role': 'writer'}]}, {'roles': []}), list(calls)))
+      del calls[:]
+    self.assertEqual(results, [(True, False, ['editor'])] * 4)
+    self.assertEqual(lp.getStatistics()['tiers'], {'interpreted': 0, 'compiled': 2, 'generated': 0})
+
+  def testCheckAccessTieringEviction(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: role in context['roles'])
+    lp.setTieringThresholds(compile_threshold = 1)
+    hot = {'role': ['admin', 'editor']}
+    for i in range(2):
+      self.assertTrue(lp.checkAccess(hot, {'roles': ['editor']}))
+    self.assertEqual(lp.getStatistics()['tiers'], {'interpreted': 0, 'compiled': 1, 'generated': 0})
+
+    # When the table of counted permission trees is full, only the least recently evaluated permission trees are evicted
+    for index in range(20000):
+      self.assertFalse(lp.checkAccess({'role': 'role{0}'.format(index)}, {'roles': ['editor']}))
+      if index % 1000 == 0:
+        self.assertTrue(lp.checkAccess(hot, {'roles': ['editor']}))
+    self.assertEqual(lp.getStatistics()['tiers'], {'interpreted': 9999, 'compiled': 1, 'generated': 0})
+
+  def testCheckAccessTieringLargeTree(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: flag in context['flags'])
+    lp.setTieringThresholds(generate_threshold = 0)
+    permissions = {'flag': 'f0'}
+    for index in range(1, 100):
+      permissions = {'AND': [permissions, {'NOT': {'flag': 'f{0}'.format(index)}}]}
+    compiled = lp.compile(permissions)
+    self.assertTrue(lp.checkAccess(compiled, {'flags': ['f0']}))
+    self.assertFalse(lp.checkAccess(compiled, {'flags': ['f0', 'f50']}))
+    # Permission trees that are too deep for generated code keep being evaluated by walking their nodes
+    self.assertEqual(lp.getStatistics()['tiers'], {'interpreted': 0, 'compiled': 1, 'generated': 0})
+
+  def testCheckAccessTreeLimits(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: True)
+    lp.addType('flag', lambda flag, context: True)
+    lp.setTreeLimits(max_nodes = 5)
+    self.assertTrue(lp.checkAccess({'role': ['a', 'b', 'c']}))
+    # Identical subtrees are only counted once
+    self.assertTrue(lp.checkAccess({'role': {'OR': [{'AND': ['a', 'b']}, {'NOT': {'AND': ['b', 'a']}}]}}))
+    with self.assertRaises(PermissionLimitExceededException):
+      lp.checkAccess({'role': ['a', 'b', 'c', 'd', 'e']})
+
+    lp.setTreeLimits(max_depth = 3)
+    self.assertFalse(lp.checkAccess({'role': {'NOT': {'AND': ['a', 'b']}}}))
+    with self.assertRaises(PermissionLimitExceededException):
+      lp.compile({'AND': [{'role': 'a'}, {'NOT': {'AND': [{'role': 'b'}, {'flag': 'c'}]}}]})
+
+    lp.setTreeLimits(max_leaves_per_type = 2)
+    self.assertTrue(lp.checkAccess({'role': ['a', 'b'], 'flag': ['c', 'd']}))
+    with self.assertRaises(PermissionLimitExceededException):
+      lp.checkAccess({'role': ['a', 'b', 'c']})
+    with self.assertRaises(InvalidPermissionTreeException) as cm:
+      lp.validate({'role': ['a', 'b', 'c']})
+    self.assertIsInstance(cm.exception.errors[0], PermissionLimitExceededException)
+
+    # Permission trees are rejected as soon as they exceed a limit while being compiled, and the rejection is remembered
+    consumed = []
+    class ConsumedList(list):
+      def __iter__(self):
+        for item in list.__iter__(self):
+          consumed.append(item)
+          yield item
+    permissions = {'role': ConsumedList('role{0}'.format(index) for index in range(1000))}
+    with self.assertRaises(PermissionLimitExceededException):
+      lp.compile(permissions)
+    self.assertEqual(len(consumed), 3)
+    with self.assertRaises(PermissionLimitExceededException):
+      lp.checkAccess(permissions)
+    self.assertEqual(len(consumed), 3)
+
+    # Each policy is checked separately when it is evaluated
+    lp.addPolicy('big', {'role': ['a', 'b', 'c']})
+    self.assertEqual(lp.compile({'POLICY': 'big'}).getMemoryFootprint()['nodes'], 1)
+    with self.assertRaises(PermissionLimitExceededException):
+      lp.checkAccess({'POLICY': 'big'})
+    lp.setTreeLimits()
+    self.assertTrue(lp.checkAccess({'POLICY': 'big'}))
+
+  def testCheckAccessEvaluationBudget(self):
+    lp = LogicalPermissions()
+    now = [0]
+    calls = []
+    def flag_callback(flag, context):
+      calls.append(flag)
+      if flag == 'slow':
+        now[0] += 2
+      return True
+    lp.addType('flag', flag_callback)
+    lp.setBypassCallback(lambda context: False)
+    lp.setEvaluationBudget(max_callbacks = 2)
+    self.assertTrue(lp.checkAccess({'flag': {'AND': ['a', 'b']}}))
+    with self.assertRaises(PermissionLimitExceededException):
+      lp.checkAccess({'flag': {'AND': ['a', 'b', 'c']}})
+    self.assertEqual(calls, ['a', 'b', 'a', 'b'])
+
+    # Results that are shared within an evaluation are only counted once, and checkAccessMany() has a single budget
+    self.assertEqual(lp.checkAccessMany([{'flag': 'a'}, {'flag': ['a', 'b']}]), [True, True])
+    with self.assertRaises(PermissionLimitExceededException):
+      lp.checkAccessMany([{'flag': 'a'}, {'flag': 'b'}, {'flag': 'c'}])
+
+    lp.setEvaluationBudget(max_time = 1, clock = lambda: now[0])
+    self.assertTrue(lp.checkAccess({'flag': {'AND': ['a', 'b', 'c']}}))
+    with self.assertRaises(PermissionLimitExceededException):
+      lp.checkAccess({'flag': {'AND': ['slow', 'a']}})
+    with self.assertRaises(PermissionLimitExceededException):
+      lp.checkAccess({'AND': [{'flag': 'slow'}, {'NOT': {'flag': {'AND': ['a', 'b']}}}]})
+
+    # Permissions whose circuit breaker is open don't count as callback calls
+    lp.addType('role', lambda role, context: True)
+    breaker = CircuitBreaker(failure_threshold = 1, clock = lambda: now[0])
+    breaker.allowCall()
+    breaker.recordFailure()
+    lp.setTypeCircuitBreaker('role', breaker)
+    lp.setEvaluationBudget(max_callbacks = 2)
+    del calls[:]
+    self.assertTrue(lp.checkAccess({'OR': [{'role': ['admin', 'editor', 'writer']}, {'flag': {'AND': ['a', 'b']}}]}))
+    self.assertEqual(calls, ['a', 'b'])
+
+  def testCheckAccessCircuitBreaker(self):
+    lp = LogicalPermissions()
+    now = [0]
+    calls = []
+    def flag_callback(flag, context):
+      calls.append(flag)
+      if context['down']:
+        raise RuntimeError('The flag service is down.')
+      return flag in context['flags']
+    lp.addType('flag', flag_callback)
+    lp.addType('role', lambda role, context: role in context['roles'])
+    breaker = CircuitBreaker(failure_threshold = 2, reset_timeout = 10, clock = lambda: now[0])
+    lp.setTypeCircuitBreaker('flag', breaker)
+    down = {'down': True, 'flags': ['beta'], 'roles': ['editor']}
+    up = {'down': False, 'flags': ['beta'], 'roles': ['editor']}
+
+    for i in range(2):
+      with self.assertRaises(RuntimeError):
+        lp.checkAccess({'flag': 'beta'}, down)
+    self.assertEqual(breaker.getState(), 'open')
+
+    # While the circuit breaker is open the callback isn't called
+    self.assertFalse(lp.checkAccess({'flag': 'beta'}, up))
+    self.assertTrue(lp.checkAccess({'OR': [{'flag': 'beta'}, {'role': 'editor'}]}, up))
+    self.assertEqual(calls, ['beta', 'beta'])
+
+    # A successful probe closes the circuit breaker
+    now[0] = 10
+    self.assertTrue(lp.checkAccess({'flag': 'beta'}, up))
+    self.assertEqual(breaker.getState(), 'closed')
+    self.assertEqual(lp.getStatistics()['circuit_breakers'], {'flag': {'calls': 3, 'failures': 2, 'rejections': 2, 'trips': 1, 'state': 'closed', 'consecutive_failures': 0}})
+
+    breaker = CircuitBreaker(failure_threshold = 1, fallback = 'raise', clock = lambda: now[0])
+    lp.setTypeCircuitBreaker('flag', breaker)
+    with self.assertRaises(RuntimeError):
+      lp.checkAccess({'flag': 'beta'}, down)
+    with self.assertRaises(CircuitBreakerOpenException):
+      lp.checkAccess({'flag': 'beta'}, up)
+
+    # The 'unknown' fallback lets the other children decide the logic gate
+    lp.setTypeCircuitBreaker('flag', CircuitBreaker(failure_threshold = 1, fallback = 'unknown', clock = lambda: now[0]))
+    with self.assertRaises(RuntimeError):
+      lp.checkAccess({'flag': 'beta'}, down)
+    self.assertFalse(lp.checkAccess({'NOT': {'flag': 'beta'}}, up))
+    self.assertTrue(lp.checkAccess({'OR': [{'flag': 'beta'}, {'role': 'editor'}]}, up))
+
+    # Decisions that used a fallback are not cached
+    lp.setDecisionCache(DecisionCache(fingerprint = lambda context: 1))
+    self.assertTrue(lp.checkAccess(lp.compile({'OR': [{'flag': 'beta'}, {'role': 'editor'}]}), up))
+    self.assertEqual(lp.getDecisionCache().getStatistics()['size'], 0)
+
+  def testCheckAccessCircuitBreakerLatency(self):
+    lp = LogicalPermissions()
+    now = [0]
+    def flag_callback(flag, context):
+      now[0] += context['latency']
+      return True
+    lp.addType('flag', flag_callback)
+    breaker = CircuitBreaker(failure_threshold = 2, latency_threshold = 1, clock = lambda: now[0])
+    lp.setTypeCircuitBreaker('flag', breaker)
+    self.assertTrue(lp.checkAccess({'flag': 'beta'}, {'latency': 2}))
+    self.assertTrue(lp.checkAccess({'flag': 'beta'}, {'latency': 0.5}))
+    self.assertTrue(lp.checkAccess({'flag': 'beta'}, {'latency': 2}))
+    self.assertEqual(breaker.getState(), 'closed')
+    self.assertTrue(lp.checkAccess({'flag': 'beta'}, {'latency': 2}))
+    self.assertEqual(breaker.getState(), 'open')
+    self.assertFalse(lp.checkAccess({'flag': 'beta'}, {'latency': 0}))
+
+  def testCheckAccessCompiled(self):
+    lp = LogicalPermissions()
+    def role_callback(role, context):
+      return role in context['user']['roles']
+    lp.addType('role', role_callback)
+    lp.setBypassCallback(lambda context: context['user'].get('bypass', False))
+    lp.addPolicy('is_staff', {'role': ['admin', 'editor']})
+    permissions_list = [
+      {},
+      True,
+      'FALSE',
+      [False],
+      {'role': 'admin'},
+      {'role': {'AND': ['admin', 'editor']}},
+      {'role': {'NAND': ['admin', 'editor']}},
+      {'role': {'NOR': {0: 'admin', 1: 'editor'}}},
+      {'role': {'XOR': ['admin', 'editor', 'writer']}},
+      {'role': {'NOT': 'admin'}},
+      {'NOT': {'POLICY': 'is_staff'}},
+      {'NO_BYPASS': {'role': 'admin'}, 'role': 'editor'},
+      {'no_bypass': 'TRUE', 0: False},
+      {'OR': [{'AND': {'role': 'admin', 'POLICY': 'is_staff'}}, {'NAND': [{'role': 'writer'}, True]}]},
+    ]
+    roles_list = [[], ['admin'], ['editor'], ['admin', 'editor'], ['writer'], ['admin', 'editor', 'writer']]
+    for permissions in permissions_list:
+      compiled = lp.compile(permissions)
+      for roles in roles_list:
+        for bypass in [False, True]:
+          context = {'user': {'roles': roles, 'bypass': bypass}}
+          self.assertEqual(lp.checkAccess(compiled, context), lp.checkAccess(permissions, context))
+          self.assertEqual(lp.checkAccess(compiled, context, False), lp.checkAccess(permissions, context, False))
+
+  def testCheckAccessLazyContext(self):
+    lp = LogicalPermissions()
+    loads = []
+    def loader(key, value):
+      def load(context):
+        loads.append(key)
+        return value
+      return load
+    lp.addType('role', lambda role, context: role in context['user']['roles'])
+    lp.addType('flag', lambda flag, context: context['document'].get(flag, False))
+    lp.setBypassCallback(lambda context: context['user'].get('superuser', False))
+    context = LazyContext(loaders = {'user': loader('user', {'roles': ['editor']}), 'document': loader('document', {'is_public': True})})
+    self.assertTrue(lp.checkAccess({'role': 'editor'}, context))
+    self.assertEqual(loads, ['user'])
+
+    base_context = LazyContext(loaders = {'user': loader('user', {'roles': ['editor']})})
+    items = [{'published': True}, {'published': False}]
+    lp.addType('published', lambda value, context: context['item']['published'])
+    self.assertEqual(list(lp.filter(lambda item: {'AND': {'role': 'editor', 'published': 'yes'}}, items, base_context, ['role'])), items[:1])
+    self.assertEqual(loads, ['user', 'user'])
+
+  # ------------LogicalPermissions::compile()---------------
+
+  def testCompileParamPermissionsWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.compile(permissions = 50)
+
+  def testCompileParamPermissionsUnregisteredType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PermissionTypeNotRegisteredException):
+      lp.compile(permissions = {'OR': [True, {'flag': 'testflag'}]})
+
+  def testCompileParamPermissionsNestedTypes(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: True)
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.compile(permissions = {'flag': {'OR': {'flag': 'testflag'}}})
+
+  def testCompileSharedSubtrees(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: True)
+    lp.addType('role', lambda role, context: True)
+    compiled1 = lp.compile({'OR': {'role': ['admin', 'editor'], 'flag': 'is_author'}})
+    compiled2 = lp.compile({'AND': [{'flag': 'is_author'}, {'role': {'or': ['editor', 'admin']}}]})
+    role_nodes1 = [child for child in compiled1.root.children if child.gate == 'OR']
+    role_nodes2 = [child for child in compiled2.root.children if child.gate == 'OR']
+    self.assertEqual(len(role_nodes1), 1)
+    self.assertIs(role_nodes1[0], role_nodes2[0])
+    compiled3 = lp.compile([{'flag': 'is_author'}, {'role': ['admin', 'editor']}])
+    self.assertIs(compiled1.root, compiled3.root)
+    self.assertIs(compiled1.root, lp.compile({'NO_BYPASS': True, 'role': ['editor', 'admin'], 'flag': 'is_author'}).root)
+
+  def testCompileInternedTrees(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: True)
+    lp.addType('role', lambda role, context: True)
+    compiled = lp.compile({'no_bypass': {'flag': 'is_locked'}, 'or': {'role': ['admin', 'editor'], 'flag': 'is_author'}})
+    self.assertIs(lp.compile({'NO_BYPASS': {'flag': 'is_locked'}, 'OR': {'role': ['admin', 'editor'], 'flag': 'is_author'}}), compiled)
+    compiled2 = lp.compile({'NO_BYPASS': {'flag': 'is_locked'}, 'OR': {'flag': 'is_author', 'role': ['editor', 'admin']}})
+    self.assertEqual(compiled2, compiled)
+    self.assertEqual(hash(compiled2), hash(compiled))
+    self.assertIs(compiled2.root, compiled.root)
+    compiled3 = lp.compile({'OR': {'flag': 'is_author', 'role': ['editor', 'admin']}})
+    self.assertNotEqual(compiled3, compiled)
+    self.assertIs(compiled3.root, compiled.root)
+    self.assertEqual(lp.getStatistics()['compiler']['trees'], 3)
+    lp.removeType('flag')
+    with self.assertRaises(PermissionTypeNotRegisteredException):
+      lp.compile({'no_bypass': {'flag': 'is_locked'}, 'or': {'role': ['admin', 'editor'], 'flag': 'is_author'}})
+
+  def testCompileMemoryFootprint(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: True)
+    compiled = lp.compile({'role': ['admin', ''.join(['edi', 'tor'])]})
+    self.assertFalse(hasattr(compiled.root, '__dict__'))
+    self.assertIn('editor', [child.value for child in compiled.root.children])
+    intern_string = sys.intern if hasattr(sys, 'intern') else intern
+    for child in compiled.root.children:
+      self.assertIs(child.value, intern_string(child.value))
+    footprint = compiled.getMemoryFootprint()
+    self.assertEqual(footprint['nodes'], 3)
+    self.assertGreater(footprint['bytes'], 0)
+    self.assertEqual(lp.compile({'NO_BYPASS': {'role': 'admin'}, 'role': ['admin', 'editor']}).getMemoryFootprint()['nodes'], 3)
+
+  # ------------LogicalPermissions::validate()---------------
+
+  def testValidateParamPermissionsWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.validate(permissions = 50)
+
+  def testValidate(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: True)
+    lp.addPolicy('is_staff', {'flag': 'is_staff'})
+    permissions = {
+      'NO_BYPASS': 'maybe',
+      'OR': [
+        {'flag': {'AND': ['testflag']}},
+        {'role': 'admin'},
+        {'XOR': [{'flag': 'testflag'}]},
+        {'POLICY': ['is_staff', 'is_admin']},
+        {'NOT': {'flag': True}},
+      ],
+    }
+    with self.assertRaises(InvalidPermissionTreeException) as context:
+      lp.validate(permissions)
+    errors = context.exception.errors
+    self.assertEqual([error.__class__ for error in errors], [
+      InvalidArgumentValueException,
+      PermissionTypeNotRegisteredException,
+      InvalidValueForLogicGateException,
+      InvalidArgumentValueException,
+      PolicyNotRegisteredException,
+    ])
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.compile(permissions)
+    compiled = lp.validate({'OR': [{'flag': 'testflag'}, {'POLICY': 'is_staff'}]})
+    self.assertIs(compiled, lp.compile({'OR': [{'flag': 'testflag'}, {'POLICY': 'is_staff'}]}))
+
+  # ------------LogicalPermissions::checkAccessTrusted()---------------
+
+  def testCheckAccessTrusted(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: context['user'].get(flag))
+    lp.addType('role', lambda role, context: role in context['user']['roles'])
+    lp.setBypassCallback(lambda context: context['user'].get('superuser'))
+    compiled = lp.validate({'NO_BYPASS': {'flag': 'never_bypass'}, 'OR': {'flag': 'is_author', 'role': 'editor'}})
+    self.assertTrue(lp.checkAccessTrusted(compiled, {'user': {'roles': ['editor']}}))
+    self.assertFalse(lp.checkAccessTrusted(compiled, {'user': {'roles': []}}))
+    self.assertEqual(lp.checkAccessTrusted(compiled, {'user': {'roles': [], 'is_author': 1}}), 1)
+    self.assertEqual(lp.checkAccessTrusted(compiled, {'user': {'roles': [], 'superuser': 1}}), True)
+    with self.assertRaises(InvalidCallbackReturnTypeException):
+      lp.checkAccess(compiled, {'user': {'roles': [], 'is_author': 1}})
+    lp.removeType('flag')
+    self.assertTrue(lp.checkAccessTrusted(compiled, {'user': {'roles': ['editor']}}))
+
+  # ------------LogicalPermissions::checkAccessGenerator()---------------
+
+  def runAccessCheckGenerator(self, generator, results, requests):
+    try:
+      request = next(generator)
+      while True:
+        requests.append(request)
+        request = generator.send(dict((leaf, leaf in results) for leaf in request))
+    except StopIteration as e:
+      self.assertIs(e.args[0], generator.result)
+      return e.args[0]
+
+  def testCheckAccessGeneratorUnregisteredType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PermissionTypeNotRegisteredException):
+      lp.checkAccessGenerator({'role': 'admin'})
+
+  def testCheckAccessGeneratorMissingResult(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: False)
+    generator = lp.checkAccessGenerator({'role': ['admin', 'editor']})
+    next(generator)
+    with self.assertRaises(InvalidArgumentValueException):
+      generator.send({})
+    generator = lp.checkAccessGenerator({'role': 'admin'})
+    next(generator)
+    with self.assertRaises(InvalidArgumentTypeException):
+      generator.send([True])
+
+  def testCheckAccessGeneratorUnknown(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: False)
+    lp.addType('flag', lambda flag, context: False)
+    lp.setBypassCallback(lambda context: True)
+    def run(permissions, results, allow_bypass = True):
+      generator = lp.checkAccessGenerator(permissions, {}, allow_bypass)
+      try:
+        request = next(generator)
+        while True:
+          request = generator.send(dict((leaf, results.get(leaf, False)) for leaf in request))
+      except StopIteration as e:
+        return e.args[0]
+
+    # An unknown permission is not negated into a grant
+    results = {('role', 'r'): True, ('flag', 'banned'): UNKNOWN}
+    self.assertFalse(run({'AND': [{'role': 'r'}, {'NOT': {'flag': 'banned'}}]}, results, False))
+    self.assertTrue(run({'OR': [{'NOT': {'flag': 'banned'}}, {'role': 'r'}]}, results, False))
+    self.assertFalse(run({'XOR': [{'flag': 'banned'}, {'role': 'r'}]}, results, False))
+    self.assertTrue(run({'XOR': [{'flag': 'banned'}, {'role': 'r'}, {'role': 'w'}]}, results, False))
+    self.assertFalse(run({'NO_BYPASS': {'NOT': {'flag': 'banned'}}, 'role': 'w'}, results))
+    self.assertTrue(run({'NO_BYPASS': {'AND': [{'flag': 'banned'}, {'role': 'w'}]}, 'role': 'w'}, results))
+
+    # The permissions of a universe that are requested together are evaluated in three-valued logic
+    lp.setTypeUniverse('role', ['admin', 'editor'], lambda context: [])
+    lp.setTruthTableBitLimit(limit = 0)
+    results = {('role', 'admin'): UNKNOWN, ('role', 'editor'): True}
+    self.assertFalse(run({'role': {'NOT': {'AND': ['admin', 'editor']}}}, results, False))
+    self.assertTrue(run({'role': ['admin', 'editor']}, results, False))
+
+  def testCheckAccessGenerator(self):
+    lp = LogicalPermissions()
+    calls = []
+    def flag_callback(flag, context):
+      calls.append(flag)
+      return False
+    lp.addType('role', flag_callback)
+    lp.addType('flag', flag_callback)
+    lp.setBypassCallback(lambda context: context['user'].get('bypass', False))
+    lp.addPolicy('is_staff', {'role': ['admin', 'editor']})
+    permissions = {
+      'NO_BYPASS': {'flag': 'never_bypass'},
+      'AND': [
+        {'POLICY': 'is_staff'},
+        {'OR': [{'flag': 'is_author'}, {'role': {'NOT': 'editor'}}]},
+      ],
+    }
+
+    requests = []
+    self.assertTrue(self.runAccessCheckGenerator(lp.checkAccessGenerator(permissions, {'user': {}}), [('role', 'editor'), ('flag', 'is_author')], requests))
+    # The permissions are requested in evaluation order, and the result for the editor role is reused
+    self.assertEqual(requests, [frozenset([('flag', 'never_bypass')]), frozenset([('role', 'admin')]), frozenset([('role', 'editor')]), frozenset([('flag', 'is_author')])])
+    del requests[:]
+    self.assertFalse(self.runAccessCheckGenerator(lp.checkAccessGenerator(lp.compile(permissions), {'user': {}}), [('role', 'admin'), ('role', 'editor')], requests))
+    self.assertEqual(len(requests), 4)
+    del requests[:]
+    self.assertTrue(self.runAccessCheckGenerator(lp.checkAccessGenerator(permissions, {'user': {'bypass': True}}), [], requests))
+    self.assertEqual(requests, [frozenset([('flag', 'never_bypass')])])
+    del requests[:]
+    self.assertFalse(self.runAccessCheckGenerator(lp.checkAccessGenerator(permissions, {'user': {'bypass': True}}), [('flag', 'never_bypass')], requests))
+    self.assertEqual(len(requests), 3)
+    self.assertTrue(self.runAccessCheckGenerator(lp.checkAccessGenerator(True, {'user': {}}), [], requests))
+    self.assertEqual(calls, [])
+
+    # The permissions of a universe that are compared with a bitmask are requested together
+    lp.setTypeUniverse('role', ['admin', 'editor', 'writer'], lambda context: [])
+    lp.setTruthTableBitLimit(limit = 0)
+    del requests[:]
+    self.assertTrue(self.runAccessCheckGenerator(lp.checkAccessGenerator({'role': {'AND': ['editor', 'writer']}}, {'user': {}}), [('role', 'editor'), ('role', 'writer')], requests))
+    self.assertEqual(requests, [frozenset([('role', 'editor'), ('role', 'writer')])])
+    lp.setTruthTableBitLimit(limit = 8)
+    del requests[:]
+    self.assertTrue(self.runAccessCheckGenerator(lp.checkAccessGenerator([{'role': {'XOR': ['editor', 'writer']}}, {'flag': 'is_author'}], {'user': {}}), [('role', 'editor')], requests))
+    self.assertEqual(requests, [frozenset([('role', 'editor'), ('role', 'writer')])])
+    self.assertEqual(calls, [])
+
+  # ------------LogicalPermissions::checkAccessMany()---------------
+
+  def testCheckAccessManyParamPermissionsListWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.checkAccessMany(permissions_list = {})
+
+  def testCheckAccessMany(self):
+    lp = LogicalPermissions()
+    calls = []
+    def role_callback(role, context):
+      calls.append(role)
+      return role in context['user']['roles']
+    lp.addType('role', role_callback)
+    bypass_calls = []
+    def bypass_callback(context):
+      bypass_calls.append(context)
+      return False
+    lp.setBypassCallback(bypass_callback)
+    lp.addPolicy('is_staff', {'role': ['admin', 'editor']})
+    permissions_list = [
+      {'POLICY': 'is_staff'},
+      {'AND': [{'role': ['editor', 'admin']}, {'role': 'writer'}]},
+      lp.compile({'role': {'NOT': 'writer'}}),
+      {'NO_BYPASS': True, 'OR': [{'role': 'sales'}, {'POLICY': 'is_staff'}]},
+    ]
+    result = lp.checkAccessMany(permissions_list, {'user': {'roles': ['editor']}})
+    self.assertEqual(result, [True, False, True, True])
+    self.assertEqual(sorted(calls), ['editor', 'sales', 'writer'])
+    self.assertEqual(len(bypass_calls), 1)
+
+  # ------------LogicalPermissions::partialEvaluate()---------------
+
+  def testPartialEvaluateParamKnownTypesUnregisteredType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PermissionTypeNotRegisteredException):
+      lp.partialEvaluate(permissions = True, known_types = ['role'])
+
+  def testPartialEvaluate(self):
+    lp = LogicalPermissions()
+    role_calls = []
+    def role_callback(role, context):
+      role_calls.append(role)
+      return role in context['user']['roles']
+    def owner_callback(field, context):
+      return context['document'][field] == context['user']['id']
+    lp.addType('role', role_callback)
+    lp.addType('owner', owner_callback)
+    lp.addPolicy('is_staff', {'role': ['admin', 'editor']})
+    permissions_list = [
+      {'role': 'admin'},
+      {'owner': 'author_id'},
+      {'OR': {'POLICY': 'is_staff', 'owner': 'author_id'}},
+      {'AND': {'POLICY': 'is_staff', 'owner': 'author_id'}},
+      {'NAND': {'role': 'writer', 'owner': ['author_id', 'editor_id']}},
+      {'NOR': {'role': 'writer', 'owner': 'author_id'}},
+      {'XOR': {'role': 'writer', 'owner': 'author_id'}},
+      {'XOR': [{'role': 'writer'}, {'role': 'admin'}, {'owner': 'author_id'}, {'owner': 'editor_id'}]},
+      {'NOT': {'AND': {'role': {'NOT': 'writer'}, 'owner': 'author_id'}}},
+      {'NO_BYPASS': {'OR': {'role': 'writer', 'owner': 'editor_id'}}, 'owner': 'author_id'},
+    ]
+    users = [{'id': 1, 'roles': []}, {'id': 1, 'roles': ['admin']}, {'id': 1, 'roles': ['writer']}, {'id': 1, 'roles': ['admin', 'writer']}]
+    documents = [{'author_id': 1, 'editor_id': 1}, {'author_id': 1, 'editor_id': 2}, {'author_id': 2, 'editor_id': 1}, {'author_id': 2, 'editor_id': 2}]
+    for permissions in permissions_list:
+      for user in users:
+        residual = lp.partialEvaluate(permissions, {'user': user}, ['role'])
+        for document in documents:
+          context = {'user': user, 'document': document}
+          del role_calls[:]
+          access = lp.checkAccess(residual, context)
+          self.assertEqual(role_calls, [])
+          self.assertEqual(access, lp.checkAccess(permissions, context))
+
+    residual = lp.partialEvaluate({'OR': {'POLICY': 'is_staff', 'owner': 'author_id'}}, {'user': users[1]}, ['role'])
+    self.assertEqual(residual.root.gate, 'TRUE')
+    residual = lp.partialEvaluate({'AND': {'POLICY': 'is_staff', 'owner': 'author_id'}}, {'user': users[1]}, ['role'])
+    self.assertEqual(residual.root.gate, 'LEAF')
+    self.assertEqual(residual.root.value, 'author_id')
+    residual = lp.partialEvaluate({'XOR': {'role': 'admin', 'owner': ['author_id', 'editor_id']}}, {'user': users[1]}, ['role'])
+    self.assertEqual(residual.root.gate, 'NOT')
+    self.assertEqual(residual.root.children[0].gate, 'OR')
+
+  def testPartialEvaluateNegatedConstants(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: flag in context['flags'])
+    lp.addType('owner', lambda field, context: True)
+    self.assertEqual(lp.partialEvaluate({'NOT': {'flag': 'banned'}}, {'flags': []}, ['flag']).root.gate, 'TRUE')
+    self.assertEqual(lp.partialEvaluate({'NOT': {'flag': 'banned'}}, {'flags': ['banned']}, ['flag']).root.gate, 'FALSE')
+    self.assertEqual(lp.partialEvaluate({'OR': [{'NOT': {'flag': 'banned'}}, {'owner': 'author_id'}]}, {'flags': []}, ['flag']).root.gate, 'TRUE')
+    self.assertEqual(lp.partialEvaluate({'AND': [{'NOT': {'flag': 'banned'}}, {'owner': 'author_id'}]}, {'flags': ['banned']}, ['flag']).root.gate, 'FALSE')
+    residual = lp.partialEvaluate({'AND': [{'NOT': {'flag': 'banned'}}, {'owner': 'author_id'}]}, {'flags': []}, ['flag'])
+    self.assertEqual(residual.root.gate, 'LEAF')
+    self.assertEqual(lp.toSqlWhere({'NOT': {'flag': 'banned'}}, {'flags': []}, ['flag']), ('1 = 1', []))
+
+  def createOpenCircuitBreaker(self):
+    breaker = CircuitBreaker(failure_threshold = 1, fallback = 'unknown')
+    breaker.allowCall()
+    breaker.recordFailure()
+    return breaker
+
+  def testPartialEvaluateUnknownFallback(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: role in context['roles'])
+    lp.addType('flag', lambda flag, context: flag in context['flags'])
+    lp.setTypeCircuitBreaker('flag', self.createOpenCircuitBreaker())
+    context = {'roles': ['r'], 'flags': []}
+
+    # A permission whose result is unknown is kept in the residual permission tree instead of being negated into a grant
+    permissions = {'AND': [{'role': 'r'}, {'NOT': {'flag': 'banned'}}]}
+    residual = lp.partialEvaluate(permissions, context, ['role', 'flag'])
+    self.assertEqual(residual.root.gate, 'NOT')
+    self.assertEqual(residual.root.children[0].gate, 'LEAF')
+    self.assertFalse(lp.checkAccess(residual, context))
+    self.assertFalse(lp.checkAccess(permissions, context))
+    self.assertEqual(lp.partialEvaluate({'OR': [{'NOT': {'flag': 'banned'}}, {'role': 'r'}]}, context, ['role', 'flag']).root.gate, 'TRUE')
+
+  def testPartialEvaluateDeepTree(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: role == 'granted')
+    lp.addType('flag', lambda flag, context: flag in context['flags'])
+    permissions = {'flag': 'leaf'}
+    for level in range(sys.getrecursionlimit() * 2):
+      if level % 2:
+        permissions = {'AND': [{'role': 'granted'}, {'OR': [permissions, {'flag': 'denied{0}'.format(level)}]}]}
+      else:
+        permissions = {'NOT': {'NOR': [{'flag': 'denied{0}'.format(level)}, permissions]}}
+    residual = lp.partialEvaluate(permissions, {}, ['role'])
+    self.assertEqual(lp.getRequiredLeaves(residual)['leaves'], {'flag': lp.getRequiredLeaves(permissions)['leaves']['flag']})
+    self.assertEqual(repr(residual.root).count("'flag'"), sys.getrecursionlimit() * 2 + 1)
+    for flags in [['leaf'], [], ['leaf', 'denied0']]:
+      self.assertEqual(lp.checkAccess(residual, {'flags': flags}), lp.checkAccess(lp.compile(permissions), {'flags': flags}))
+
+  # ------------LogicalPermissions::toSqlWhere()---------------
+
+  def testToSqlWhereMissingSqlBuilder(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: True)
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.toSqlWhere({'flag': 'is_author'})
+
+  def testToSqlWhereWrongSqlBuilderReturnType(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: True)
+    lp.setTypeSqlBuilder('flag', lambda flag, context: 'is_author = 1')
+    with self.assertRaises(InvalidCallbackReturnTypeException):
+      lp.toSqlWhere({'flag': 'is_author'})
+
+  def testToSqlWhere(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: role in context['user']['roles'])
+    lp.addType('owner', lambda field, context: context['document'][field] == context['user']['id'])
+    lp.addType('status', lambda status, context: context['document']['status'] == status)
+    lp.setTypeSqlBuilder('owner', lambda field, context: ('{0} = ?'.format(field), [context['user']['id']]))
+    lp.setTypeSqlBuilder('status', lambda status, context: ('status = ?', [status]))
+    lp.setBypassCallback(lambda context: context['user'].get('bypass', False))
+    lp.addPolicy('is_staff', {'role': ['admin', 'editor']})
+
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE document (id INTEGER PRIMARY KEY, author_id INTEGER NOT NULL, editor_id INTEGER NOT NULL, status TEXT NOT NULL)')
+    documents = []
+    for author_id in [1, 2]:
+      for editor_id in [1, 2]:
+        for status in ['draft', 'published', 'archived']:
+          document = {'id': len(documents) + 1, 'author_id': author_id, 'editor_id': editor_id, 'status': status}
+          documents.append(document)
+          connection.execute('INSERT INTO document VALUES (?, ?, ?, ?)', (document['id'], author_id, editor_id, status))
+
+    permissions_list = [
+      {},
+      False,
+      {'status': 'published'},
+      {'OR': {'POLICY': 'is_staff', 'owner': 'author_id'}},
+      {'AND': {'owner': ['author_id', 'editor_id'], 'status': {'NOT': 'archived'}}},
+      {'NAND': [{'owner': 'author_id'}, {'status': 'draft'}]},
+      {'NOR': [{'owner': 'editor_id'}, {'status': ['draft', 'archived']}]},
+      {'XOR': [{'owner': 'author_id'}, {'owner': 'editor_id'}, {'status': 'published'}]},
+      {'XOR': [{'role': 'admin'}, {'owner': 'author_id'}]},
+      {'NO_BYPASS': {'status': 'archived'}, 'owner': 'author_id'},
+      {'NO_BYPASS': {'role': 'writer'}, 'AND': [{'POLICY': 'is_staff'}, {'status': 'draft'}]},
+    ]
+    users = [
+      {'id': 1, 'roles': []},
+      {'id': 1, 'roles': ['admin']},
+      {'id': 2, 'roles': ['writer'], 'bypass': True},
+      {'id': 2, 'roles': [], 'bypass': True},
+    ]
+    for permissions in permissions_list:
+      for user in users:
+        for allow_bypass in [True, False]:
+          sql, params = lp.toSqlWhere(permissions, {'user': user}, ['role'], allow_bypass)
+          rows = connection.execute('SELECT id FROM document WHERE {0} ORDER BY id'.format(sql), params).fetchall()
+          expected = [document['id'] for document in documents if lp.checkAccess(permissions, {'user': user, 'document': document}, allow_bypass)]
+          self.assertEqual([row[0] for row in rows], expected)
+
+  def testToSqlWhereUnknownFallback(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: role in context['roles'])
+    lp.addType('flag', lambda flag, context: flag in context['flags'])
+    lp.addType('status', lambda status, context: context['document']['status'] == status)
+    lp.setTypeSqlBuilder('status', lambda status, context: ('status = ?', [status]))
+    lp.setTypeCircuitBreaker('flag', self.createOpenCircuitBreaker())
+    lp.setBypassCallback(lambda context: True)
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE document (id INTEGER PRIMARY KEY, status TEXT NOT NULL)')
+    connection.execute("INSERT INTO document VALUES (1, 'draft'), (2, 'published')")
+    context = {'roles': ['r'], 'flags': []}
+
+    # A permission whose result is unknown is translated to NULL, which NOT doesn't turn into a grant
+    permissions_list = [
+      {'AND': [{'role': 'r'}, {'NOT': {'flag': 'banned'}}]},
+      {'OR': [{'NOT': {'flag': 'banned'}}, {'status': 'published'}]},
+      {'XOR': [{'flag': 'banned'}, {'status': 'published'}, {'role': 'r'}]},
+      {'NO_BYPASS': {'NOT': {'flag': 'banned'}}, 'status': 'draft'},
+    ]
+    for permissions in permissions_list:
+      for allow_bypass in [True, False]:
+        sql, params = lp.toSqlWhere(permissions, context, ['role', 'flag'], allow_bypass)
+        rows = connection.execute('SELECT id FROM document WHERE {0} ORDER BY id'.format(sql), params).fetchall()
+        expected = [document['id'] for document in [{'id': 1, 'status': 'draft'}, {'id': 2, 'status': 'published'}] if lp.checkAccess(permissions, dict(context, document = document), allow_bypass)]
+        self.assertEqual([row[0] for row in rows], expected)
+    self.assertEqual(lp.toSqlWhere(permissions_list[0], context, ['role', 'flag'], False), ('NOT (1 = NULL)', []))
+
+  def testToSqlWhereDeepTree(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: role == 'granted')
+    lp.addType('flag', lambda flag, context: flag in context['flags'])
+    lp.setTypeSqlBuilder('flag', lambda flag, context: ('flag = ?', [flag]))
+    permissions = {'flag': 'leaf'}
+    for level in range(sys.getrecursionlimit() * 2):
+      if level % 2:
+        permissions = {'AND': [{'role': 'granted'}, {'OR': [permissions, {'flag': 'denied{0}'.format(level)}]}]}
+      else:
+        permissions = {'NOT': {'NOR': [{'flag': 'denied{0}'.format(level)}, permissions]}}
+    sql, params = lp.toSqlWhere(permissions, {}, ['role'])
+    self.assertEqual(sql.count('flag = ?'), sys.getrecursionlimit() * 2 + 1)
+    self.assertEqual(len(params), sys.getrecursionlimit() * 2 + 1)
+    self.assertIn('leaf', params)
+
+  # ------------LogicalPermissions::getRequiredLeaves()---------------
+
+  def testGetRequiredLeavesUnregisteredPolicy(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(PolicyNotRegisteredException):
+      lp.getRequiredLeaves({'POLICY': 'test'})
+
+  def testGetRequiredLeaves(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: True)
+    lp.addType('flag', lambda flag, context: True)
+    lp.addType('owner', lambda field, context: True)
+    lp.addPolicy('is_staff', {'role': ['admin', 'editor']})
+    permissions = {
+      'NO_BYPASS': {
+        'OR': {
+          'flag': 'never_bypass',
+          'role': 'sales',
+        },
+      },
+      'AND': [
+        {'POLICY': 'is_staff'},
+        {'role': {'NOT': 'writer'}},
+        {'owner': {'XOR': ['author_id', 'editor_id']}},
+        True,
+      ],
+    }
+    expected = {
+      'leaves': {
+        'role': frozenset(['admin', 'editor', 'writer', 'sales']),
+        'flag': frozenset(['never_bypass']),
+        'owner': frozenset(['author_id', 'editor_id']),
+      },
+      'no_bypass_only': frozenset(['flag']),
+    }
+    self.assertEqual(lp.getRequiredLeaves(permissions), expected)
+    compiled = lp.compile(permissions)
+    self.assertEqual(lp.getRequiredLeaves(compiled), expected)
+    self.assertEqual(lp.getRequiredLeaves(compiled), expected)
+
+    lp.removePolicy('is_staff')
+    lp.addPolicy('is_staff', {'role': 'admin'})
+    expected['leaves']['role'] = frozenset(['admin', 'writer', 'sales'])
+    self.assertEqual(lp.getRequiredLeaves(compiled), expected)
+
+  # ------------LogicalPermissions::filter()---------------
+
+  def testFilterParamPermissionsForWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.filter(permissions_for = 0, items = [])
+
+  def testFilterUnhashablePermissions(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: True)
+    with self.assertRaises(InvalidArgumentValueException):
+      list(lp.filter(permissions_for = lambda item: {'role': ['admin', set(['editor'])]}, items = [1]))
+
+  def testFilter(self):
+    lp = LogicalPermissions()
+    role_calls = []
+    def role_callback(role, context):
+      role_calls.append(role)
+      return role in context['user']['roles']
+    owner_calls = []
+    def owner_callback(field, context):
+      owner_calls.append(context['item']['id'])
+      return context['item'][field] == context['user']['id']
+    lp.addType('role', role_callback)
+    lp.addType('owner', owner_callback)
+    bypass_calls = []
+    def bypass_callback(context):
+      bypass_calls.append(context)
+      return context['user'].get('bypass', False)
+    lp.setBypassCallback(bypass_callback)
+    public_permissions = lp.compile(True)
+    def permissions_for(item):
+      if item['public']:
+        return public_permissions
+      return {'OR': {'role': 'admin', 'owner': 'author_id'}}
+
+    items = ({'id': id, 'author_id': id % 3, 'public': id % 4 == 0} for id in range(1, 13))
+    user = {'id': 1, 'roles': ['editor']}
+    result = lp.filter(permissions_for, items, {'user': user}, ['role'])
+    self.assertEqual(role_calls, [])
+    self.assertEqual([item['id'] for item in result], [1, 4, 7, 8, 10, 12])
+    self.assertEqual(role_calls, ['admin'])
+    self.assertEqual(owner_calls, [1, 2, 3, 5, 6, 7, 9, 10, 11])
+    self.assertEqual(len(bypass_calls), 1)
+
+    items = [{'id': id, 'author_id': 2, 'public': False} for id in range(1, 4)]
+    user = {'id': 1, 'roles': ['admin']}
+    del owner_calls[:]
+    self.assertEqual(len(list(lp.filter(permissions_for, items, {'user': user}, ['role']))), 3)
+    self.assertEqual(owner_calls, [])
+    user = {'id': 1, 'roles': [], 'bypass': True}
+    self.assertEqual(len(list(lp.filter(permissions_for, items, {'user': user}, ['role']))), 3)
+    self.assertEqual(len(list(lp.filter(permissions_for, items, {'user': user}, ['role'], allow_bypass = False))), 0)
+
+  def testFilterResidualEviction(self):
+    lp = LogicalPermissions()
+    role_calls = []
+    def role_callback(role, context):
+      role_calls.append(role)
+      return role == 'editor'
+    lp.addType('role', role_callback)
+    lp.addType('flag', lambda flag, context: flag in context['item']['flags'])
+    def permissions_for(item):
+      return {'OR': [{'role': item['role']}, {'flag': 'public'}]}
+
+    # The residual permission trees of at most 1000 permission trees are kept, and the least recently used one is evicted first
+    items = [{'role': 'role{0}'.format(index), 'flags': []} for index in range(1000)]
+    items += [{'role': 'role0', 'flags': ['public']}, {'role': 'editor', 'flags': []}, {'role': 'role1', 'flags': []}, {'role': 'role0', 'flags': []}]
+    result = lp.filter(permissions_for, items, {}, ['role'])
+    self.assertEqual([item['role'] for item in result], ['role0', 'editor'])
+    self.assertEqual(len(role_calls), 1002)
+    self.assertEqual(role_calls[-2:], ['editor', 'role1'])
+
+  def testFilterUnknownFallback(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: role in context['roles'])
+    lp.addType('flag', lambda flag, context: flag in context['flags'])
+    lp.addType('status', lambda status, context: context['item']['status'] == status)
+    lp.setTypeCircuitBreaker('flag', self.createOpenCircuitBreaker())
+    items = [{'id': 1, 'status': 'draft'}, {'id': 2, 'status': 'published'}]
+    context = {'roles': ['r'], 'flags': []}
+    self.assertEqual(list(lp.filter(lambda item: {'AND': [{'role': 'r'}, {'NOT': {'flag': 'banned'}}]}, items, context, ['role', 'flag'])), [])
+    result = lp.filter(lambda item: {'OR': [{'NOT': {'flag': 'banned'}}, {'status': 'published'}]}, items, context, ['role', 'flag'])
+    self.assertEqual([item['id'] for item in result], [2])
+
+  def testFilterDeepTree(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: role == 'granted')
+    lp.addType('flag', lambda flag, context: flag in context['item']['flags'])
+    permissions = {'flag': 'leaf'}
+    for level in range(sys.getrecursionlimit() * 2):
+      if level % 2:
+        permissions = {'AND': [{'role': 'granted'}, {'OR': [permissions, {'flag': 'denied{0}'.format(level)}]}]}
+      else:
+        permissions = {'NOT': {'NOR': [{'flag': 'denied{0}'.format(level)}, permissions]}}
+    items = [{'id': 1, 'flags': ['leaf']}, {'id': 2, 'flags': []}, {'id': 3, 'flags': ['leaf', 'denied0']}]
+    expected = [item['id'] for item in items if lp.checkAccess(lp.compile(permissions), {'item': item})]
+    self.assertEqual(len(expected), 2)
+    result = lp.filter(lambda item: permissions, items, {}, ['role'])
+    self.assertEqual([item['id'] for item in result], expected)
+
+  # ------------LogicalPermissions::getSubjectsWithAccess()---------------
+
+  def testGetSubjectsWithAccessParamIndexWrongType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentTypeException):
+      lp.getSubjectsWithAccess(True, {})
+
+  def testGetSubjectsWithAccessUnindexedType(self):
+    lp = LogicalPermissions()
+    lp.addType('role', lambda role, context: False)
+    lp.addType('flag', lambda flag, context: False)
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.getSubjectsWithAccess({'flag': 'is_author'}, PopulationIndex(['role']))
+
+  def testGetSubjectsWithAccessWrongContextForReturnType(self):
+    lp = LogicalPermissions()
+    lp.addType('flag', lambda flag, context: False)
+    index = PopulationIndex(['role'])
+    index.setSubject(1, {})
+    with self.assertRaises(InvalidCallbackReturnTypeException):
+      lp.getSubjectsWithAccess({'flag': 'is_author'}, index, lambda subject: None)
+
+  def testGetSubjectsWithAccess(self):
+    lp = LogicalPermissions()
+    users = {
+      1: {'roles': ['admin'], 'groups': ['sales']},
+      2: {'roles': ['editor'], 'groups': ['sales', 'support']},
+      3: {'roles': ['editor', 'writer'], 'groups': []},
+      4: {'roles': [], 'groups': ['support'], 'is_author': True},
+      5: {'roles': ['writer'], 'groups': ['support'], 'bypass': True},
+    }
+    flag_calls = []
+    def flag_callback(flag, context):
+      flag_calls.append(context['user']['id'])
+      return context['user'].get(flag, False)
+    lp.addType('role', lambda role, context: role in context['user']['roles'])
+    lp.addType('group', lambda group, context: group in context['user']['groups'])
+    lp.addType('flag', flag_callback)
+    lp.setBypassCallback(lambda context: context['user'].get('bypass', False))
+    lp.addPolicy('is_staff', {'role': ['admin', 'editor']})
+    index = PopulationIndex(['role', 'group'])
+    for id, user in users.items():
+      index.setSubject(id, {'role': user['roles'], 'group': user['groups']})
+    context_for = lambda id: {'user': dict(users[id], id = id)}
+
+    self.assertEqual(lp.getSubjectsWithAccess({'role': 'editor'}, index), frozenset([2, 3]))
+    self.assertEqual(lp.getSubjectsWithAccess({'AND': [{'POLICY': 'is_staff'}, {'group': 'sales'}]}, index), frozenset([1, 2]))
+    self.assertEqual(lp.getSubjectsWithAccess({'role': {'NOT': 'editor'}}, index), frozenset([1, 4, 5]))
+    self.assertEqual(lp.getSubjectsWithAccess({'group': {'XOR': ['sales', 'support']}}, index), frozenset([1, 4, 5]))
+    self.assertEqual(lp.getSubjectsWithAccess({'group': {'NAND': ['sales', 'support']}}, index), frozenset([1, 3, 4, 5]))
+    self.assertEqual(lp.getSubjectsWithAccess({'role': {'NOR': ['admin', 'editor']}}, index), frozenset([4, 5]))
+    self.assertEqual(lp.getSubjectsWithAccess(False, index), frozenset())
+    self.assertEqual(lp.getSubjectsWithAccess([], index), frozenset([1, 2, 3, 4, 5]))
+
+    # Permission types that are not indexed and the bypass callback are evaluated for each subject
+    permissions = {'OR': [{'flag': 'is_author'}, {'role': 'admin'}]}
+    self.assertEqual(lp.getSubjectsWithAccess(permissions, index, context_for, allow_bypass = False), frozenset([1, 4]))
+    self.assertEqual(sorted(flag_calls), [1, 2, 3, 4, 5])
+    self.assertEqual(lp.getSubjectsWithAccess(permissions, index, context_for), frozenset([1, 4, 5]))
+    self.assertEqual(lp.getSubjectsWithAccess(dict(permissions, NO_BYPASS = {'group': 'support'}), index, context_for), frozenset([1, 4]))
+
+    # The results are the same as checking each subject
+    lp.setTypeUniverse('role', ['admin', 'editor', 'writer'], lambda context: context['user']['roles'])
+    permissions_list = [
+      {'role': {'AND': ['editor', {'NOT': 'writer'}]}, 'group': {'NOT': 'sales'}},
+      {'XOR': [{'role': 'writer'}, {'group': 'support'}, {'flag': 'is_author'}]},
+      {'NAND': [{'POLICY': 'is_staff'}, {'group': ['sales', 'support']}]},
+      {'NO_BYPASS': {'role': 'writer'}, 'OR': [{'role': 'admin'}, {'NOR': [{'group': 'sales'}, {'flag': 'is_author'}]}]},
+    ]
+    for permissions in permissions_list:
+      for allow_bypass in [True, False]:
+        expected = frozenset(id for id in users if lp.checkAccess(permissions, context_for(id), allow_bypass))
+        self.assertEqual(lp.getSubjectsWithAccess(lp.compile(permissions), index, context_for, allow_bypass), expected)
+
+    users[3] = {'roles': ['admin'], 'groups': ['support']}
+    index.setSubject(3, {'role': ['admin'], 'group': ['support']})
+    index.removeSubject(1)
+    self.assertEqual(lp.getSubjectsWithAccess({'role': 'admin'}, index), frozenset([3]))
+
+  def testGetSubjectsWithAccessUnknownFallback(self):
+    lp = LogicalPermissions()
+    users = {1: ['r'], 2: ['r', 'w'], 3: ['w'], 4: []}
+    lp.addType('role', lambda role, context: role in context['roles'])
+    lp.addType('flag', lambda flag, context: False)
+    lp.setBypassCallback(lambda context: 'w' in context['roles'])
+    lp.setTypeCircuitBreaker('flag', self.createOpenCircuitBreaker())
+    index = PopulationIndex(['role'])
+    for id, roles in users.items():
+      index.setSubject(id, {'role': roles})
+    context_for = lambda id: {'roles': users[id]}
+
+    self.assertEqual(lp.getSubjectsWithAccess({'AND': [{'role': 'r'}, {'NOT': {'flag': 'banned'}}]}, index, context_for, False), frozenset())
+    permissions_list = [
+      {'AND': [{'role': 'r'}, {'NOT': {'flag': 'banned'}}]},
+      {'OR': [{'NOT': {'flag': 'banned'}}, {'role': 'r'}]},
+      {'NAND': [{'flag': 'banned'}, {'role': 'r'}]},
+      {'NOR': [{'flag': 'banned'}, {'role': 'r'}]},
+      {'XOR': [{'flag': 'banned'}, {'role': 'r'}, {'role': 'w'}]},
+      {'NO_BYPASS': {'NOT': {'flag': 'banned'}}, 'role': 'r'},
+      {'NO_BYPASS': {'AND': [{'flag': 'banned'}, {'role': 'r'}]}, 'role': 'r'},
+    ]
+    for permissions in permissions_list:
+      for allow_bypass in [True, False]:
+        expected = frozenset(id for id in users if lp.checkAccess(permissions, context_for(id), allow_bypass))
+        self.assertEqual(lp.getSubjectsWithAccess(permissions, index, context_for, allow_bypass), expected)
+
+  # ------------LogicalPermissions::invalidate()---------------
+
+  def testInvalidateParamValueWithoutType(self):
+    lp = LogicalPermissions()
+    with self.assertRaises(InvalidArgumentValueException):
+      lp.invalidate(value = 'editor')
+
+  def testInvalidate(self):
+    lp = LogicalPermissions()
+    calls = []
+    roles = {1: ['editor'], 2: ['writer']}
+    def role_callback(role, context):
+      calls.append(role)
+      return role in roles[context['user']['id']]
+    lp.addType('role', role_callback, context_keys = ['user.id'], pure = True)
+    lp.addType('flag', lambda flag, context: context['user'].get(flag, False))
+    lp.setDecisionCache(DecisionCache(fingerprint = lambda context: context['user']['id']))
+    lp.addPolicy('is_staff', {'role': ['admin', 'editor']})
+    editor_permissions = lp.compile({'POLICY': 'is_staff'})
+    writer_permissions = lp.compile({'OR': [{'flag': 'is_author'}, {'role': 'writer'}]})
+    self.assertEqual(lp.checkAccessMany([editor_permissions, writer_permissions], {'user': {'id': 1}}), [True, False])
+    self.assertEqual(lp.checkAccessMany([editor_permissions, writer_permissions], {'user': {'id': 2}}), [False, True])
+    self.assertEqual(len(calls), 6)
+
+    roles[1] = ['writer']
+    lp.invalidate(type = 'role', value = 'editor')
+    self.assertEqual(lp.getStatistics()['decision_cache']['invalidations'], 2)
+    self.assertEqual(lp.checkAccessMany([editor_permissions, writer_permissions], {'user': {'id': 1}}), [False, False])
+    self.assertEqual(lp.checkAccessMany([editor_permissions, writer_permissions], {'user': {'id': 2}}), [False, True])
+    self.assertEqual(calls[6:], ['editor', 'editor'])
+
+    roles[2] = []
+    lp.invalidate(type = 'role')
+    self.assertEqual(lp.checkAccess(writer_permissions, {'user': {'id': 2}}), False)
+
 if __name__ == '__main__':
   unittest.main()
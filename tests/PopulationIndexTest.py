@@ -0,0 +1,72 @@
+import unittest
+from logical_permissions.PopulationIndex import PopulationIndex
+from logical_permissions.exceptions import *
+
+class PopulationIndexTest(unittest.TestCase):
+
+  def testCreationParamTypesWrongType(self):
+    with self.assertRaises(InvalidArgumentTypeException):
+      PopulationIndex(types = 'role')
+
+  def testCreationParamTypesWrongValue(self):
+    with self.assertRaises(InvalidArgumentValueException):
+      PopulationIndex(types = [''])
+
+  def testSetSubjectParamPermissionsWrongType(self):
+    index = PopulationIndex(types = ['role'])
+    with self.assertRaises(InvalidArgumentTypeException):
+      index.setSubject(1, ['admin'])
+
+  def testSetSubjectParamPermissionsUnindexedType(self):
+    index = PopulationIndex(types = ['role'])
+    with self.assertRaises(InvalidArgumentValueException):
+      index.setSubject(1, {'group': ['sales']})
+
+  def testSetSubjectParamSubjectWrongType(self):
+    index = PopulationIndex(types = ['role'])
+    with self.assertRaises(InvalidArgumentTypeException):
+      index.setSubject([1], {'role': ['admin']})
+
+  def testRemoveSubjectMissingSubject(self):
+    index = PopulationIndex(types = ['role'])
+    with self.assertRaises(InvalidArgumentValueException):
+      index.removeSubject(1)
+
+  def testGetSubjectsParamValueWithoutType(self):
+    index = PopulationIndex(types = ['role'])
+    with self.assertRaises(InvalidArgumentValueException):
+      index.getSubjects(value = 'admin')
+
+  def testSetSubject(self):
+    index = PopulationIndex(types = ['role', 'group'])
+    self.assertEqual(index.getTypes(), frozenset(['role', 'group']))
+    index.setSubject(1, {'role': ['admin', 'editor'], 'group': ['sales']})
+    index.setSubject(2, {'role': ['editor']})
+    self.assertTrue(index.subjectExists(1))
+    self.assertFalse(index.subjectExists(3))
+    self.assertEqual(index.getSubjects(), frozenset([1, 2]))
+    self.assertEqual(index.getSubjects('role', 'editor'), frozenset([1, 2]))
+    self.assertEqual(index.getSubjects('group', 'sales'), frozenset([1]))
+    self.assertEqual(index.getSubjects('group', 'support'), frozenset())
+    self.assertEqual(index.getSubjectPermissions(2), {'role': frozenset(['editor']), 'group': frozenset()})
+
+    # Only the changed permissions are updated
+    index.setSubject(1, {'role': ['editor', 'writer']})
+    self.assertEqual(index.getSubjects('role', 'admin'), frozenset())
+    self.assertEqual(index.getSubjects('role', 'writer'), frozenset([1]))
+    self.assertEqual(index.getSubjects('role', 'editor'), frozenset([1, 2]))
+    self.assertEqual(index.getSubjects('group', 'sales'), frozenset())
+
+  def testRemoveSubject(self):
+    index = PopulationIndex(types = ['role'])
+    index.setSubject(1, {'role': ['admin']})
+    index.setSubject(2, {'role': ['admin']})
+    index.removeSubject(1)
+    self.assertFalse(index.subjectExists(1))
+    self.assertEqual(index.getSubjects(), frozenset([2]))
+    self.assertEqual(index.getSubjects('role', 'admin'), frozenset([2]))
+    with self.assertRaises(InvalidArgumentValueException):
+      index.getSubjectPermissions(1)
+
+if __name__ == '__main__':
+  unittest.main()